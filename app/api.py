@@ -1,15 +1,48 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from prometheus_client import CONTENT_TYPE_LATEST
+import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import re
 from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 
-from app.models import DashboardData, SessionLocal
+from app.models import DashboardData, SessionLocal, CollectionRun
+from app.queries import list_collection_runs, load_run_health_data
+from app.history import (
+    HistoryQueryError,
+    parse_bucket,
+    parse_aggregations,
+    system_history,
+    components_history,
+    accounts_history
+)
+from app.event_queries import (
+    DEFAULT_PAGE_SIZE,
+    FAILED_LOGIN_EVENT_TYPE,
+    MAX_PAGE_SIZE,
+    EventQueryError,
+    query_security_events,
+    search_security_events
+)
+from app.export import EXPORT_FORMATS, EXPORT_TABLES, ExportError, encode_export, export_filename, validate_export
 from app.health_collector import collector
-from app.config import API_CONFIG
+from app.odata import ODataQueryError, metadata_document, query_entity_set
+from app.broadcast import hub, format_sse, snapshot_message
+from app.http_cache import encode_json, prime_snapshot, snapshot_response
+from app.snapshot import HealthSnapshot
+from app.targets import UnknownTargetError, resolve_target
+from app.leader import scheduler_election
+from app.retention import retention_job
+from app.executor import run_blocking
+from app.metrics import MetricsMiddleware, record_snapshot, render_metrics
+from app.tracing import TracingMiddleware, configure_tracing, shutdown_tracing
+from app.config import API_CONFIG, COLLECTOR_CONFIG, HISTORY_CONFIG, METRICS_CONFIG, STREAM_CONFIG
 
 # Configuration du logging
 logging.basicConfig(
@@ -35,6 +68,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Mesurer la durée des requêtes par route (exportée sur /metrics)
+if METRICS_CONFIG["enabled"]:
+    app.add_middleware(MetricsMiddleware)
+
+# Tracer les requêtes et les collectes qu'elles déclenchent (optionnel, voir TRACING_CONFIG)
+if configure_tracing():
+    app.add_middleware(TracingMiddleware)
+
 # Configuration des templates
 BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
@@ -51,14 +92,70 @@ def get_db():
     finally:
         db.close()
 
+# Paramètre de sélection de la cible de collecte, commun aux endpoints de lecture
+TARGET_DESCRIPTION = "Cible de collecte (par défaut la première cible configurée)"
+
+def target_name(target: Optional[str]) -> str:
+    """
+    Valider la cible demandée (erreur 404 si elle n'est pas configurée)
+    """
+    try:
+        return resolve_target(target)
+    except UnknownTargetError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def get_latest_snapshot(target: Optional[str] = None) -> Tuple[Optional[HealthSnapshot], Dict[str, Any]]:
+    """
+    Récupérer le dernier instantané d'une cible et ses données sans bloquer la boucle d'événements
+
+    Un instantané frais est servi directement ; sinon le rechargement (appels
+    CyberArk, lecture en base) est délégué au pool de threads bloquants. Si
+    seules des données de secours sont disponibles, l'instantané retourné est None.
+    """
+    snapshots = collector.target(target).snapshots
+    snapshot = snapshots.current()
+    if snapshots.is_fresh(snapshot):
+        snapshots.count_read("hit")
+        return snapshot, snapshot.data
+
+    data = await run_blocking(collector.get_latest_health_data, target)
+    snapshot = snapshots.current()
+    if snapshot is None or snapshot.data is not data:
+        snapshot = None
+    return snapshot, data
+
+async def get_latest_health_data(target: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Récupérer les dernières données de santé d'une cible sans bloquer la boucle d'événements
+    """
+    return (await get_latest_snapshot(target))[1]
+
+async def snapshot_json(request: Request, key: Tuple, target: str) -> Response:
+    """
+    Réponse conditionnelle (ETag, Cache-Control, compression) pour une représentation du dernier instantané d'une cible
+    """
+    snapshot, data = await get_latest_snapshot(target)
+    return snapshot_response(request, snapshot, data, key, collector.target(target).next_collection_at)
+
 @app.on_event("startup")
 async def startup_event():
     """
     Événement de démarrage de l'application
     """
     logger.info("Démarrage de l'API")
-    # Démarrer le collecteur de données
-    collector.start()
+    # Encoder les réponses de chaque nouvel instantané dès sa publication,
+    # puis le diffuser aux clients du flux /api/stream
+    hub.attach(asyncio.get_running_loop())
+    for target in collector.targets.values():
+        target.snapshots.add_listener(prime_snapshot)
+        target.snapshots.add_listener(hub.publish_snapshot)
+        target.snapshots.add_listener(record_snapshot)
+    
+    # Servir les cycles stockés : les collectes, la compaction et la purge ne sont exécutées
+    # que par le processus élu (un seul parmi les workers), ou par python -m app.collector
+    collector.start_reader()
+    if COLLECTOR_CONFIG["embedded"]:
+        scheduler_election.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -66,8 +163,10 @@ async def shutdown_event():
     Événement d'arrêt de l'application
     """
     logger.info("Arrêt de l'API")
-    # Arrêter le collecteur de données
-    collector.stop()
+    # Rendre le rôle de planificateur (collecte, compaction, purge), puis arrêter le collecteur
+    await run_blocking(scheduler_election.stop)
+    await run_blocking(collector.stop)
+    shutdown_tracing()
 
 @app.get("/", summary="Page d'accueil", tags=["Interface"])
 async def home(request: Request):
@@ -81,80 +180,179 @@ async def health_check():
     """
     Vérifier l'état de santé de l'API
     """
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "ok",
+        "timestamp": datetime.now().isoformat(),
+        # Ce processus exécute-t-il les collectes planifiées ?
+        "scheduler": scheduler_election.is_leader,
+        # État du disjoncteur des appels au PVWA de chaque cible (closed, open, half_open)
+        "cyberark": {name: target.api.breaker.to_dict() for name, target in collector.targets.items()},
+        # Cycles de collecte en attente d'écriture en base (file en mémoire et journal sur disque)
+        "writer": collector.writer.status()
+    }
+
+@app.get("/metrics", summary="Métriques Prometheus", tags=["Santé"])
+async def metrics():
+    """
+    Exposer les métriques au format texte Prometheus : appels au PVWA, cycles de collecte,
+    écritures en base, lectures de l'instantané, requêtes HTTP et dernières valeurs de santé
+    """
+    if not METRICS_CONFIG["enabled"]:
+        raise HTTPException(status_code=404, detail="Métriques désactivées (METRICS_ENABLED=false)")
+    return Response(await run_blocking(render_metrics), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/api/targets", summary="Lister les cibles de collecte", tags=["Santé"])
+async def get_targets():
+    """
+    Lister les cibles de collecte (environnements PVWA) et l'état de leur collecte
+    """
+    return {"targets": [target.to_dict() for target in collector.targets.values()]}
 
 @app.get("/api/dashboard", response_model=DashboardData, summary="Récupérer les données du tableau de bord", tags=["Tableau de bord"])
 async def get_dashboard_data(
-    refresh: bool = Query(False, description="Forcer la récupération de nouvelles données")
+    request: Request,
+    refresh: bool = Query(False, description="Forcer la récupération de nouvelles données"),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
 ):
     """
-    Récupérer les données du tableau de bord
+    Récupérer les données du tableau de bord d'une cible
+
+    Un client qui présente l'ETag de l'instantané courant (If-None-Match)
+    reçoit une réponse 304 sans corps.
     """
+    target = target_name(target)
     try:
         if refresh:
-            # Collecter de nouvelles données
-            collector.collect_and_store_health_data()
+            # Attendre la collecte en cours, ou en démarrer une, sans bloquer la boucle
+            job = await run_blocking(collector.request_collection, target=target)
+            await asyncio.wrap_future(job.future)
             
         # Récupérer les dernières données
-        dashboard_data = collector.get_latest_health_data()
+        snapshot, dashboard_data = await get_latest_snapshot(target)
         
         if not dashboard_data:
             logger.warning("Aucune donnée de tableau de bord disponible")
             raise HTTPException(status_code=404, detail="Aucune donnée disponible")
             
-        return dashboard_data
+        return snapshot_response(request, snapshot, dashboard_data, ("dashboard",), collector.target(target).next_collection_at)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des données du tableau de bord: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+@app.get("/api/stream", summary="Flux des mises à jour du tableau de bord", tags=["Tableau de bord"])
+async def stream_dashboard(
+    request: Request,
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
+    """
+    Flux Server-Sent Events des mises à jour du tableau de bord d'une cible
+
+    Un message `snapshot` contenant l'état complet est envoyé à la connexion,
+    puis un message `diff` contenant les seules sections modifiées après
+    chaque nouvel instantané. Un client qui se reconnecte avec l'en-tête
+    Last-Event-ID de l'instantané courant (empreinte de son contenu, la même
+    dans tous les processus) ne reçoit pas à nouveau l'état complet.
+    """
+    target = target_name(target)
+    last_event_id = request.headers.get("last-event-id")
+    subscriber = hub.subscribe(target)
+
+    async def events():
+        try:
+            yield f"retry: {STREAM_CONFIG['retry']}\n\n".encode("utf-8")
+
+            snapshot = hub.current(target) or collector.target(target).snapshots.current()
+            if snapshot is None:
+                yield format_sse("snapshot", {"version": None, "data": await get_latest_health_data(target)})
+            elif snapshot.digest != last_event_id:
+                yield snapshot_message(snapshot)
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), STREAM_CONFIG["heartbeat"])
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": keepalive\n\n"
+                    continue
+
+                if subscriber.resync:
+                    subscriber.resync = False
+                    message = snapshot_message(hub.current(target))
+                yield message
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Désactiver la mise en tampon des proxys inverses (nginx)
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.get("/api/components", summary="Récupérer l'état des composants", tags=["Composants"])
-async def get_components_status():
+async def get_components_status(
+    request: Request,
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
     """
     Récupérer l'état des composants
     """
+    target = target_name(target)
     try:
-        dashboard_data = collector.get_latest_health_data()
-        return dashboard_data.get("component_status", {"Items": []})
+        return await snapshot_json(request, ("component_status",), target)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'état des composants: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.get("/api/vault", summary="Récupérer l'état du coffre-fort", tags=["Coffre-fort"])
-async def get_vault_status():
+async def get_vault_status(
+    request: Request,
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
     """
     Récupérer l'état du coffre-fort
     """
+    target = target_name(target)
     try:
-        dashboard_data = collector.get_latest_health_data()
-        return dashboard_data.get("vault_status", {"Safes": {}})
+        return await snapshot_json(request, ("vault_status",), target)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'état du coffre-fort: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.get("/api/accounts", summary="Récupérer l'état des comptes", tags=["Comptes"])
-async def get_accounts_status():
+async def get_accounts_status(
+    request: Request,
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
     """
     Récupérer l'état des comptes
     """
+    target = target_name(target)
     try:
-        dashboard_data = collector.get_latest_health_data()
-        return dashboard_data.get("accounts_status", {"value": {}})
+        return await snapshot_json(request, ("accounts_status",), target)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'état des comptes: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.get("/api/system", summary="Récupérer l'état de santé du système", tags=["Système"])
-async def get_system_health():
+async def get_system_health(
+    request: Request,
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
     """
     Récupérer l'état de santé du système
     """
+    target = target_name(target)
     try:
-        dashboard_data = collector.get_latest_health_data()
-        return dashboard_data.get("system_health", {})
+        return await snapshot_json(request, ("system_health",), target)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération de l'état de santé du système: {str(e)}")
@@ -162,15 +360,16 @@ async def get_system_health():
 
 @app.get("/api/events", summary="Récupérer les événements de sécurité récents", tags=["Événements"])
 async def get_security_events(
-    limit: int = Query(10, description="Nombre d'événements à récupérer", ge=1, le=100)
+    request: Request,
+    limit: int = Query(10, description="Nombre d'événements à récupérer", ge=1, le=100),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
 ):
     """
     Récupérer les événements de sécurité récents
     """
+    target = target_name(target)
     try:
-        dashboard_data = collector.get_latest_health_data()
-        events = dashboard_data.get("recent_activities", [])
-        return {"events": events[:limit]}
+        return await snapshot_json(request, ("events", limit), target)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des événements de sécurité: {str(e)}")
@@ -178,34 +377,437 @@ async def get_security_events(
 
 @app.get("/api/logins/failed", summary="Récupérer les tentatives de connexion échouées", tags=["Connexions"])
 async def get_failed_logins(
-    limit: int = Query(10, description="Nombre de tentatives à récupérer", ge=1, le=100)
+    request: Request,
+    limit: int = Query(10, description="Nombre de tentatives à récupérer", ge=1, le=100),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
 ):
     """
     Récupérer les tentatives de connexion échouées
     """
+    target = target_name(target)
     try:
-        dashboard_data = collector.get_latest_health_data()
-        logins = dashboard_data.get("failed_logins", [])
-        return {"logins": logins[:limit]}
+        return await snapshot_json(request, ("logins", limit), target)
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des tentatives de connexion échouées: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
-@app.post("/api/collect", summary="Forcer la collecte de données", tags=["Administration"])
-async def force_collect_data(background_tasks: BackgroundTasks):
+def _run_event_query(page_query, **kwargs):
+    db = SessionLocal()
+    try:
+        return page_query(db, **kwargs)
+    finally:
+        db.close()
+
+async def _events_page_response(page_query=query_security_events, **kwargs):
+    try:
+        return await run_blocking(_run_event_query, page_query, **kwargs)
+        
+    except EventQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la consultation des événements stockés: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+@app.get("/api/events/history", summary="Consulter les événements de sécurité stockés", tags=["Événements"])
+async def get_security_events_history(
+    start: Optional[datetime] = Query(None, alias="from", description="Début de la période (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Fin de la période, exclue (ISO 8601)"),
+    username: Optional[str] = Query(None, description="Limiter à un utilisateur"),
+    source_ip: Optional[str] = Query(None, description="Limiter à une adresse IP source"),
+    severity: Optional[str] = Query(None, description="Limiter à une sévérité (ex: Info, Warning, Critical)"),
+    event_type: Optional[str] = Query(None, description="Limiter à un type d'événement"),
+    target_safe: Optional[str] = Query(None, description="Limiter à un coffre"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor de la page précédente)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, description="Nombre d'événements par page", ge=1, le=MAX_PAGE_SIZE),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
+    """
+    Parcourir les événements de sécurité stockés, du plus récent au plus ancien
+
+    Les filtres se combinent. Pour la page suivante, repassez les mêmes
+    paramètres avec `cursor` égal au `next_cursor` retourné (nul sur la
+    dernière page).
+    """
+    return await _events_page_response(
+        target=target_name(target),
+        filters={"username": username, "source_ip": source_ip, "severity": severity,
+                 "event_type": event_type, "target_safe": target_safe},
+        start=start, end=end, cursor=cursor, limit=limit
+    )
+
+@app.get("/api/events/search", summary="Rechercher dans les événements de sécurité stockés", tags=["Événements"])
+async def search_security_events_text(
+    q: str = Query(..., description='Mots recherchés dans la description et les données brutes (tous requis; "expression exacte", préfixe*)'),
+    start: Optional[datetime] = Query(None, alias="from", description="Début de la période (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Fin de la période, exclue (ISO 8601)"),
+    username: Optional[str] = Query(None, description="Limiter à un utilisateur"),
+    source_ip: Optional[str] = Query(None, description="Limiter à une adresse IP source"),
+    severity: Optional[str] = Query(None, description="Limiter à une sévérité"),
+    event_type: Optional[str] = Query(None, description="Limiter à un type d'événement"),
+    target_safe: Optional[str] = Query(None, description="Limiter à un coffre"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor de la page précédente)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, description="Nombre d'événements par page", ge=1, le=MAX_PAGE_SIZE),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
+    """
+    Rechercher des événements de sécurité stockés par le texte de leur description et de leurs données brutes
+
+    La recherche utilise l'index plein texte de la base (FTS5 sous SQLite,
+    recherche en texte intégral sous SQL Server). Les résultats vont du
+    dernier événement stocké au premier; `backend` indique le moteur utilisé.
+    """
+    return await _events_page_response(
+        search_security_events,
+        query=q,
+        target=target_name(target),
+        filters={"username": username, "source_ip": source_ip, "severity": severity,
+                 "event_type": event_type, "target_safe": target_safe},
+        start=start, end=end, cursor=cursor, limit=limit
+    )
+
+@app.get("/api/logins/failed/history", summary="Consulter les connexions échouées stockées", tags=["Connexions"])
+async def get_failed_logins_history(
+    start: Optional[datetime] = Query(None, alias="from", description="Début de la période (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Fin de la période, exclue (ISO 8601)"),
+    username: Optional[str] = Query(None, description="Limiter à un utilisateur"),
+    source_ip: Optional[str] = Query(None, description="Limiter à une adresse IP source"),
+    severity: Optional[str] = Query(None, description="Limiter à une sévérité"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (next_cursor de la page précédente)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, description="Nombre de tentatives par page", ge=1, le=MAX_PAGE_SIZE),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
+    """
+    Parcourir les tentatives de connexion échouées stockées, de la plus récente à la plus ancienne
+    """
+    return await _events_page_response(
+        target=target_name(target),
+        filters={"username": username, "source_ip": source_ip, "severity": severity,
+                 "event_type": FAILED_LOGIN_EVENT_TYPE},
+        start=start, end=end, cursor=cursor, limit=limit
+    )
+
+@app.get("/api/export/{table}", summary="Exporter une table complète", tags=["Export"])
+async def export_table(
+    table: str,
+    export_format: str = Query("csv", alias="format", description=f"Format du fichier ({', '.join(EXPORT_FORMATS)})"),
+    start: Optional[datetime] = Query(None, alias="from", description="Début de la période (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Fin de la période, exclue (ISO 8601)"),
+    target: Optional[str] = Query(None, description="Limiter à une cible de collecte (par défaut toutes)")
+):
+    """
+    Exporter les lignes stockées d'une table, par ordre chronologique, en CSV, NDJSON ou Parquet
+
+    Tables disponibles : component_status, components, system_health,
+    accounts_status, vault_status et security_events. Le fichier est envoyé
+    au fil de la lecture en base, par lots de EXPORT_BATCH_SIZE lignes : la
+    mémoire utilisée ne dépend pas de la taille de l'export. Le format
+    Parquet nécessite le paquet pyarrow.
+    """
+    try:
+        validate_export(table, export_format, start, end)
+    except ExportError as e:
+        raise HTTPException(status_code=404 if table not in EXPORT_TABLES else 400, detail=str(e))
+    if target:
+        target = target_name(target)
+
+    db = SessionLocal()
+    chunks = encode_export(db, table, export_format, start, end, target)
+
+    async def body():
+        # Chaque lot est lu et encodé dans le pool de threads bloquants, puis envoyé avant le suivant
+        try:
+            while True:
+                chunk = await run_blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    yield chunk
+        except Exception as e:
+            logger.error(f"Erreur lors de l'export de la table {table}: {str(e)}")
+            raise
+        finally:
+            await run_blocking(chunks.close)
+            await run_blocking(db.close)
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[export_format][0],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(table, export_format, start, end)}"'}
+    )
+
+# En-têtes communs des réponses OData
+ODATA_HEADERS = {"OData-Version": "4.0"}
+
+def _odata_root(request: Request) -> str:
+    return str(request.url_for("odata_service_document")).rstrip("/")
+
+@app.get("/odata", summary="Document de service OData", tags=["OData"])
+async def odata_service_document(request: Request):
+    """
+    Lister les ensembles d'entités du flux OData (une par table exportable)
+    """
+    root = _odata_root(request)
+    payload = {
+        "@odata.context": f"{root}/$metadata",
+        "value": [{"name": name, "kind": "EntitySet", "url": name} for name in EXPORT_TABLES]
+    }
+    return Response(encode_json(payload), media_type="application/json;odata.metadata=minimal", headers=ODATA_HEADERS)
+
+@app.get("/odata/$metadata", summary="Schéma du flux OData", tags=["OData"])
+async def odata_metadata():
+    """
+    Décrire les types des ensembles d'entités (CSDL XML), lu par Power BI à la connexion
+    """
+    return Response(metadata_document(), media_type="application/xml", headers=ODATA_HEADERS)
+
+def _run_odata_query(**kwargs):
+    db = SessionLocal()
+    try:
+        return query_entity_set(db, **kwargs)
+    finally:
+        db.close()
+
+@app.get("/odata/{entity_set}", summary="Lire un ensemble d'entités OData", tags=["OData"])
+async def odata_entity_set(
+    request: Request,
+    entity_set: str,
+    filter_expression: Optional[str] = Query(None, alias="$filter", description="Filtre (eq, ne, gt, ge, lt, le, and, or, not, contains, startswith, endswith)"),
+    select_expression: Optional[str] = Query(None, alias="$select", description="Propriétés retournées, séparées par des virgules"),
+    orderby: Optional[str] = Query(None, alias="$orderby", description="Tri (ex: timestamp desc,id)"),
+    top: Optional[int] = Query(None, alias="$top", description="Nombre maximal de lignes", ge=0),
+    skip: int = Query(0, alias="$skip", description="Lignes sautées", ge=0),
+    skiptoken: Optional[str] = Query(None, alias="$skiptoken", description="Reprise après la page précédente (@odata.nextLink)"),
+    count: bool = Query(False, alias="$count", description="Ajouter le nombre total de lignes (@odata.count)"),
+    range_start: Optional[str] = Query(None, alias="RangeStart", description="Actualisation incrémentielle: début de la partition (timestamp inclus)"),
+    range_end: Optional[str] = Query(None, alias="RangeEnd", description="Actualisation incrémentielle: fin de la partition (timestamp exclu)"),
+    target: Optional[str] = Query(None, description="Limiter à une cible de collecte (par défaut toutes)")
+):
+    """
+    Lire les lignes d'une table avec les options de requête OData, exécutées par la base de données
+
+    Les pages font au plus ODATA_MAX_PAGE_SIZE lignes (ou la taille demandée
+    par l'en-tête `Prefer: odata.maxpagesize`); la suivante est désignée par
+    `@odata.nextLink`.
+    """
+    if entity_set not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Ensemble d'entités inconnu: {entity_set}")
+    if target:
+        target = target_name(target)
+
+    max_page_size = None
+    prefer = request.headers.get("prefer", "")
+    match = re.search(r"odata\.maxpagesize=(\d+)", prefer)
+    if match and int(match.group(1)) > 0:
+        max_page_size = int(match.group(1))
+
+    try:
+        page = await run_blocking(
+            _run_odata_query, entity_set=entity_set, filter_expression=filter_expression,
+            select_expression=select_expression, orderby=orderby, top=top, skip=skip, skiptoken=skiptoken,
+            count=count, range_start=range_start, range_end=range_end, target=target, max_page_size=max_page_size
+        )
+        
+    except ODataQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture OData de {entity_set}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+    root = _odata_root(request)
+    context = f"{root}/$metadata#{entity_set}"
+    if select_expression and select_expression.strip() != "*":
+        context += f"({select_expression.replace(' ', '')})"
+    payload = {"@odata.context": context}
+    if page["count"] is not None:
+        payload["@odata.count"] = page["count"]
+    payload["value"] = page["value"]
+    if page["next"] is not None:
+        # Mêmes options que la requête courante, pagination remplacée
+        params = dict(request.query_params)
+        for key, value in page["next"].items():
+            params.pop(key, None)
+            if value is not None:
+                params[key] = value
+        payload["@odata.nextLink"] = str(request.url.replace_query_params(**params))
+
+    headers = dict(ODATA_HEADERS)
+    if max_page_size is not None:
+        headers["Preference-Applied"] = f"odata.maxpagesize={max_page_size}"
+    return Response(encode_json(payload), media_type="application/json;odata.metadata=minimal", headers=headers)
+
+def _get_collection_runs(limit: int, target: Optional[str]):
+    db = SessionLocal()
+    try:
+        return list_collection_runs(db, limit, target)
+    finally:
+        db.close()
+
+def _get_run_health_data(run_id: int):
+    db = SessionLocal()
+    try:
+        run = db.get(CollectionRun, run_id)
+        if run is None or run.status != "complete":
+            return None
+        return load_run_health_data(db, run)
+    finally:
+        db.close()
+
+@app.get("/api/runs", summary="Lister les cycles de collecte", tags=["Historique"])
+async def get_collection_runs(
+    limit: int = Query(50, description="Nombre de cycles à récupérer", ge=1, le=500),
+    target: Optional[str] = Query(None, description="Limiter à une cible de collecte (par défaut toutes)")
+):
+    """
+    Lister les derniers cycles de collecte
+    """
+    if target:
+        target = target_name(target)
+    try:
+        return {"runs": await run_blocking(_get_collection_runs, limit, target)}
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des cycles de collecte: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+@app.get("/api/runs/{run_id}/dashboard", response_model=DashboardData, summary="Récupérer le tableau de bord d'un cycle de collecte", tags=["Historique"])
+async def get_run_dashboard_data(run_id: int):
+    """
+    Récupérer les données du tableau de bord telles que collectées lors d'un cycle donné
+    """
+    dashboard_data = await run_blocking(_get_run_health_data, run_id)
+    if dashboard_data is None:
+        raise HTTPException(status_code=404, detail="Cycle de collecte inconnu ou incomplet")
+    return dashboard_data
+
+def _run_history_query(query, start: Optional[datetime], end: Optional[datetime], bucket: Optional[str], agg: str, **kwargs):
+    """
+    Valider les paramètres communs des séries historiques et exécuter la requête
+    """
+    end = end or datetime.now()
+    start = start or end - timedelta(hours=HISTORY_CONFIG["default_range_hours"])
+    if start >= end:
+        raise HistoryQueryError("La date de début doit précéder la date de fin")
+    
+    bucket_seconds = parse_bucket(bucket) if bucket else None
+    aggregations = parse_aggregations(agg)
+    
+    db = SessionLocal()
+    try:
+        return query(db, start, end, bucket_seconds, aggregations, **kwargs)
+    finally:
+        db.close()
+
+async def _history_response(query, start, end, bucket, agg, **kwargs):
+    try:
+        return await run_blocking(_run_history_query, query, start, end, bucket, agg, **kwargs)
+        
+    except HistoryQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de l'historique: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+@app.get("/api/history/system", summary="Historique de la santé du système", tags=["Historique"])
+async def get_system_history(
+    start: Optional[datetime] = Query(None, alias="from", description="Début de la période (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Fin de la période (ISO 8601)"),
+    bucket: Optional[str] = Query(None, description="Taille des intervalles (ex: 30s, 5m, 1h, 1d)"),
+    agg: str = Query("avg", description="Agrégations séparées par des virgules: avg, min, max, last, sum"),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
+    """
+    Récupérer l'historique agrégé de l'utilisation CPU, mémoire, disque et de la latence réseau
+    """
+    return await _history_response(system_history, start, end, bucket, agg, target=target_name(target))
+
+@app.get("/api/history/components", summary="Historique de l'état des composants", tags=["Historique"])
+async def get_components_history(
+    start: Optional[datetime] = Query(None, alias="from", description="Début de la période (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Fin de la période (ISO 8601)"),
+    bucket: Optional[str] = Query(None, description="Taille des intervalles (ex: 30s, 5m, 1h, 1d)"),
+    agg: str = Query("avg", description="Agrégations séparées par des virgules: avg, min, max, last, sum"),
+    component_type: Optional[str] = Query(None, description="Limiter à un type de composant"),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
+    """
+    Récupérer l'historique agrégé des composants connectés et déconnectés par type
+    """
+    return await _history_response(components_history, start, end, bucket, agg, component_type=component_type,
+                                   target=target_name(target))
+
+@app.get("/api/history/accounts", summary="Historique de l'état des comptes", tags=["Historique"])
+async def get_accounts_history(
+    start: Optional[datetime] = Query(None, alias="from", description="Début de la période (ISO 8601)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Fin de la période (ISO 8601)"),
+    bucket: Optional[str] = Query(None, description="Taille des intervalles (ex: 30s, 5m, 1h, 1d)"),
+    agg: str = Query("avg", description="Agrégations séparées par des virgules: avg, min, max, last, sum"),
+    target: Optional[str] = Query(None, description=TARGET_DESCRIPTION)
+):
+    """
+    Récupérer l'historique agrégé de l'état des comptes
+    """
+    return await _history_response(accounts_history, start, end, bucket, agg, target=target_name(target))
+
+@app.post("/api/collect", status_code=202, summary="Forcer la collecte de données", tags=["Administration"])
+async def force_collect_data(
+    target: Optional[str] = Query(None, description="Cible à collecter (par défaut toutes les cibles)")
+):
     """
     Forcer la collecte de données
+
+    Avec `target`, retourne la tâche de collecte de cette cible ; sans, les
+    tâches de toutes les cibles, exécutées en parallèle. Si une collecte est
+    déjà en cours pour une cible, c'est cette tâche qui est retournée. Un
+    processus qui n'est pas le planificateur transmet la demande au processus
+    élu : l'identifiant de la tâche est alors celui de la demande en base.
     """
+    if target:
+        target = target_name(target)
     try:
-        # Exécuter la collecte en arrière-plan
-        background_tasks.add_task(collector.collect_and_store_health_data)
-        return {"status": "collection started", "timestamp": datetime.now().isoformat()}
+        if target:
+            job = await run_blocking(collector.request_collection, target=target)
+            return {**job.to_dict(), "timestamp": datetime.now().isoformat()}
+        
+        jobs = await run_blocking(collector.request_all_collections)
+        return {"jobs": [job.to_dict() for job in jobs], "timestamp": datetime.now().isoformat()}
         
     except Exception as e:
         logger.error(f"Erreur lors de la collecte forcée des données: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+@app.get("/api/collect/{job_id}", summary="Consulter l'état d'une collecte", tags=["Administration"])
+async def get_collect_job(job_id: str):
+    """
+    Consulter l'état d'une tâche de collecte
+    """
+    job = await run_blocking(collector.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Tâche de collecte inconnue")
+    return job.to_dict()
+
+@app.get("/api/maintenance/scheduler", summary="Consulter le planificateur des collectes", tags=["Administration"])
+async def get_scheduler_status():
+    """
+    Consulter le processus élu pour les collectes planifiées, la compaction et la purge
+    """
+    try:
+        return {
+            "embedded": COLLECTOR_CONFIG["embedded"],
+            **await run_blocking(scheduler_election.to_dict)
+        }
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la consultation du planificateur: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+@app.get("/api/maintenance/retention", summary="Consulter la rétention des données", tags=["Administration"])
+async def get_retention_status():
+    """
+    Consulter la politique de rétention et les métriques des purges (lignes purgées, durée)
+    """
+    return retention_job.status()
+
 # Fonction pour exécuter l'API
 def run_api():
     """
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Set
+
+from app.config import STREAM_CONFIG
+from app.http_cache import encode_json
+from app.snapshot import HealthSnapshot
+from app.targets import resolve_target
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='api.log'
+)
+logger = logging.getLogger('broadcast')
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> bytes:
+    """
+    Encoder un message Server-Sent Events
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: ")
+    return ("\n".join(lines)).encode("utf-8") + encode_json(data) + b"\n\n"
+
+def snapshot_message(snapshot: HealthSnapshot) -> bytes:
+    """
+    Message contenant l'état complet d'un instantané
+
+    L'instantané est identifié par l'empreinte de son contenu, identique
+    dans tous les processus de l'API : sa version est propre à chacun.
+    """
+    return format_sse("snapshot", {"version": snapshot.digest, "data": snapshot.data}, snapshot.digest)
+
+class Subscriber:
+    def __init__(self, queue_size: int, target: str):
+        """
+        Client connecté au flux d'une cible : file de messages bornée
+        """
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.target = target
+        self.resync = False
+
+class BroadcastHub:
+    def __init__(self):
+        """
+        Diffusion en mémoire des instantanés vers les clients connectés au flux
+
+        Chaque nouvel instantané est comparé au précédent de la même cible et
+        le message de différence est encodé une seule fois, puis déposé dans
+        la file de chaque abonné de la cible depuis la boucle d'événements du serveur.
+        """
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._last: Dict[str, HealthSnapshot] = {}
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """
+        Associer le hub à la boucle d'événements du serveur
+        """
+        self.loop = loop
+
+    def current(self, target: Optional[str] = None) -> Optional[HealthSnapshot]:
+        """
+        Dernier instantané diffusé d'une cible, base des différences envoyées aux clients
+        """
+        return self._last.get(resolve_target(target))
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, target: Optional[str] = None) -> Subscriber:
+        """
+        Abonner un client au flux d'une cible (depuis la boucle d'événements du serveur)
+        """
+        subscriber = Subscriber(STREAM_CONFIG["queue_size"], resolve_target(target))
+        with self._lock:
+            self._subscribers.setdefault(subscriber.target, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.get(subscriber.target, set()).discard(subscriber)
+
+    def publish_snapshot(self, snapshot: HealthSnapshot):
+        """
+        Diffuser un nouvel instantané (appelé depuis n'importe quel thread)
+
+        Seules les sections modifiées depuis l'instantané précédent sont envoyées.
+        """
+        target = resolve_target(snapshot.target)
+        with self._lock:
+            previous = self._last.get(target)
+            if previous is None:
+                message = snapshot_message(snapshot)
+            else:
+                changed = {
+                    section: value
+                    for section, value in snapshot.data.items()
+                    if previous.data.get(section) != value
+                }
+                removed = [section for section in previous.data if section not in snapshot.data]
+                if not changed and not removed:
+                    # Données identiques (rechargement) : les clients restent sur la version diffusée
+                    return
+                message = format_sse("diff", {
+                    "version": snapshot.digest,
+                    "base_version": previous.digest,
+                    "changed": changed,
+                    "removed": removed
+                }, snapshot.digest)
+
+            self._last[target] = snapshot
+            subscribers = list(self._subscribers.get(target, ()))
+
+        if not subscribers or self.loop is None or self.loop.is_closed():
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, subscribers, message)
+        except RuntimeError:
+            # Boucle arrêtée pendant la diffusion (arrêt du serveur)
+            pass
+
+    def _deliver(self, subscribers, message: bytes):
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Client trop lent : il recevra l'état complet au lieu des différences manquées
+                subscriber.resync = True
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(b"")
+                logger.warning("Client du flux en retard, resynchronisation complète")
+
+# Créer une instance singleton du hub de diffusion
+hub = BroadcastHub()
@@ -0,0 +1,57 @@
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import DB_CONFIG
+from app.metrics import DB_ROWS_WRITTEN, DB_WRITE_DURATION
+from app.tracing import span
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('bulk_insert')
+
+def _chunks(rows: Sequence[Dict[str, Any]], size: int) -> Iterator[Sequence[Dict[str, Any]]]:
+    """
+    Découper les lignes en lots de taille bornée
+    """
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def bulk_insert(db: Session, model, rows: Sequence[Dict[str, Any]], return_ids: bool = False,
+                chunk_size: int = None) -> List[int]:
+    """
+    Insérer des lignes par lots avec un INSERT Core en mode executemany
+
+    SQLAlchemy regroupe chaque lot en INSERT multi-lignes (ou utilise
+    fast_executemany avec pyodbc) au lieu d'un aller-retour par objet ORM.
+    Si `return_ids` est vrai, les identifiants générés sont retournés dans
+    l'ordre des lignes fournies (RETURNING, ou OUTPUT sur SQL Server).
+    La durée des insertions et le nombre de lignes sont mesurés par table
+    (et tracés dans un span "db.bulk_insert").
+    """
+    if not rows:
+        return []
+
+    chunk_size = chunk_size or DB_CONFIG["bulk_chunk_size"]
+    ids: List[int] = []
+    started = time.perf_counter()
+
+    with span("db.bulk_insert", **{"db.table": model.__tablename__, "db.rows": len(rows)}):
+        for chunk in _chunks(rows, chunk_size):
+            if return_ids:
+                statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+                ids.extend(db.execute(statement, list(chunk)).scalars().all())
+            else:
+                db.execute(insert(model.__table__), list(chunk))
+
+    DB_WRITE_DURATION.labels(model.__tablename__).observe(time.perf_counter() - started)
+    DB_ROWS_WRITTEN.labels(model.__tablename__).inc(len(rows))
+    logger.debug(f"{len(rows)} lignes insérées dans {model.__tablename__}")
+    return ids
@@ -0,0 +1,65 @@
+"""
+Processus collecteur autonome
+
+Exécute les collectes planifiées, la compaction et la purge hors des
+processus de l'API, qui ne font alors que lire les cycles stockés
+(COLLECTOR_EMBEDDED=false). Plusieurs collecteurs peuvent être démarrés
+pour la haute disponibilité : un seul est élu à la fois.
+
+Usage:
+    python -m app.collector
+"""
+import logging
+import signal
+import threading
+
+from prometheus_client import start_http_server
+
+from app.config import METRICS_CONFIG
+from app.health_collector import collector
+from app.leader import scheduler_election
+from app.metrics import record_snapshot
+from app.tracing import configure_tracing, shutdown_tracing
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('collector')
+
+def main():
+    """
+    Point d'entrée du processus collecteur
+    """
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info(f"Signal {signum} reçu, arrêt du collecteur")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    logger.info("Démarrage du processus collecteur")
+    for target in collector.targets.values():
+        target.snapshots.add_listener(record_snapshot)
+    if METRICS_CONFIG["enabled"] and METRICS_CONFIG["collector_port"]:
+        # Métriques des collectes de ce processus, hors /metrics de l'API
+        start_http_server(METRICS_CONFIG["collector_port"])
+        logger.info(f"Métriques exposées sur le port {METRICS_CONFIG['collector_port']}")
+    # Les collectes planifiées sont des traces racines (échantillonnées selon TRACING_SAMPLE_RATIO)
+    configure_tracing()
+    scheduler_election.start()
+    try:
+        stop_event.wait()
+    finally:
+        # Libérer le bail pour qu'un autre collecteur prenne le relais sans attendre son échéance
+        scheduler_election.stop()
+        collector.stop()
+        shutdown_tracing()
+        logger.info("Processus collecteur arrêté")
+
+if __name__ == "__main__":
+    main()
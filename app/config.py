@@ -14,7 +14,30 @@ CYBERARK_API = {
     "username": os.getenv("CYBERARK_USERNAME", ""),
     "password": os.getenv("CYBERARK_PASSWORD", ""),
     "timeout": int(os.getenv("CYBERARK_API_TIMEOUT", "30")),
-    "verify_ssl": os.getenv("CYBERARK_API_VERIFY_SSL", "true").lower() == "true"
+    "verify_ssl": os.getenv("CYBERARK_API_VERIFY_SSL", "true").lower() == "true",
+    "max_connections": int(os.getenv("CYBERARK_MAX_CONNECTIONS", "10")),  # Taille maximale du pool de connexions
+    "max_keepalive": int(os.getenv("CYBERARK_MAX_KEEPALIVE", "5")),  # Connexions conservées ouvertes (keep-alive)
+    "keepalive_expiry": int(os.getenv("CYBERARK_KEEPALIVE_EXPIRY", "30")),  # Durée en secondes avant fermeture d'une connexion inactive
+    "http2": os.getenv("CYBERARK_HTTP2", "false").lower() == "true",  # Nécessite le paquet h2
+    # Nœuds PVWA supplémentaires, séparés par des virgules, pour les lectures redondées (CYBERARK_API_URL par défaut)
+    "base_urls": [url.strip() for url in os.getenv("CYBERARK_API_URLS", "").split(",") if url.strip()],
+    # Délais en secondes par endpoint (préfixe de chemin), CYBERARK_API_TIMEOUT pour les autres
+    "endpoint_timeouts": os.getenv(
+        "CYBERARK_ENDPOINT_TIMEOUTS",
+        "Logon=15,Components=10,Safes/Statistics=10,Accounts/Statistics=10,System/Health=5,Activities=15"
+    ),
+    "retry_attempts": int(os.getenv("CYBERARK_RETRY_ATTEMPTS", "3")),  # Tentatives par requête, première comprise
+    "retry_base_delay": float(os.getenv("CYBERARK_RETRY_BASE_DELAY", "0.2")),  # Attente initiale en secondes, doublée à chaque tentative
+    "retry_max_delay": float(os.getenv("CYBERARK_RETRY_MAX_DELAY", "2")),
+    "breaker_failure_threshold": int(os.getenv("CYBERARK_BREAKER_FAILURES", "5")),  # Échecs consécutifs avant ouverture du disjoncteur
+    "breaker_reset_timeout": float(os.getenv("CYBERARK_BREAKER_RESET", "30")),  # Secondes avant un appel d'essai
+    "hedge_delay": float(os.getenv("CYBERARK_HEDGE_DELAY", "0")),  # Secondes avant de relancer une lecture sur le nœud suivant (0: désactivé)
+    "token_lifetime": int(os.getenv("CYBERARK_TOKEN_LIFETIME", "28800")),  # Durée de validité en secondes d'un jeton de session (défaut: 8 heures)
+    "token_refresh": os.getenv("CYBERARK_TOKEN_REFRESH", "true").lower() == "true",  # Renouveler le jeton en arrière-plan avant son expiration
+    "token_refresh_before": int(os.getenv("CYBERARK_TOKEN_REFRESH_BEFORE", "600")),  # Secondes avant l'expiration où le jeton est renouvelé
+    # Partage du jeton entre les processus d'un même hôte : vide (aucun), "file" ou "sqlite"
+    "token_store": os.getenv("CYBERARK_TOKEN_STORE", "").lower(),
+    "token_store_path": os.getenv("CYBERARK_TOKEN_STORE_PATH", "cyberark_tokens"),  # Fichier partagé (extension .json ou .db ajoutée si absente)
 }
 
 # Configuration de la base de données
@@ -24,17 +47,171 @@ DB_CONFIG = {
     "database": os.getenv("DB_NAME", "CyberArkHealthDB"),
     "username": os.getenv("DB_USERNAME", "sa"),
     "password": os.getenv("DB_PASSWORD", ""),
-    "connection_string": os.getenv("DB_CONNECTION_STRING", "")
+    "connection_string": os.getenv("DB_CONNECTION_STRING", ""),
+    "bulk_chunk_size": int(os.getenv("DB_BULK_CHUNK_SIZE", "1000")),  # Lignes par lot d'insertion
+    "fast_executemany": os.getenv("DB_FAST_EXECUTEMANY", "true").lower() == "true",  # Accélère les insertions par lots avec pyodbc
+    "full_text_search": os.getenv("DB_FULL_TEXT_SEARCH", "true").lower() == "true"  # Index plein texte des événements (FTS5 sous SQLite, recherche en texte intégral sous SQL Server)
 }
 
+# Sections des données de santé, collectées chacune à son propre intervalle
+COLLECTION_SECTIONS = ("component_status", "vault_status", "accounts_status", "system_health", "events")
+
+# Clés des données de santé apportées par chaque section
+SECTION_DATA_KEYS = {
+    "component_status": ("component_status", "component_details"),
+    "vault_status": ("vault_status",),
+    "accounts_status": ("accounts_status",),
+    "system_health": ("system_health",),
+    "events": ("recent_activities", "failed_logins"),
+}
+
+def _section_intervals(value: str, default: int) -> dict:
+    """
+    Lire les intervalles par section au format "system_health=30,component_status=120,events=15"
+
+    Les sections absentes sont collectées à l'intervalle par défaut.
+    """
+    intervals = {section: default for section in COLLECTION_SECTIONS}
+    for item in value.split(","):
+        section, _, seconds = item.partition("=")
+        if section.strip() in intervals and seconds.strip():
+            intervals[section.strip()] = float(seconds)
+    return intervals
+
 # Configuration du collecteur de données
 COLLECTOR_CONFIG = {
-    "interval": int(os.getenv("COLLECTOR_INTERVAL", "3600")),  # Intervalle en secondes (défaut: 1 heure)
+    "interval": int(os.getenv("COLLECTOR_INTERVAL", "3600")),  # Intervalle en secondes des sections sans intervalle propre (défaut: 1 heure)
+    # Intervalle en secondes par section : mesures volatiles fréquentes, statistiques coûteuses et stables rares
+    "section_intervals": os.getenv(
+        "COLLECTOR_SECTION_INTERVALS",
+        "system_health=30,component_status=120,vault_status=3600,accounts_status=3600,events=15"
+    ),
+    "jitter": float(os.getenv("COLLECTOR_JITTER", "0.1")),  # Décalage aléatoire maximal, en fraction de l'intervalle de la section
     "components_to_check": os.getenv("COMPONENTS_TO_CHECK", "CPM,PSM,PVWA,AAM Credential Provider").split(","),
+    "max_staleness": int(os.getenv("SNAPSHOT_MAX_STALENESS", "300")),  # Âge maximal en secondes de l'instantané servi par l'API
+    "max_parallel_targets": int(os.getenv("COLLECTOR_MAX_PARALLEL_TARGETS", "4")),  # Cibles collectées simultanément
+    # Planificateur dans les processus de l'API (un seul élu à la fois) ; false : processus dédié (python -m app.collector)
+    "embedded": os.getenv("COLLECTOR_EMBEDDED", "true").lower() == "true",
+    "lease_ttl": int(os.getenv("COLLECTOR_LEASE_TTL", "30")),  # Durée en secondes du bail du planificateur, renouvelé au tiers
+    "poll_interval": float(os.getenv("SNAPSHOT_POLL_INTERVAL", "5")),  # Secondes entre deux recherches d'un nouveau cycle par les lecteurs
+}
+
+def _target_config(name: str) -> dict:
+    """
+    Paramètres d'une cible de collecte : variables CYBERARK_<CIBLE>_*, à défaut les valeurs globales
+    """
+    prefix = f"CYBERARK_{name.upper().replace('-', '_')}_"
+    
+    def setting(key: str, default):
+        return os.getenv(prefix + key, default)
+    
+    base_urls = setting("API_URLS", None)
+    interval = setting("INTERVAL", None)
+    # Une cible avec son propre intervalle collecte toutes ses sections à cet intervalle, sauf intervalles par section
+    section_intervals = setting("SECTION_INTERVALS", "" if interval is not None else COLLECTOR_CONFIG["section_intervals"])
+    interval = int(interval if interval is not None else COLLECTOR_CONFIG["interval"])
+    return {
+        **CYBERARK_API,
+        "name": name,
+        "base_url": setting("API_URL", CYBERARK_API["base_url"]),
+        "auth_type": setting("AUTH_TYPE", CYBERARK_API["auth_type"]),
+        "username": setting("USERNAME", CYBERARK_API["username"]),
+        "password": setting("PASSWORD", CYBERARK_API["password"]),
+        "verify_ssl": str(setting("API_VERIFY_SSL", CYBERARK_API["verify_ssl"])).lower() == "true",
+        "base_urls": CYBERARK_API["base_urls"] if base_urls is None else [url.strip() for url in base_urls.split(",") if url.strip()],
+        "interval": interval,  # Intervalle des sections sans intervalle propre
+        "section_intervals": _section_intervals(section_intervals, interval),
+    }
+
+# Cibles de collecte (environnements PVWA : production, secours, régions...), séparées par des virgules.
+# La première cible est celle servie par défaut par l'API et reprend les données stockées sans cible.
+COLLECTION_TARGETS = [
+    _target_config(name.strip())
+    for name in os.getenv("CYBERARK_TARGETS", "default").split(",")
+    if name.strip()
+] or [_target_config("default")]
+
+# Configuration des séries historiques (/api/history/*)
+HISTORY_CONFIG = {
+    "max_points": int(os.getenv("HISTORY_MAX_POINTS", "500")),  # Nombre maximal de points retournés, quelle que soit la période
+    "default_range_hours": int(os.getenv("HISTORY_DEFAULT_RANGE_HOURS", "24")),  # Période par défaut si "from" n'est pas fourni
+}
+
+# Configuration des agrégats horaires et journaliers
+ROLLUP_CONFIG = {
+    "enabled": os.getenv("ROLLUP_ENABLED", "true").lower() == "true",
+    "interval": int(os.getenv("ROLLUP_INTERVAL", "900")),  # Intervalle en secondes entre deux passes de compaction
+    "raw_retention_days": int(os.getenv("ROLLUP_RAW_RETENTION_DAYS", "0")),  # 0: conserver indéfiniment les mesures brutes
+    "purge_batch_size": int(os.getenv("ROLLUP_PURGE_BATCH_SIZE", "5000")),  # Lignes supprimées par transaction
+}
+
+# Configuration de la rétention des données
+RETENTION_CONFIG = {
+    "enabled": os.getenv("RETENTION_ENABLED", "true").lower() == "true",
+    "interval": int(os.getenv("RETENTION_INTERVAL", "3600")),  # Intervalle en secondes entre deux purges
+    "batch_size": int(os.getenv("RETENTION_BATCH_SIZE", "5000")),  # Lignes supprimées par transaction
+    "batch_pause": float(os.getenv("RETENTION_BATCH_PAUSE", "0.1")),  # Pause en secondes entre deux lots, pour laisser passer les écritures
+    "archive": os.getenv("RETENTION_ARCHIVE", "false").lower() == "true",  # Copier les lignes purgées dans les tables d'archive
+    "max_age_days": {  # Âge maximal en jours par table (0: conserver indéfiniment)
+        "security_events": int(os.getenv("RETENTION_SECURITY_EVENTS_DAYS", "90")),
+        "vault_status": int(os.getenv("RETENTION_VAULT_STATUS_DAYS", "0")),
+        "collection_runs": int(os.getenv("RETENTION_COLLECTION_RUNS_DAYS", "0")),
+    },
+}
+
+# Flux de mises à jour poussées au tableau de bord (/api/stream)
+STREAM_CONFIG = {
+    "heartbeat": int(os.getenv("STREAM_HEARTBEAT", "15")),  # Intervalle en secondes des messages de maintien de connexion
+    "queue_size": int(os.getenv("STREAM_QUEUE_SIZE", "16")),  # Messages en attente par client avant resynchronisation complète
+    "retry": int(os.getenv("STREAM_RETRY_MS", "5000")),  # Délai de reconnexion suggéré aux navigateurs, en millisecondes
+}
+
+# Réponses conditionnelles et compression des endpoints du tableau de bord
+HTTP_CACHE_CONFIG = {
+    "compression_min_size": int(os.getenv("HTTP_COMPRESSION_MIN_SIZE", "1024")),  # Taille minimale en octets d'un corps compressé
+    "gzip_level": int(os.getenv("HTTP_GZIP_LEVEL", "6")),
+    "brotli_quality": int(os.getenv("HTTP_BROTLI_QUALITY", "5")),  # Nécessite le paquet brotli
+}
+
+# Métriques Prometheus (/metrics)
+METRICS_CONFIG = {
+    "enabled": os.getenv("METRICS_ENABLED", "true").lower() == "true",
+    # Port du serveur de métriques du collecteur autonome (python -m app.collector) ; 0 : désactivé
+    "collector_port": int(os.getenv("METRICS_COLLECTOR_PORT", "0")),
+}
+
+# Traces OpenTelemetry (paquets opentelemetry-sdk et, pour l'export OTLP, opentelemetry-exporter-otlp-proto-http)
+TRACING_CONFIG = {
+    "enabled": os.getenv("TRACING_ENABLED", "false").lower() == "true",
+    "exporter": os.getenv("TRACING_EXPORTER", "file"),  # "file" (JSON, un span par ligne) ou "otlp"
+    "file": os.getenv("TRACING_FILE", "traces.jsonl"),
+    "otlp_endpoint": os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"),
+    "sample_ratio": float(os.getenv("TRACING_SAMPLE_RATIO", "0.1")),  # Proportion des traces conservées
+    "service_name": os.getenv("TRACING_SERVICE_NAME", "cyberark-health-dashboard"),
+}
+
+# Export en masse des tables (/api/export/{table})
+EXPORT_CONFIG = {
+    "batch_size": int(os.getenv("EXPORT_BATCH_SIZE", "10000")),  # Lignes lues par lot et par groupe de lignes Parquet
+}
+
+# Écriture différée des cycles de collecte (file en mémoire, journal sur disque si la base est indisponible)
+WRITE_BEHIND_CONFIG = {
+    "enabled": os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true",
+    "queue_size": int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "64")),  # Cycles en mémoire avant débordement dans le journal
+    "batch_size": int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "16")),  # Cycles écrits par transaction
+    "retry_interval": float(os.getenv("WRITE_BEHIND_RETRY_INTERVAL", "5")),  # Secondes entre deux tentatives si la base est indisponible
+    "journal_dir": os.getenv("WRITE_BEHIND_JOURNAL_DIR", "spool"),  # Répertoire local du journal
+}
+
+# Flux OData des tables pour Power BI (/odata)
+ODATA_CONFIG = {
+    "max_page_size": int(os.getenv("ODATA_MAX_PAGE_SIZE", "5000")),  # Lignes par page, les suivantes via @odata.nextLink
 }
 
 # Configuration de l'API
 API_CONFIG = {
     "host": os.getenv("API_HOST", "0.0.0.0"),
     "port": int(os.getenv("API_PORT", "8000")),
+    "blocking_workers": int(os.getenv("API_BLOCKING_WORKERS", "8")),  # Threads dédiés aux accès bloquants (base de données, collecte)
 }
\ No newline at end of file
@@ -2,8 +2,9 @@ import requests
 import logging
 import json
 import os
+import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 from requests.exceptions import RequestException
 
 from app.config import CYBERARK_API, DEMO_MODE
@@ -16,21 +17,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger('cyberark_api')
 
+# Un jeton est considéré expiré un peu avant son échéance (au plus 5 minutes, un quart de sa durée
+# pour les jetons courts), pour ne pas être rejeté en cours de collecte
+TOKEN_EXPIRY_MARGIN = timedelta(minutes=5)
+
 class CyberArkAPI:
-    def __init__(self):
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
         """
         Initialiser l'API CyberArk selon la documentation officielle
         https://docs.cyberark.com/pam-self-hosted/14.2/en/content/webservices/implementing%20privileged%20account%20security%20web%20services%20.htm
+
+        config: paramètres de la cible de collecte (CYBERARK_API par défaut)
         """
-        self.base_url = CYBERARK_API["base_url"]
-        self.username = CYBERARK_API["username"]
-        self.password = CYBERARK_API["password"]
-        self.auth_type = CYBERARK_API["auth_type"]
+        self.config = config or CYBERARK_API
+        self.base_url = self.config["base_url"]
+        self.username = self.config["username"]
+        self.password = self.config["password"]
+        self.auth_type = self.config["auth_type"]
         self.token = None
         self.token_expiry = None
         self.session = requests.Session()
-        self.verify_ssl = CYBERARK_API.get("verify_ssl", True)
-        self.timeout = CYBERARK_API.get("timeout", 30)
+        self.verify_ssl = self.config.get("verify_ssl", True)
+        self.timeout = self.config.get("timeout", 30)
+        self.token_lifetime = self.config.get("token_lifetime", 8 * 3600)  # Secondes
+        self.token_expiry_margin = min(TOKEN_EXPIRY_MARGIN, timedelta(seconds=self.token_lifetime / 4))
         self.demo_mode = DEMO_MODE
         self.demo_data = None
         
@@ -212,7 +222,7 @@ class CyberArkAPI:
         # En mode démo, simuler une connexion réussie
         if self.demo_mode:
             self.token = "demo_token"
-            self.token_expiry = datetime.now() + timedelta(hours=8)
+            self.token_expiry = datetime.now() + timedelta(seconds=self.token_lifetime)
             logger.info("Connecté avec succès (mode démo)")
             return True
             
@@ -262,8 +272,8 @@ class CyberArkAPI:
                 # Configurer l'en-tête d'autorisation pour les requêtes futures
                 self.session.headers.update({"Authorization": self.token})
                 
-                # Définir l'expiration du jeton (généralement 8 heures pour CyberArk)
-                self.token_expiry = datetime.now() + timedelta(hours=8)
+                # Définir l'expiration du jeton (CYBERARK_TOKEN_LIFETIME, 8 heures par défaut)
+                self.token_expiry = datetime.now() + timedelta(seconds=self.token_lifetime)
                 
                 logger.info("Connexion réussie à l'API CyberArk")
                 return True
@@ -282,7 +292,7 @@ class CyberArkAPI:
         if self.demo_mode:
             return True
             
-        return self.token is not None and self.token_expiry is not None and datetime.now() < (self.token_expiry - timedelta(minutes=5))
+        return self.token is not None and self.token_expiry is not None and datetime.now() < (self.token_expiry - self.token_expiry_margin)
     
     def ensure_logged_in(self) -> bool:
         """
@@ -0,0 +1,446 @@
+import asyncio
+import contextvars
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import httpx
+
+from app.config import COLLECTION_SECTIONS, SECTION_DATA_KEYS
+from app.cyberark_api import CyberArkAPI
+from app.metrics import CYBERARK_REQUEST_DURATION
+from app.resilience import RETRYABLE_STATUS_CODES, CircuitBreaker, RetryPolicy, endpoint_timeout
+from app.token_manager import TokenManager, token_store_from_config
+from app.tracing import add_event, span
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='cyberark_api.log'
+)
+logger = logging.getLogger('cyberark_async_api')
+
+# Vrai dans une lecture déjà autorisée par le disjoncteur : la reconnexion fait partie de cet appel
+_breaker_admitted: contextvars.ContextVar[bool] = contextvars.ContextVar("breaker_admitted", default=False)
+
+def _http2_available() -> bool:
+    """
+    Vérifier si le support HTTP/2 de httpx (paquet h2) est installé
+    """
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class AsyncCyberArkAPI(CyberArkAPI):
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Client asynchrone de l'API CyberArk avec pool de connexions borné
+
+        Les appels indépendants d'un cycle de collecte sont émis en parallèle,
+        de sorte qu'un cycle coûte environ la latence de l'appel le plus lent.
+        Chaque lecture a son propre délai, est relancée avec attente
+        exponentielle en cas d'erreur transitoire, et passe par un disjoncteur
+        qui fait échouer immédiatement les appels tant que le PVWA est dégradé.
+        Le jeton de session est géré par un TokenManager (connexion unique,
+        renouvellement avant expiration, partage optionnel entre processus).
+        Les méthodes synchrones héritées de CyberArkAPI restent disponibles.
+
+        config: paramètres de la cible de collecte (CYBERARK_API par défaut)
+        """
+        super().__init__(config)
+        self.max_connections = self.config.get("max_connections", 10)
+        self.max_keepalive = self.config.get("max_keepalive", 5)
+        self.keepalive_expiry = self.config.get("keepalive_expiry", 30)
+        self.http2 = self.config.get("http2", False)
+        self.client: Optional[httpx.AsyncClient] = None
+        self.tokens = TokenManager(self, token_store_from_config(self.config))
+        
+        # Nœuds PVWA interrogés pour les lectures redondées, le nœud principal en premier
+        self.nodes = [self.base_url] + [url for url in self.config.get("base_urls", []) if url != self.base_url]
+        self.hedge_delay = self.config.get("hedge_delay", 0)
+        self.retry = RetryPolicy(
+            self.config.get("retry_attempts", 3),
+            self.config.get("retry_base_delay", 0.2),
+            self.config.get("retry_max_delay", 2)
+        )
+        self.breaker = CircuitBreaker(
+            self.config.get("breaker_failure_threshold", 5),
+            self.config.get("breaker_reset_timeout", 30),
+            self.config.get("name", "pvwa")
+        )
+        self.token_refresh = self.config.get("token_refresh", True)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Créer le client HTTP asynchrone au premier usage (il est lié à la boucle courante)
+        """
+        if self.client is None:
+            http2 = self.http2
+            if http2 and not _http2_available():
+                logger.warning("HTTP/2 demandé mais le paquet h2 n'est pas installé, utilisation de HTTP/1.1")
+                http2 = False
+
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                verify=self.verify_ssl,
+                timeout=self.timeout,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            logger.info(f"Client HTTP asynchrone créé (connexions max: {self.max_connections}, HTTP/2: {http2})")
+        return self.client
+
+    async def aclose(self):
+        """
+        Fermer le client HTTP asynchrone et son pool de connexions
+        """
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def async_login(self) -> bool:
+        """
+        Se connecter à l'API CyberArk de manière asynchrone
+        """
+        if self.demo_mode:
+            return self.login()
+
+        if self.auth_type in ("cyberark", "ldap"):
+            data = {
+                "username": self.username,
+                "password": self.password,
+                "concurrentSession": True
+            }
+        elif self.auth_type == "radius":
+            data = {
+                "username": self.username,
+                "password": self.password
+            }
+        else:
+            logger.error(f"Type d'authentification non supporté: {self.auth_type}")
+            return False
+
+        if not _breaker_admitted.get() and not self.breaker.allow():
+            logger.warning("PVWA indisponible (disjoncteur ouvert), connexion non tentée")
+            return False
+
+        try:
+            with span("cyberark.login", **{"cyberark.target": self.breaker.name, "cyberark.auth_type": self.auth_type}) as current:
+                response = await self._get_client().post(
+                    f"/PasswordVault/API/auth/{self.auth_type}/Logon",
+                    json=data,
+                    timeout=endpoint_timeout("Logon")
+                )
+                current.set_attribute("http.status_code", response.status_code)
+
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            if response.status_code == 200:
+                self.token = response.text.strip('"')
+                self.token_expiry = datetime.now() + timedelta(seconds=self.token_lifetime)
+
+                # Partager le jeton avec la session synchrone héritée
+                self.session.headers.update({"Authorization": self.token})
+
+                logger.info("Connexion asynchrone réussie à l'API CyberArk")
+                return True
+            else:
+                logger.error(f"Échec de la connexion à l'API CyberArk: {response.status_code} - {response.text}")
+                return False
+
+        except httpx.HTTPError as e:
+            self.breaker.record_failure()
+            logger.error(f"Erreur de connexion à l'API CyberArk: {str(e)}")
+            return False
+
+    async def async_logoff(self, token: str) -> bool:
+        """
+        Fermer une session PVWA (jeton remplacé par un renouvellement)
+        """
+        try:
+            response = await self._get_client().post(
+                "/PasswordVault/API/auth/Logoff",
+                headers={"Authorization": token},
+                timeout=endpoint_timeout("Logoff")
+            )
+            return response.status_code == 200
+        except httpx.HTTPError as e:
+            logger.warning(f"Erreur lors de la fermeture de la session précédente: {str(e)}")
+            return False
+
+    async def async_ensure_logged_in(self) -> bool:
+        """
+        S'assurer que l'utilisateur est connecté, sans connexions concurrentes
+        """
+        return await self.tokens.ensure_token()
+
+    async def _get_once(self, node: str, path: str) -> httpx.Response:
+        """
+        Effectuer une requête GET authentifiée sur un nœud PVWA, avec le délai propre à l'endpoint
+        """
+        return await self._get_client().get(
+            f"{node}/PasswordVault/API/{self.api_version}/{path}",
+            headers={"Authorization": self.token},
+            timeout=endpoint_timeout(path)
+        )
+
+    async def _hedged_get(self, path: str) -> httpx.Response:
+        """
+        Lecture redondée : si le nœud principal n'a pas répondu après `hedge_delay`
+        secondes, la même requête est envoyée au nœud suivant, et ainsi de suite.
+        La première réponse exploitable est retenue, les autres requêtes sont annulées.
+        """
+        if self.hedge_delay <= 0 or len(self.nodes) == 1:
+            return await self._get_once(self.nodes[0], path)
+
+        pending = set()
+        last_error: Optional[BaseException] = None
+        last_response: Optional[httpx.Response] = None
+        nodes = iter(self.nodes)
+
+        try:
+            pending.add(asyncio.ensure_future(self._get_once(next(nodes), path)))
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=self.hedge_delay,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        response = task.result()
+                    except httpx.HTTPError as e:
+                        last_error = e
+                        continue
+                    if response.status_code not in RETRYABLE_STATUS_CODES:
+                        return response
+                    last_response = response
+
+                # Délai écoulé ou réponse en erreur : solliciter le nœud suivant
+                node = next(nodes, None)
+                if node is not None:
+                    pending.add(asyncio.ensure_future(self._get_once(node, path)))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    async def _get_json(self, path: str, default: Any) -> Any:
+        """
+        Effectuer une requête GET authentifiée et retourner le corps JSON
+
+        Les erreurs transitoires (réseau, délai dépassé, 429 et 5xx) sont
+        relancées selon la politique de nouvelles tentatives ; un échec
+        définitif est compté par le disjoncteur et `default` est retourné.
+        La durée de chaque lecture est mesurée par endpoint et par résultat,
+        et tracée dans un span "cyberark.get" si les traces sont activées.
+        """
+        endpoint = unquote(path)
+        with span("cyberark.get", **{"cyberark.target": self.breaker.name, "cyberark.endpoint": endpoint}) as current:
+            if endpoint.startswith("Components/") and endpoint.endswith("/Details"):
+                current.set_attribute("cyberark.component_type", endpoint[len("Components/"):-len("/Details")])
+
+            if not self.breaker.allow():
+                logger.debug(f"Appel à {path} court-circuité (disjoncteur ouvert)")
+                CYBERARK_REQUEST_DURATION.labels(self.breaker.name, endpoint, "short_circuited").observe(0)
+                current.set_attribute("cyberark.outcome", "short_circuited")
+                return default
+
+            # En demi-ouverture, cet appel est l'appel d'essai : il doit être libéré sur tous les chemins
+            trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+            admitted = _breaker_admitted.set(True)
+            started = time.perf_counter()
+            try:
+                result = await self._read_json(path, default)
+            finally:
+                _breaker_admitted.reset(admitted)
+                if trial:
+                    self.breaker.release()
+            outcome = "error" if result is default else "success"
+            CYBERARK_REQUEST_DURATION.labels(self.breaker.name, endpoint, outcome).observe(time.perf_counter() - started)
+            current.set_attribute("cyberark.outcome", outcome)
+            return result
+
+    async def _read_json(self, path: str, default: Any) -> Any:
+        """
+        Lecture authentifiée avec nouvelles tentatives et reconnexion (voir _get_json)
+        """
+        if not await self.async_ensure_logged_in():
+            return default
+
+        reauthenticated = False
+        for attempt in range(self.retry.attempts):
+            token = self.token
+            try:
+                response = await self._hedged_get(path)
+                if response.status_code == 401 and not reauthenticated:
+                    # Jeton expiré ou révoqué côté PVWA : une seule reconnexion pour tous les appels concurrents
+                    reauthenticated = True
+                    add_event("cyberark.unauthorized")
+                    if not await self.tokens.handle_unauthorized(token):
+                        return default
+                    response = await self._hedged_get(path)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Le PVWA a répondu : les erreurs 4xx ne relèvent pas du disjoncteur
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = f"{type(e).__name__}: {str(e)}"
+            except (httpx.HTTPError, ValueError) as e:
+                logger.error(f"Erreur lors de l'appel à {path}: {str(e)}")
+                return default
+
+            if attempt + 1 < self.retry.attempts:
+                delay = self.retry.delay(attempt)
+                logger.warning(f"Échec de l'appel à {path} ({error}), nouvelle tentative dans {delay:.2f} s")
+                add_event("cyberark.retry", attempt=attempt + 1, error=error, delay=delay)
+                await asyncio.sleep(delay)
+
+        self.breaker.record_failure()
+        logger.error(f"Échec de l'appel à {path} après {self.retry.attempts} tentatives ({error})")
+        return default
+
+    async def async_get_component_status(self) -> Dict[str, Any]:
+        """
+        Récupérer l'état des composants
+        """
+        if self.demo_mode and self.demo_data:
+            return self.get_component_status()
+        return await self._get_json("Components", {"Items": []})
+
+    async def async_get_component_details(self, component_type: str) -> List[Dict[str, Any]]:
+        """
+        Récupérer les détails des composants d'un type spécifique
+        """
+        if self.demo_mode and self.demo_data:
+            return self.get_component_details(component_type)
+
+        details = await self._get_json(f"Components/{quote(component_type)}/Details", [])
+        if isinstance(details, dict):
+            details = details.get("Components", [])
+        return details
+
+    async def async_get_vault_status(self) -> Dict[str, Any]:
+        """
+        Récupérer l'état du coffre-fort
+        """
+        if self.demo_mode and self.demo_data:
+            return self.get_vault_status()
+        return await self._get_json("Safes/Statistics", {"Safes": {}})
+
+    async def async_get_accounts_status(self) -> Dict[str, Any]:
+        """
+        Récupérer l'état des comptes
+        """
+        if self.demo_mode and self.demo_data:
+            return self.get_accounts_status()
+        return await self._get_json("Accounts/Statistics", {"value": {}})
+
+    async def async_get_system_health(self) -> Dict[str, Any]:
+        """
+        Récupérer l'état de santé du système
+        """
+        if self.demo_mode and self.demo_data:
+            return self.get_system_health()
+        return await self._get_json("System/Health", {})
+
+    async def async_get_recent_activities(self) -> List[Dict[str, Any]]:
+        """
+        Récupérer les activités récentes
+        """
+        if self.demo_mode and self.demo_data:
+            return self.get_recent_activities()
+        return await self._get_json("Activities", [])
+
+    async def async_get_failed_logins(self) -> List[Dict[str, Any]]:
+        """
+        Récupérer les tentatives de connexion échouées
+        """
+        if self.demo_mode and self.demo_data:
+            return self.get_failed_logins()
+        return await self._get_json("Activities/Failed", [])
+
+    async def async_get_all_health_data(self, component_types: Optional[List[str]] = None,
+                                        sections: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Récupérer les données de santé en parallèle
+
+        Seules les sections de `sections` (voir COLLECTION_SECTIONS ; toutes
+        par défaut) sont récupérées et retournées. Les détails des composants
+        de chaque type de `component_types` accompagnent la section
+        "component_status", sous la clé "component_details" ; la section
+        "events" regroupe "recent_activities" et "failed_logins".
+        """
+        component_types = component_types or []
+        sections = set(sections or COLLECTION_SECTIONS)
+
+        if self.demo_mode:
+            data, success = self.get_all_health_data()
+            if success:
+                data = dict(data)
+                data["component_details"] = {
+                    component_type: self.get_component_details(component_type)
+                    for component_type in component_types
+                }
+                keys = {key for section in sections for key in SECTION_DATA_KEYS[section]}
+                data = {key: value for key, value in data.items() if key in keys or key == "last_update"}
+            return data, success
+
+        # PVWA dégradé : échouer immédiatement plutôt que d'attendre les délais
+        if self.breaker.is_open():
+            logger.warning("PVWA indisponible (disjoncteur ouvert), collecte annulée")
+            return {}, False
+
+        # Se connecter une seule fois avant d'émettre les appels parallèles
+        with span("cyberark.ensure_logged_in", **{"cyberark.target": self.breaker.name}):
+            logged_in = await self.async_ensure_logged_in()
+        if not logged_in:
+            logger.error("Impossible de se connecter à l'API CyberArk")
+            return {}, False
+
+        calls = {}
+        if "component_status" in sections:
+            calls["component_status"] = self.async_get_component_status()
+        if "vault_status" in sections:
+            calls["vault_status"] = self.async_get_vault_status()
+        if "accounts_status" in sections:
+            calls["accounts_status"] = self.async_get_accounts_status()
+        if "system_health" in sections:
+            calls["system_health"] = self.async_get_system_health()
+        if "events" in sections:
+            calls["recent_activities"] = self.async_get_recent_activities()
+            calls["failed_logins"] = self.async_get_failed_logins()
+        details = component_types if "component_status" in sections else []
+
+        results = await asyncio.gather(
+            *calls.values(),
+            *[self.async_get_component_details(component_type) for component_type in details]
+        )
+        result = dict(zip(calls, results[:len(calls)]))
+
+        # Vérifier que les sections essentielles demandées ont été récupérées
+        required = [key for key in ("component_status", "vault_status", "accounts_status", "system_health") if key in result]
+        if not all(result[key] for key in required):
+            logger.error("Certaines données de santé n'ont pas pu être récupérées")
+            return {}, False
+
+        if "component_status" in sections:
+            result["component_details"] = dict(zip(details, results[len(calls):]))
+        result["last_update"] = datetime.now().isoformat()
+
+        return result, True
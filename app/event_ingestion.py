@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.bulk_insert import bulk_insert
+from app.models import IngestionCursor, SecurityEvent
+from app.targets import qualified_name
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('event_ingestion')
+
+# Nombre maximal d'empreintes par requête IN (limite de paramètres des pilotes)
+HASH_LOOKUP_CHUNK = 500
+
+def event_hash(source: str, event: Dict[str, Any]) -> str:
+    """
+    Empreinte SHA-256 du contenu d'un événement, indépendante de l'ordre des clés
+    """
+    payload = json.dumps({"source": source, "event": event}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def parse_event_timestamp(value: Any) -> Optional[datetime]:
+    """
+    Convertir la date d'un événement CyberArk (ISO 8601) en date locale naïve, comme le reste de la base
+    """
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+def _get_cursor(db: Session, source: str) -> IngestionCursor:
+    cursor = db.execute(select(IngestionCursor).where(IngestionCursor.source == source)).scalar_one_or_none()
+    if cursor is None:
+        cursor = IngestionCursor(source=source)
+        db.add(cursor)
+    return cursor
+
+def _existing_hashes(db: Session, hashes: List[str]) -> set:
+    existing = set()
+    for start in range(0, len(hashes), HASH_LOOKUP_CHUNK):
+        chunk = hashes[start:start + HASH_LOOKUP_CHUNK]
+        existing.update(db.execute(
+            select(SecurityEvent.event_hash).where(SecurityEvent.event_hash.in_(chunk))
+        ).scalars().all())
+    return existing
+
+def ingest_events(db: Session, source: str, events: List[Dict[str, Any]],
+                  to_row: Callable[[Dict[str, Any]], Dict[str, Any]], run_id: Optional[int],
+                  target: Optional[str] = None, collected_at: Optional[datetime] = None) -> int:
+    """
+    Stocker uniquement les événements d'une source qui ne l'ont pas encore été
+
+    L'API CyberArk retourne une fenêtre glissante : les événements antérieurs
+    au point de reprise (date du dernier événement stocké) sont ignorés sans
+    accès à la base, les autres sont dédupliqués par empreinte de contenu
+    (index unique). Le point de reprise est mis à jour dans la transaction du
+    cycle. Point de reprise et empreintes sont propres à chaque cible : deux
+    coffres qui retournent le même événement le stockent chacun. Les
+    événements sans date prennent l'heure de la collecte (`collected_at`,
+    maintenant par défaut).
+    Retourne le nombre d'événements insérés.
+    """
+    source = qualified_name(target, source)
+    cursor = _get_cursor(db, source)
+    now = collected_at or datetime.now()
+
+    candidates = {}
+    for event in events:
+        timestamp = parse_event_timestamp(event.get("Timestamp"))
+        # Même date que le point de reprise : l'empreinte tranche
+        if timestamp is not None and cursor.last_timestamp is not None and timestamp < cursor.last_timestamp:
+            continue
+        candidates.setdefault(event_hash(source, event), (event, timestamp))
+
+    existing = _existing_hashes(db, list(candidates)) if candidates else set()
+    new_events = [(digest, event, timestamp) for digest, (event, timestamp) in candidates.items() if digest not in existing]
+
+    rows = []
+    for digest, event, timestamp in new_events:
+        row = to_row(event)
+        row.update({
+            "collection_run_id": run_id,
+            "target": target,
+            "timestamp": timestamp or now,
+            "event_hash": digest,
+            "raw_data": json.dumps(event)
+        })
+        rows.append(row)
+    bulk_insert(db, SecurityEvent, rows)
+
+    dated = [(timestamp, digest) for digest, _, timestamp in new_events if timestamp is not None]
+    if dated:
+        last_timestamp, last_hash = max(dated)
+        if cursor.last_timestamp is None or last_timestamp >= cursor.last_timestamp:
+            cursor.last_timestamp = last_timestamp
+            cursor.last_hash = last_hash
+    cursor.updated_at = now
+
+    logger.debug(f"{source}: {len(rows)} nouveaux événements sur {len(events)} reçus")
+    return len(rows)
@@ -0,0 +1,236 @@
+import base64
+import binascii
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import column, literal_column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.config import DB_CONFIG
+from app.models import SECURITY_EVENTS_FTS, SecurityEvent
+from app.targets import PRIMARY_TARGET, target_condition
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='api.log'
+)
+logger = logging.getLogger('event_queries')
+
+# Colonnes filtrables par égalité, chacune couverte par un index (colonne, timestamp, id)
+EVENT_FILTERS = ("username", "source_ip", "severity", "event_type", "target_safe")
+
+# Type des événements de connexion échouée
+FAILED_LOGIN_EVENT_TYPE = "Failed Login"
+
+# Taille de page par défaut et maximale
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Termes d'une recherche plein texte : "expression" ou mot, suivis de * éventuel
+_SEARCH_TERM = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+MAX_SEARCH_TERMS = 10
+
+# Moteur de recherche détecté à la première recherche
+_search_backend: Optional[str] = None
+
+class EventQueryError(ValueError):
+    """
+    Paramètres de requête d'événements invalides
+    """
+
+def encode_cursor(timestamp: datetime, event_id: int) -> str:
+    """
+    Curseur opaque désignant la position (timestamp, id) du dernier événement d'une page
+    """
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{event_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Position (timestamp, id) désignée par un curseur retourné par query_security_events
+    """
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, event_id = value.split("|")
+        return datetime.fromisoformat(timestamp), int(event_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise EventQueryError(f"Curseur invalide: {cursor}")
+
+def event_to_dict(event: SecurityEvent) -> Dict[str, Any]:
+    """
+    Représentation d'un événement stocké pour l'API
+    """
+    return {
+        "id": event.id,
+        "target": event.target or PRIMARY_TARGET,
+        "timestamp": event.timestamp.isoformat(),
+        "event_type": event.event_type,
+        "username": event.username,
+        "source_ip": event.source_ip,
+        "target_safe": event.target_safe,
+        "target_account": event.target_account,
+        "severity": event.severity,
+        "description": event.description
+    }
+
+def event_conditions(target: Optional[str] = None, filters: Optional[Dict[str, Optional[str]]] = None,
+                     start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     limit: int = DEFAULT_PAGE_SIZE) -> List[Any]:
+    """
+    Valider les paramètres communs des requêtes d'événements et retourner leurs conditions
+    """
+    filters = {key: value for key, value in (filters or {}).items() if value is not None}
+    unknown = [key for key in filters if key not in EVENT_FILTERS]
+    if unknown:
+        raise EventQueryError(f"Filtres invalides: {', '.join(unknown)} (disponibles: {', '.join(EVENT_FILTERS)})")
+    if start is not None and end is not None and start >= end:
+        raise EventQueryError("La date de début doit précéder la date de fin")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise EventQueryError(f"Taille de page invalide: {limit} (1 à {MAX_PAGE_SIZE})")
+
+    conditions = [target_condition(SecurityEvent.target, target)]
+    conditions.extend(getattr(SecurityEvent, key) == value for key, value in filters.items())
+    if start is not None:
+        conditions.append(SecurityEvent.timestamp >= start)
+    if end is not None:
+        conditions.append(SecurityEvent.timestamp < end)
+    return conditions
+
+def _page(events: List[SecurityEvent], limit: int) -> Dict[str, Any]:
+    """
+    Page d'au plus `limit` événements, lus avec une ligne de plus pour savoir s'il en reste
+    """
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].timestamp, events[-1].id)
+
+    return {
+        "events": [event_to_dict(event) for event in events],
+        "next_cursor": next_cursor,
+        "limit": limit
+    }
+
+def query_security_events(db: Session, target: Optional[str] = None, filters: Optional[Dict[str, Optional[str]]] = None,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Lire une page d'événements de sécurité stockés, du plus récent au plus ancien
+
+    La pagination se fait par curseur sur (timestamp, id) : la page suivante
+    reprend strictement après le dernier événement de la page précédente,
+    sans OFFSET, si bien que son coût ne dépend pas de sa position. L'ordre
+    est stable même pour des événements de même date, et les événements
+    insérés entre deux pages ne décalent pas les suivantes. Les filtres
+    d'égalité (EVENT_FILTERS) et la période [start, end[ s'appuient sur les
+    index (colonne, timestamp, id) de la table.
+    """
+    statement = select(SecurityEvent).where(*event_conditions(target, filters, start, end, limit))
+    if cursor:
+        # (timestamp, id) < (t, i) sous une forme acceptée par SQL Server : la borne timestamp <= t
+        # permet de se positionner dans l'index au lieu de parcourir les lignes plus récentes
+        timestamp, event_id = decode_cursor(cursor)
+        statement = statement.where(
+            SecurityEvent.timestamp <= timestamp,
+            or_(SecurityEvent.timestamp < timestamp, SecurityEvent.id < event_id)
+        )
+
+    statement = statement.order_by(SecurityEvent.timestamp.desc(), SecurityEvent.id.desc()).limit(limit + 1)
+    return _page(db.execute(statement).scalars().all(), limit)
+
+def parse_search(query: str) -> List[Tuple[str, bool]]:
+    """
+    Découper une recherche en termes (mots ou "expressions"), suivis de * pour une recherche par préfixe
+
+    Retourne des couples (terme, préfixe). Tous les termes doivent être présents.
+    """
+    terms = []
+    for phrase, phrase_prefix, word in _SEARCH_TERM.findall(query):
+        term = (phrase + phrase_prefix or word).replace('"', "").strip()
+        prefix = term.endswith("*")
+        term = term.rstrip("*").strip()
+        if term:
+            terms.append((term, prefix))
+    if not terms:
+        raise EventQueryError("Recherche vide")
+    if len(terms) > MAX_SEARCH_TERMS:
+        raise EventQueryError(f"Recherche trop longue: {len(terms)} termes (maximum {MAX_SEARCH_TERMS})")
+    return terms
+
+def search_backend(db: Session) -> str:
+    """
+    Moteur de recherche plein texte disponible : "fts5" (SQLite), "fulltext" (SQL Server) ou "like" (parcours)
+    """
+    global _search_backend
+    if _search_backend is None:
+        backend = "like"
+        dialect = db.get_bind().dialect.name
+        if DB_CONFIG["full_text_search"] and dialect == "sqlite":
+            if db.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                          {"name": SECURITY_EVENTS_FTS}).first():
+                backend = "fts5"
+        elif DB_CONFIG["full_text_search"] and dialect == "mssql":
+            if db.execute(text("SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('security_events')")).first():
+                backend = "fulltext"
+        if backend == "like":
+            logger.warning("Index plein texte des événements indisponible, recherche par parcours (LIKE)")
+        _search_backend = backend
+    return _search_backend
+
+def search_security_events(db: Session, query: str, target: Optional[str] = None,
+                           filters: Optional[Dict[str, Optional[str]]] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Rechercher des événements par les mots de leur description et de leurs données brutes
+
+    La recherche utilise l'index plein texte de la base (voir
+    create_search_index) et se combine avec les filtres de
+    query_security_events. Les résultats sont triés du dernier événement
+    stocké au premier (identifiant décroissant) : l'index plein texte
+    fournit directement cet ordre, et chaque page reprend après le curseur
+    sans trier l'ensemble des correspondances.
+    """
+    terms = parse_search(query)
+    conditions = event_conditions(target, filters, start, end, limit)
+    backend = search_backend(db)
+
+    if backend == "fts5":
+        fts = table(SECURITY_EVENTS_FTS, column("rowid"))
+        # Chaque terme entre guillemets : la ponctuation (WIN-123, DOMAIN\user) n'est pas interprétée
+        expression = " ".join(f'"{term}"' + ("*" if prefix else "") for term, prefix in terms)
+        key = fts.c.rowid
+        statement = select(SecurityEvent).select_from(fts.join(SecurityEvent, SecurityEvent.id == fts.c.rowid)).where(
+            literal_column(SECURITY_EVENTS_FTS).op("MATCH")(expression)
+        )
+    elif backend == "fulltext":
+        expression = " AND ".join(f'"{term}*"' if prefix else f'"{term}"' for term, prefix in terms)
+        key = SecurityEvent.id
+        statement = select(SecurityEvent).where(
+            text("CONTAINS((security_events.description, security_events.raw_data), :search)").bindparams(search=expression)
+        )
+    else:
+        key = SecurityEvent.id
+        statement = select(SecurityEvent).where(*[
+            or_(SecurityEvent.description.icontains(term, autoescape=True),
+                SecurityEvent.raw_data.icontains(term, autoescape=True))
+            for term, _ in terms
+        ])
+
+    statement = statement.where(*conditions)
+    if cursor:
+        _, event_id = decode_cursor(cursor)
+        statement = statement.where(key < event_id)
+    statement = statement.order_by(key.desc()).limit(limit + 1)
+
+    try:
+        page = _page(db.execute(statement).scalars().all(), limit)
+    except OperationalError as e:
+        # Expression refusée par FTS5 (terme sans caractère indexable, par exemple)
+        raise EventQueryError(f"Recherche invalide: {query} ({e.orig})")
+    page["backend"] = backend
+    return page
@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+from app.config import API_CONFIG
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('executor')
+
+class BackgroundEventLoop:
+    def __init__(self, name: str = "cyberark-event-loop"):
+        """
+        Boucle asyncio dédiée exécutée dans un thread d'arrière-plan
+
+        Elle permet au code synchrone (collecteur, gestionnaires d'API) de
+        partager un même client HTTP asynchrone et son pool de connexions.
+        """
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """
+        Démarrer la boucle au premier usage
+        """
+        with self._lock:
+            if self.loop is None or self.loop.is_closed():
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever, name=self.name)
+                self.thread.daemon = True
+                self.thread.start()
+                logger.info(f"Boucle d'événements {self.name} démarrée")
+            return self.loop
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        Exécuter une coroutine sur la boucle et attendre son résultat depuis un thread synchrone
+        """
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result(timeout)
+
+    def submit(self, coro: Awaitable[Any]):
+        """
+        Planifier une coroutine sur la boucle sans attendre son résultat
+        """
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def stop(self):
+        """
+        Arrêter la boucle d'événements
+        """
+        with self._lock:
+            loop, thread = self.loop, self.thread
+            self.loop, self.thread = None, None
+
+        if loop is None:
+            return
+
+        loop.call_soon_threadsafe(loop.stop)
+        if thread:
+            thread.join(timeout=10)
+        loop.close()
+        logger.info(f"Boucle d'événements {self.name} arrêtée")
+
+# Pool de threads dimensionné pour le travail bloquant (SQLAlchemy synchrone, HTTP synchrone)
+# afin de ne jamais bloquer la boucle d'événements d'uvicorn
+blocking_executor = ThreadPoolExecutor(
+    max_workers=API_CONFIG["blocking_workers"],
+    thread_name_prefix="blocking"
+)
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Exécuter une fonction bloquante dans le pool de threads et attendre son résultat
+
+    Le contexte (contextvars) de l'appelant est propagé au thread d'exécution.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(blocking_executor, call)
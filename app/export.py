@@ -0,0 +1,213 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Any, Iterator, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+from sqlalchemy.orm import Session
+
+from app.config import EXPORT_CONFIG
+from app.models import AccountsStatus, Component, ComponentStatus, SecurityEvent, SystemHealth, VaultStatus
+from app.targets import target_condition
+
+try:
+    import orjson
+except ImportError:  # Encodeur de la bibliothèque standard, plus lent
+    orjson = None
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='api.log'
+)
+logger = logging.getLogger('export')
+
+# Tables exportables
+EXPORT_TABLES = {
+    "component_status": ComponentStatus,
+    "components": Component,
+    "system_health": SystemHealth,
+    "accounts_status": AccountsStatus,
+    "vault_status": VaultStatus,
+    "security_events": SecurityEvent,
+}
+
+# Formats d'export : type de contenu et extension du fichier
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+class ExportError(ValueError):
+    """
+    Paramètres d'export invalides
+    """
+
+def _pyarrow_modules():
+    """
+    Retourner les modules pyarrow et pyarrow.parquet s'ils sont installés
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow, pyarrow.parquet
+    except ImportError:
+        return None
+
+def parquet_available() -> bool:
+    return _pyarrow_modules() is not None
+
+def export_rows(db: Session, table: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                target: Optional[str] = None, batch_size: Optional[int] = None) -> Iterator[List[Sequence[Any]]]:
+    """
+    Lire les lignes d'une table par lots, dans l'ordre (timestamp, id), sur la période [start, end[
+
+    Les lignes sont lues avec un curseur côté serveur (yield_per) : la
+    mémoire utilisée est bornée par la taille d'un lot, quel que soit le
+    nombre de lignes exportées. Toutes les cibles sont exportées si `target`
+    n'est pas précisée.
+    """
+    model = EXPORT_TABLES[table]
+    statement = select(*model.__table__.columns)
+    if target:
+        statement = statement.where(target_condition(model.target, target))
+    if start is not None:
+        statement = statement.where(model.timestamp >= start)
+    if end is not None:
+        statement = statement.where(model.timestamp < end)
+    statement = statement.order_by(model.timestamp, model.id).execution_options(
+        yield_per=batch_size or EXPORT_CONFIG["batch_size"]
+    )
+
+    for rows in db.execute(statement).partitions():
+        yield rows
+
+def export_columns(table: str) -> List[str]:
+    return [column.name for column in EXPORT_TABLES[table].__table__.columns]
+
+def _csv_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _encode_csv(columns: List[str], batches: Iterator[List[Sequence[Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # En-tête seul si aucune ligne
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _encode_ndjson(columns: List[str], batches: Iterator[List[Sequence[Any]]]) -> Iterator[bytes]:
+    for rows in batches:
+        if orjson is not None:
+            yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+        else:
+            yield "".join(
+                json.dumps(dict(zip(columns, row)), default=lambda value: value.isoformat()) + "\n" for row in rows
+            ).encode("utf-8")
+
+class _StreamSink(io.RawIOBase):
+    """
+    Fichier en écriture seule dont le contenu est vidé après chaque groupe de lignes Parquet
+
+    La position retournée par tell() reste celle du flux complet : le pied
+    de fichier Parquet référence les groupes de lignes par leur position.
+    """
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _parquet_schema(pa, table: str):
+    """
+    Schéma Arrow de la table, pour que tous les groupes de lignes aient les mêmes types
+    """
+    fields = []
+    for column in EXPORT_TABLES[table].__table__.columns:
+        if isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+def _encode_parquet(table: str, columns: List[str], batches: Iterator[List[Sequence[Any]]]) -> Iterator[bytes]:
+    pa, pq = _pyarrow_modules()
+    schema = _parquet_schema(pa, table)
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for rows in batches:
+            # Un groupe de lignes par lot lu en base, envoyé dès qu'il est écrit
+            frame = pd.DataFrame.from_records(rows, columns=columns)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def encode_export(db: Session, table: str, export_format: str, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None, target: Optional[str] = None,
+                  batch_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Encoder l'export d'une table au format demandé, par morceaux d'un lot de lignes
+    """
+    columns = export_columns(table)
+    batches = export_rows(db, table, start, end, target, batch_size)
+    if export_format == "csv":
+        return _encode_csv(columns, batches)
+    if export_format == "ndjson":
+        return _encode_ndjson(columns, batches)
+    return _encode_parquet(table, columns, batches)
+
+def validate_export(table: str, export_format: str, start: Optional[datetime], end: Optional[datetime]):
+    """
+    Valider les paramètres d'un export avant l'envoi de la réponse
+    """
+    if table not in EXPORT_TABLES:
+        raise ExportError(f"Table inconnue: {table} (disponibles: {', '.join(EXPORT_TABLES)})")
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Format inconnu: {export_format} (disponibles: {', '.join(EXPORT_FORMATS)})")
+    if export_format == "parquet" and not parquet_available():
+        raise ExportError("Export Parquet indisponible: installez pyarrow")
+    if start is not None and end is not None and start >= end:
+        raise ExportError("La date de début doit précéder la date de fin")
+
+def export_filename(table: str, export_format: str, start: Optional[datetime], end: Optional[datetime]) -> str:
+    parts = [table]
+    if start is not None:
+        parts.append(start.strftime("%Y%m%dT%H%M%S"))
+    if end is not None:
+        parts.append(end.strftime("%Y%m%dT%H%M%S"))
+    return f"{'_'.join(parts)}.{EXPORT_FORMATS[export_format][1]}"
@@ -1,23 +1,39 @@
+import contextvars
 import threading
 import time
 import logging
-import json
-from datetime import datetime
+import random
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
 
-from app.cyberark_api import CyberArkAPI
+from app.cyberark_async_api import AsyncCyberArkAPI
+from app.executor import BackgroundEventLoop
+from app.bulk_insert import bulk_insert
+from app.event_ingestion import ingest_events
+from app.metrics import COLLECTION_DURATION, COLLECTION_LAST_SUCCESS, COLLECTION_SKIPPED_SLOTS, COLLECTED_SECTIONS
+from app.queries import latest_complete_run, load_latest_health_data, load_run_health_data
+from app.history import SOURCES
+from app.rollups import rewind_watermarks
+from app.snapshot import SnapshotStore, HealthSnapshot
+from app.targets import resolve_target
+from app.tracing import span
+from app.write_behind import WriteBehindQueue
 from app.models import (
     create_tables,
     SessionLocal,
+    CollectionRun,
+    CollectionRequest,
     ComponentStatus,
     Component,
     VaultStatus,
     AccountsStatus,
-    SystemHealth,
-    SecurityEvent
+    SystemHealth
 )
-from app.config import COLLECTOR_CONFIG
+from app.config import COLLECTION_SECTIONS, COLLECTION_TARGETS, COLLECTOR_CONFIG, SECTION_DATA_KEYS
 
 # Configuration du logging
 logging.basicConfig(
@@ -27,358 +43,1079 @@ logging.basicConfig(
 )
 logger = logging.getLogger('health_collector')
 
+# Nombre de tâches de collecte conservées pour la consultation de leur état
+MAX_TRACKED_JOBS = 50
+
+# Attente maximale en secondes de la boucle de planification (lecture des demandes des autres processus)
+SCHEDULER_TICK = 1.0
+
+# Attente maximale en secondes des collectes en cours à l'arrêt
+STOP_TIMEOUT = 30
+
+# Intervalle en secondes de suivi des collectes demandées au processus élu
+REMOTE_JOB_POLL_INTERVAL = 0.5
+
+# Attente maximale en secondes d'une collecte demandée au processus élu
+REMOTE_JOB_TIMEOUT = 600
+
+class CollectionJob:
+    def __init__(self, source: str = "api", target: Optional[str] = None, sections: Optional[Iterable[str]] = None):
+        """
+        Tâche de collecte de sections d'une cible (toutes par défaut), partagée
+        par toutes les requêtes qui l'attendent
+        """
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.target = target
+        self.sections = set(sections or COLLECTION_SECTIONS)
+        self.status = "pending"  # pending, running, succeeded, failed
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.future: Future = Future()
+        self.request_ids: List[int] = []  # Demandes d'autres processus servies par cette tâche
+        self.remote = False  # Tâche exécutée par le processus élu, suivie en base
+        self.written: Optional[Future] = None  # Écriture en base du cycle produit (écriture différée)
+        # Contexte de la demande (span courant), pour rattacher la collecte à la trace de la requête
+        self.context = contextvars.copy_context()
+    
+    @classmethod
+    def from_request(cls, request: CollectionRequest) -> "CollectionJob":
+        """
+        Tâche correspondant à une demande de collecte stockée en base
+        """
+        job = cls(request.source, request.target)
+        job.id = str(request.id)
+        job.remote = True
+        job.update_from_request(request)
+        return job
+    
+    def update_from_request(self, request: CollectionRequest):
+        self.status = request.status
+        self.error = request.error
+        self.created_at = request.requested_at
+        self.started_at = request.started_at
+        self.finished_at = request.finished_at
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Représentation de la tâche pour l'API
+        """
+        return {
+            "job_id": self.id,
+            "target": self.target,
+            "sections": [section for section in COLLECTION_SECTIONS if section in self.sections],
+            "status": self.status,
+            "source": self.source,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class CollectionTarget:
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Environnement PVWA collecté (production, secours, région...)
+
+        Chaque cible a son propre client (pool de connexions, jeton,
+        disjoncteur), ses intervalles de collecte par section et son instantané.
+        """
+        self.name = config["name"]
+        self.interval = config["interval"]
+        self.section_intervals: Dict[str, float] = dict(
+            config.get("section_intervals") or {section: self.interval for section in COLLECTION_SECTIONS}
+        )
+        self.api = AsyncCyberArkAPI(config)
+        self.snapshots = SnapshotStore(COLLECTOR_CONFIG["max_staleness"], self.name)
+        self.next_collection_at: Optional[datetime] = None  # Prochaine collecte planifiée
+        # Échéances planifiées par section (horloge monotone) : créneau théorique et créneau décalé (gigue)
+        self.slots: Dict[str, float] = {}
+        self.deadlines: Dict[str, float] = {}
+        self.skipped: Dict[str, int] = {section: 0 for section in COLLECTION_SECTIONS}  # Créneaux sautés
+        self.current_job: Optional[CollectionJob] = None
+        self.pending_job: Optional[CollectionJob] = None  # Collecte à lancer à la fin de la tâche en cours
+        self.loaded_run_id: Optional[int] = None  # Dernier cycle stocké publié dans l'instantané
+        self.last_write: Optional[Future] = None  # Écriture en base du dernier cycle déposé
+    
+    def schedule(self, now: float):
+        """
+        Planifier toutes les sections immédiatement (prise du rôle de planificateur)
+        """
+        self.slots = {section: now for section in COLLECTION_SECTIONS}
+        self.deadlines = dict(self.slots)
+    
+    def advance(self, section: str, now: float, jitter: float):
+        """
+        Passer au créneau suivant d'une section
+
+        Les créneaux sont calculés à partir du précédent et non de la fin de
+        la collecte : la durée des collectes ne décale pas la planification.
+        Les créneaux déjà dépassés sont sautés plutôt que rattrapés, et le
+        décalage aléatoire de chaque créneau ne s'accumule pas.
+        """
+        interval = self.section_intervals[section]
+        missed = max(0, int((now - self.slots[section]) // interval))
+        if missed > 0:
+            self.skipped[section] += missed
+            COLLECTION_SKIPPED_SLOTS.labels(self.name, section).inc(missed)
+            logger.warning(f"{missed} créneau(x) de la section {section} de {self.name} sauté(s)")
+        self.slots[section] += (missed + 1) * interval
+        self.deadlines[section] = self.slots[section] + random.uniform(0, jitter * interval)
+    
+    def skip(self, section: str, now: float, jitter: float):
+        """
+        Sauter le créneau d'une section encore en cours de collecte
+        """
+        self.skipped[section] += 1
+        COLLECTION_SKIPPED_SLOTS.labels(self.name, section).inc()
+        logger.warning(f"Collecte de la section {section} de {self.name} toujours en cours, créneau sauté")
+        self.advance(section, now, jitter)
+    
+    def update_next_collection(self, now: float):
+        """
+        Dériver la date de la prochaine collecte planifiée de l'échéance la plus proche
+        """
+        if self.deadlines:
+            self.next_collection_at = datetime.now() + timedelta(seconds=max(0.0, min(self.deadlines.values()) - now))
+        else:
+            self.next_collection_at = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Représentation de la cible pour l'API
+        """
+        snapshot = self.snapshots.current()
+        return {
+            "name": self.name,
+            "base_url": self.api.base_url,
+            "interval": self.interval,
+            "next_collection_at": self.next_collection_at.isoformat() if self.next_collection_at else None,
+            "schedule": {
+                section: {
+                    "interval": self.section_intervals[section],
+                    "next_in": round(max(0.0, self.deadlines[section] - time.monotonic()), 1) if section in self.deadlines else None,
+                    "skipped": self.skipped[section]
+                }
+                for section in COLLECTION_SECTIONS
+            },
+            "snapshot_version": snapshot.version if snapshot else None,
+            "snapshot_age": round(snapshot.age(), 1) if snapshot else None,
+            "last_job": self.current_job.to_dict() if self.current_job else None,
+            # État du disjoncteur des appels au PVWA (closed, open, half_open)
+            "cyberark": self.api.breaker.to_dict(),
+            "token": self.api.tokens.to_dict()
+        }
+
 class HealthCollector:
     def __init__(self, interval=None):
         """
-        Initialiser le collecteur de données de santé
+        Initialiser le collecteur de données de santé de toutes les cibles configurées
         """
-        self.interval = interval or COLLECTOR_CONFIG["interval"]
         self.components_to_check = COLLECTOR_CONFIG["components_to_check"]
-        self.api = CyberArkAPI()
+        self.targets: "OrderedDict[str, CollectionTarget]" = OrderedDict(
+            (config["name"], CollectionTarget(config)) for config in COLLECTION_TARGETS
+        )
+        if interval:
+            for target in self.targets.values():
+                target.interval = interval
+                target.section_intervals = {section: interval for section in COLLECTION_SECTIONS}
+        self.jitter = COLLECTOR_CONFIG["jitter"]
+        self.loop = BackgroundEventLoop()
         self.running = False
         self.thread = None
+        self._scheduler_wakeup = threading.Event()  # Réveil de la boucle de planification (arrêt immédiat)
+        self._token_refreshers = []
+        
+        # Processus lecteur (API) : collectes confiées au processus élu, instantanés relus en base
+        self.reading = False
+        self._reader_thread = None
+        self._reader_stop = threading.Event()
+        self._reader_wakeup = threading.Event()
+        
+        # Une seule collecte à la fois par cible : les demandes concurrentes partagent la tâche en cours.
+        # Les cibles sont collectées en parallèle (appels HTTP sur la boucle partagée, écritures dans le pool),
+        # la durée d'un cycle est donc celle de la cible la plus lente
+        workers = max(1, min(len(self.targets), COLLECTOR_CONFIG["max_parallel_targets"]))
+        self._collection_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="collector")
+        self._job_lock = threading.Lock()
+        self._jobs: "OrderedDict[str, CollectionJob]" = OrderedDict()
+        
+        # Écriture des cycles par un thread dédié : la cadence des collectes ne dépend pas de la base
+        self.writer = WriteBehindQueue(self._write_cycles)
         
         # Créer les tables dans la base de données si elles n'existent pas
         create_tables()
         
-        logger.info(f"Collecteur de données de santé initialisé avec un intervalle de {self.interval} secondes")
+        logger.info(f"Collecteur de données de santé initialisé pour {len(self.targets)} cible(s): "
+                    f"{', '.join(f'{t.name} ({t.section_intervals})' for t in self.targets.values())}")
+    
+    def target(self, name: Optional[str] = None) -> CollectionTarget:
+        """
+        Récupérer une cible de collecte (la cible principale si aucun nom n'est fourni)
+        """
+        return self.targets[resolve_target(name)]
     
     def start(self):
         """
-        Démarrer la collection périodique de données
+        Démarrer la collection périodique de données (processus élu)
         """
         if self.running:
             logger.warning("Le collecteur est déjà en cours d'exécution")
             return
             
         self.running = True
+        self._scheduler_wakeup.clear()
+        now = time.monotonic()
+        for target in self.targets.values():
+            target.schedule(now)
         self.thread = threading.Thread(target=self._collect_loop)
         self.thread.daemon = True
         self.thread.start()
         
+        # Relire dès le démarrage les cycles journalisés par une exécution précédente
+        self.writer.start()
+        
+        # Renouveler les jetons avant leur expiration, en dehors des cycles de collecte
+        self._token_refreshers = [
+            self.loop.submit(target.api.tokens.run_refresh())
+            for target in self.targets.values()
+            if target.api.token_refresh
+        ]
+        
         logger.info("Collection périodique de données démarrée")
     
-    def stop(self):
+    def stop_scheduler(self):
         """
-        Arrêter la collection périodique de données
+        Arrêter les collectes planifiées, sans fermer les clients (perte du rôle de planificateur)
         """
         self.running = False
+        self._scheduler_wakeup.set()
         if self.thread:
             self.thread.join(timeout=10)
+            self.thread = None
+        
+        for refresher in self._token_refreshers:
+            refresher.cancel()
+        self._token_refreshers = []
+        
+        for target in self.targets.values():
+            target.slots, target.deadlines = {}, {}
+            target.next_collection_at = None
+    
+    def stop(self):
+        """
+        Arrêter la collection périodique de données
+        """
+        self.stop_scheduler()
+        self.stop_reader()
+        
+        # Laisser les collectes en cours se terminer : leurs appels s'exécutent sur la boucle fermée ci-dessous
+        # (y compris les collectes en attente, lancées à la fin de la tâche en cours)
+        pending = [job.future for target in self.targets.values() for job in (target.current_job, target.pending_job)
+                   if job is not None and not job.remote and not job.future.done()]
+        if pending:
+            wait(pending, timeout=STOP_TIMEOUT)
+        
+        # Écrire les cycles en attente, ou les conserver dans le journal
+        self.writer.stop()
+        
+        # Fermer les pools de connexions et la boucle d'événements des clients asynchrones
+        for target in self.targets.values():
+            try:
+                self.loop.run(target.api.aclose(), timeout=10)
+            except Exception as e:
+                logger.warning(f"Erreur lors de la fermeture du client CyberArk de {target.name}: {str(e)}")
+        self.loop.stop()
             
         logger.info("Collection périodique de données arrêtée")
     
+    def start_reader(self):
+        """
+        Suivre en base les cycles de collecte écrits par le processus élu (processus de l'API)
+
+        Tant que ce processus n'est pas le planificateur, il ne contacte
+        jamais le PVWA : ses instantanés sont rechargés depuis le dernier
+        cycle terminé et ses demandes de collecte sont transmises au
+        processus élu via la table collection_requests.
+        """
+        if self._reader_thread and self._reader_thread.is_alive():
+            return
+        
+        self.reading = True
+        self._reader_stop.clear()
+        self._reader_thread = threading.Thread(target=self._reader_loop, name="snapshot-reader")
+        self._reader_thread.daemon = True
+        self._reader_thread.start()
+        
+        logger.info(f"Suivi des cycles de collecte démarré (intervalle: {COLLECTOR_CONFIG['poll_interval']} s)")
+    
+    def stop_reader(self):
+        """
+        Arrêter le suivi des cycles de collecte
+        """
+        self._reader_stop.set()
+        self._reader_wakeup.set()
+        if self._reader_thread:
+            self._reader_thread.join(timeout=10)
+            self._reader_thread = None
+    
+    def _delegates_collections(self) -> bool:
+        """
+        Vérifier si les collectes de ce processus sont confiées au processus élu
+        """
+        return self.reading and not self.running
+    
     def _collect_loop(self):
         """
-        Boucle de collection périodique de données
+        Boucle de collection périodique : chaque section de chaque cible est collectée à son propre intervalle
+
+        Les sections échues ensemble sont collectées par une même tâche. Une
+        section encore en cours de collecte saute son créneau plutôt que de
+        lancer une collecte concurrente. La boucle dort jusqu'à la prochaine
+        échéance (au plus SCHEDULER_TICK) et se réveille immédiatement à l'arrêt.
         """
         while self.running:
             try:
-                self.collect_and_store_health_data()
+                self._claim_requests()
             except Exception as e:
-                logger.error(f"Erreur lors de la collection de données: {str(e)}")
+                logger.error(f"Erreur lors de la lecture des demandes de collecte: {str(e)}")
+            
+            now = time.monotonic()
+            for target in self.targets.values():
+                if not any(deadline <= now for deadline in target.deadlines.values()):
+                    continue
+                # Les sections échues dans leur marge de gigue partagent la collecte (cycle stocké unique)
+                due = [section for section, deadline in target.deadlines.items()
+                       if deadline <= now + self.jitter * target.section_intervals[section]]
+                
+                job = target.current_job
+                running = job.sections if job is not None and not job.future.done() else set()
+                for section in due:
+                    if section in running:
+                        target.skip(section, now, self.jitter)
+                    else:
+                        target.advance(section, now, self.jitter)
+                
+                sections = [section for section in due if section not in running]
+                if sections:
+                    try:
+                        self.request_collection(source="scheduled", target=target.name, sections=sections)
+                    except Exception as e:
+                        logger.error(f"Erreur lors de la collection de données de {target.name}: {str(e)}")
             
-            # Attendre l'intervalle spécifié
-            time.sleep(self.interval)
+            next_deadline = None
+            for target in self.targets.values():
+                target.update_next_collection(now)
+                if target.deadlines:
+                    deadline = min(target.deadlines.values())
+                    next_deadline = deadline if next_deadline is None else min(next_deadline, deadline)
+            
+            timeout = SCHEDULER_TICK if next_deadline is None else max(0.0, min(SCHEDULER_TICK, next_deadline - time.monotonic()))
+            self._scheduler_wakeup.wait(timeout)
+            self._scheduler_wakeup.clear()
     
-    def collect_and_store_health_data(self):
+    def request_collection(self, source: str = "api", target: Optional[str] = None,
+                           sections: Optional[Iterable[str]] = None) -> CollectionJob:
         """
-        Collecter et stocker les données de santé
+        Demander la collecte de sections d'une cible (toutes par défaut)
+
+        Une seule collecte à la fois par cible : la collecte en cours est
+        retournée si elle couvre les sections demandées ; sinon les sections
+        rejoignent la collecte lancée à la fin de celle en cours, partagée par
+        toutes les demandes qui arrivent entre-temps. Dans un processus qui
+        n'est pas le planificateur, la demande est enregistrée en base
+        (bloquant : à appeler hors de la boucle d'événements).
         """
-        logger.info("Début de la collecte des données de santé")
+        target = self.target(target)
+        sections = set(sections or COLLECTION_SECTIONS)
+        with self._job_lock:
+            job = target.current_job
+            if job is not None and not job.future.done():
+                if job.remote or sections <= job.sections:
+                    return job
+                if target.pending_job is not None:
+                    target.pending_job.sections |= sections
+                    return target.pending_job
+                job = target.pending_job = CollectionJob(source, target.name, sections)
+            elif self._delegates_collections():
+                job = None
+            else:
+                job = target.current_job = CollectionJob(source, target.name, sections)
+                self._collection_executor.submit(job.context.run, self._run_job, job)
+            if job is not None:
+                self._track_job(job)
+                return job
         
-        # Récupérer toutes les données de santé
-        data, success = self.api.get_all_health_data()
+        # Le processus élu collecte toujours toutes les sections à la demande ; la demande
+        # est enregistrée hors du verrou pour ne pas bloquer les autres demandes sur la base
+        remote_job = self._request_remote_collection(source, target)
+        with self._job_lock:
+            job = target.current_job
+            if job is not None and job.remote and not job.future.done():
+                # Demande concurrente déjà suivie : la nôtre sera servie par la même collecte
+                return job
+            job = target.current_job = remote_job
+            self._track_job(job)
+        self._reader_wakeup.set()
+        return job
+    
+    def _track_job(self, job: CollectionJob):
+        # Appelée avec self._job_lock
+        self._jobs[job.id] = job
+        while len(self._jobs) > MAX_TRACKED_JOBS:
+            self._jobs.popitem(last=False)
+    
+    def request_all_collections(self, source: str = "api") -> List[CollectionJob]:
+        """
+        Demander la collecte de toutes les cibles, exécutées en parallèle
+        """
+        return [self.request_collection(source, name) for name in self.targets]
+    
+    def get_job(self, job_id: str) -> Optional[CollectionJob]:
+        """
+        Récupérer une tâche de collecte par son identifiant (demandes des autres processus comprises)
+
+        Les demandes transmises au processus élu sont lues en base (bloquant).
+        """
+        job = self._jobs.get(job_id)
+        if job is not None or not job_id.isdigit():
+            return job
         
-        if not success:
-            logger.error("Échec de la collecte des données de santé")
+        db = SessionLocal()
+        try:
+            request = db.get(CollectionRequest, int(job_id))
+            return CollectionJob.from_request(request) if request is not None else None
+        finally:
+            db.close()
+    
+    def _request_remote_collection(self, source: str, target: CollectionTarget) -> CollectionJob:
+        """
+        Enregistrer une demande de collecte, exécutée par le processus élu
+        """
+        db = SessionLocal()
+        try:
+            request = CollectionRequest(target=target.name, source=source, status="pending")
+            db.add(request)
+            db.commit()
+            logger.info(f"Collecte de {target.name} demandée au processus élu (demande {request.id})")
+            return CollectionJob.from_request(request)
+        finally:
+            db.close()
+    
+    def _claim_requests(self):
+        """
+        Prendre en charge les demandes de collecte des autres processus (processus élu)
+
+        Les demandes d'une cible rejoignent sa collecte en cours, ou en démarrent une.
+        """
+        db = SessionLocal()
+        try:
+            pending = (
+                db.query(CollectionRequest)
+                .filter(CollectionRequest.status == "pending")
+                .order_by(CollectionRequest.id)
+                .all()
+            )
+            if not pending:
+                return
+            
+            claimed: Dict[str, List[int]] = {}
+            now = datetime.now()
+            for request in pending:
+                if request.target not in self.targets:
+                    request.status, request.error, request.finished_at = "failed", "Cible inconnue", now
+                    continue
+                request.status, request.started_at = "running", now
+                claimed.setdefault(request.target, []).append(request.id)
+            db.commit()
+        finally:
+            db.close()
+        
+        for target_name, request_ids in claimed.items():
+            job = self.request_collection("api", target_name)
+            job.request_ids.extend(request_ids)
+            if job.future.done() and (job.written is None or job.written.done()):
+                self._finish_requests(job)
+    
+    def _finish_requests(self, job: CollectionJob):
+        """
+        Reporter le résultat d'une tâche sur les demandes des autres processus qu'elle a servies
+
+        Appelée une fois le cycle de la tâche écrit en base : le processus qui
+        attend la demande publie alors ce cycle, et non le précédent.
+        """
+        request_ids, job.request_ids = job.request_ids, []
+        if not request_ids:
             return
+        
+        status, error = job.status, job.error
+        if job.written is not None and not job.written.result():
+            status, error = "failed", "Cycle de collecte refusé par la base de données"
+        
+        db = SessionLocal()
+        try:
+            db.query(CollectionRequest).filter(CollectionRequest.id.in_(request_ids)).update(
+                {"status": status, "error": error, "finished_at": job.finished_at or datetime.now()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Erreur lors de la mise à jour des demandes de collecte {request_ids}: {str(e)}")
+            db.rollback()
+        finally:
+            db.close()
+    
+    def _reader_loop(self):
+        """
+        Boucle de suivi : nouveaux cycles terminés et demandes de collecte transmises au processus élu
+        """
+        while not self._reader_stop.is_set():
+            if not self.running:
+                try:
+                    self._poll_remote_jobs()
+                    for target in self.targets.values():
+                        self._refresh_from_database(target)
+                except Exception as e:
+                    logger.error(f"Erreur lors du suivi des cycles de collecte: {str(e)}")
             
-        # Créer une session de base de données
+            remote_pending = any(
+                target.current_job is not None and target.current_job.remote and not target.current_job.future.done()
+                for target in self.targets.values()
+            )
+            self._reader_wakeup.wait(REMOTE_JOB_POLL_INTERVAL if remote_pending else COLLECTOR_CONFIG["poll_interval"])
+            self._reader_wakeup.clear()
+    
+    def _poll_remote_jobs(self):
+        """
+        Mettre à jour les tâches confiées au processus élu et terminer celles qui ont abouti
+        """
+        jobs = [target.current_job for target in self.targets.values()
+                if target.current_job is not None and target.current_job.remote and not target.current_job.future.done()]
+        if not jobs:
+            return
+        
         db = SessionLocal()
+        try:
+            requests = {
+                str(request.id): request
+                for request in db.query(CollectionRequest).filter(CollectionRequest.id.in_([int(job.id) for job in jobs]))
+            }
+            for job in jobs:
+                request = requests.get(job.id)
+                if request is not None:
+                    job.update_from_request(request)
+        finally:
+            db.close()
         
+        for job in jobs:
+            if job.status not in ("succeeded", "failed") and \
+                    (datetime.now() - job.created_at).total_seconds() > REMOTE_JOB_TIMEOUT:
+                job.status, job.error = "failed", "Aucun processus élu n'a traité la demande"
+            if job.status in ("succeeded", "failed"):
+                # Publier le cycle produit avant de réveiller les requêtes qui l'attendent
+                if job.status == "succeeded":
+                    self._refresh_from_database(self.targets[job.target])
+                job.future.set_result(job.status == "succeeded")
+    
+    def _refresh_from_database(self, target: CollectionTarget):
+        """
+        Publier le dernier cycle terminé d'une cible s'il n'est pas déjà dans l'instantané
+        """
+        db = SessionLocal()
         try:
-            # Stocker les données d'état des composants
-            self._store_component_status(db, data)
-            
-            # Stocker les données d'état du coffre-fort
-            self._store_vault_status(db, data)
-            
-            # Stocker les données d'état des comptes
-            self._store_accounts_status(db, data)
-            
-            # Stocker les données d'état de santé du système
-            self._store_system_health(db, data)
-            
-            # Stocker les événements de sécurité
-            self._store_security_events(db, data)
+            run = latest_complete_run(db, target.name)
+            if run is None or run.id == target.loaded_run_id:
+                return
+            data = load_run_health_data(db, run)
+        finally:
+            db.close()
+        
+        target.loaded_run_id = run.id
+        target.snapshots.publish(data, "database")
+    
+    def _run_job(self, job: CollectionJob):
+        """
+        Exécuter une tâche de collecte et publier son résultat
+        """
+        job.status = "running"
+        job.started_at = datetime.now()
+        target = self.targets[job.target]
+        target.last_write = None
+        success, error = False, None
+        
+        try:
+            success = self.collect_and_store_health_data(job.source, target.name, job.sections)
+            job.status = "succeeded" if success else "failed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            error = e
+        job.finished_at = datetime.now()
+        
+        # Lancer la collecte en attente avant de terminer la tâche, pour que les nouvelles
+        # demandes la rejoignent au lieu d'en démarrer une autre
+        with self._job_lock:
+            next_job, target.pending_job = target.pending_job, None
+            if next_job is not None:
+                target.current_job = next_job
+                self._collection_executor.submit(next_job.context.run, self._run_job, next_job)
+        
+        # Une tâche qui réussit a déposé son cycle : les demandes des autres processus
+        # sont terminées quand il est écrit en base, pour qu'ils puissent le relire
+        job.written = target.last_write if success else None
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(success)
+        if job.written is None:
+            self._finish_requests(job)
+        else:
+            job.written.add_done_callback(lambda written: self._finish_requests(job))
+    
+    def collect_and_store_health_data(self, source: str = "api", target: Optional[str] = None,
+                                      sections: Optional[Iterable[str]] = None) -> bool:
+        """
+        Collecter et stocker des sections des données de santé d'une cible (toutes par défaut) lors d'un cycle de collecte
+
+        Les sections collectées remplacent les mêmes sections de l'instantané
+        courant. Un cycle qui ne collecte que les événements et n'en découvre
+        aucun n'est pas enregistré. La durée et le résultat de chaque cycle
+        sont exportés dans les métriques et tracés dans un span "collection".
+        """
+        target = self.target(target)
+        sections = set(sections or COLLECTION_SECTIONS)
+        started = time.perf_counter()
+        success = False
+        try:
+            with span("collection", **{
+                "collection.target": target.name,
+                "collection.source": source,
+                "collection.sections": ",".join(section for section in COLLECTION_SECTIONS if section in sections)
+            }) as current:
+                success = self._collect_and_store(source, target, sections)
+                current.set_attribute("collection.outcome", "success" if success else "failure")
+            return success
+        finally:
+            outcome = "success" if success else "failure"
+            COLLECTION_DURATION.labels(target.name, outcome).observe(time.perf_counter() - started)
+            for section in sections:
+                COLLECTED_SECTIONS.labels(target.name, section, outcome).inc()
+            if success:
+                COLLECTION_LAST_SUCCESS.labels(target.name).set(time.time())
+    
+    def _collect_and_store(self, source: str, target: CollectionTarget, sections: Set[str]) -> bool:
+        """
+        Cycle de collecte d'une cible (voir collect_and_store_health_data)
+        """
+        partial = None if sections == set(COLLECTION_SECTIONS) else \
+            ",".join(section for section in COLLECTION_SECTIONS if section in sections)
+        logger.info(f"Début de la collecte des données de santé de {target.name} ({partial or 'toutes les sections'})")
+        started_at = datetime.now()
+        started = time.monotonic()
+        
+        # Récupérer les données de santé des sections demandées (appels parallèles)
+        data, success = self._fetch_health_data(target, sections)
+        
+        if not success:
+            logger.error(f"Échec de la collecte des données de santé de {target.name}")
+            self._record_failed_run(started_at, started, source, target.name, partial)
+            return False
+        
+        # Publier l'instantané avant le stockage pour que les lecteurs en profitent immédiatement
+        self._publish_sections(target, data, sections)
+        
+        # Détails des composants manquants récupérés maintenant : l'écriture ne contacte pas le PVWA
+        if "component_status" in sections:
+            # Copie : les détails déjà publiés dans l'instantané ne sont pas modifiés
+            details = dict(data.get("component_details", {}))
+            data = {**data, "component_details": details}
+            for item in data.get("component_status", {}).get("Items", []):
+                component_type = item.get("Component Type", "")
+                if component_type in self.components_to_check and component_type not in details:
+                    # Client asynchrone : disjoncteur, nouvelles tentatives, jeton et traces comme la collecte
+                    details[component_type] = self.loop.run(target.api.async_get_component_details(component_type))
+        
+        # Cycle déposé pour écriture en base, sans attendre la transaction
+        target.last_write = self.writer.submit({
+            "status": "complete",
+            "target": target.name,
+            "source": source,
+            "sections": [section for section in COLLECTION_SECTIONS if section in sections],
+            "partial": partial,
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "duration": time.monotonic() - started,
+            "data": data
+        })
+        return target.last_write is not None
+    
+    def _write_cycles(self, cycles: List[Dict[str, Any]]):
+        """
+        Écrire des cycles de collecte dans une seule transaction (écrivain de WriteBehindQueue)
+
+        Une erreur annule tout le lot et est propagée à l'écrivain, qui le
+        conserve si la base est indisponible.
+        """
+        db = SessionLocal()
+        
+        try:
+            runs = [(cycle, self._write_cycle(db, cycle)) for cycle in cycles]
             
             # Valider les modifications
-            db.commit()
-            
-            logger.info("Données de santé stockées avec succès")
-            
-        except Exception as e:
-            logger.error(f"Erreur lors du stockage des données: {str(e)}")
+            with span("db.commit", **{"db.cycles": len(cycles)}):
+                db.commit()
+        except Exception:
             db.rollback()
+            raise
         finally:
             # Fermer la session
             db.close()
+        
+        for cycle, run_id in runs:
+            if run_id is not None and cycle["status"] == "complete":
+                self.targets[cycle["target"]].loaded_run_id = run_id
+                logger.info(f"Données de santé de {cycle['target']} stockées avec succès")
+    
+    def _write_cycle(self, db: Session, cycle: Dict[str, Any]) -> Optional[int]:
+        """
+        Stocker un cycle de collecte et ses données, sans valider la transaction
+
+        Retourne l'identifiant du cycle, ou None s'il n'est pas enregistré.
+        """
+        data, sections = cycle.get("data") or {}, set(cycle["sections"])
+        # Les lignes portent l'heure de fin de la collecte, quel que soit le moment de leur écriture
+        collected_at = datetime.fromisoformat(cycle["finished_at"])
+        
+        # Enregistrer le cycle de collecte auquel toutes les lignes seront rattachées ; il n'est
+        # visible comme terminé qu'avec ses données, dans la même transaction
+        run = CollectionRun(
+            target=cycle["target"],
+            started_at=datetime.fromisoformat(cycle["started_at"]),
+            finished_at=collected_at,
+            duration=cycle["duration"],
+            status=cycle["status"],
+            source=cycle["source"],
+            sections=cycle["partial"]
+        )
+        db.add(run)
+        db.flush()
+        if cycle["status"] != "complete":
+            return run.id
+        target = self.targets[cycle["target"]]
+        
+        # Cycle écrit après la compaction de son intervalle : le faire recalculer avec ses mesures
+        for section in sections & set(SOURCES):
+            rewind_watermarks(db, section, collected_at, target.name)
+        
+        # Stocker les données d'état des composants
+        if "component_status" in sections:
+            with span("db.store", **{"db.section": "component_status"}):
+                self._store_component_status(db, data, run.id, target, collected_at)
+        
+        # Stocker les données d'état du coffre-fort
+        if "vault_status" in sections:
+            with span("db.store", **{"db.section": "vault_status"}):
+                self._store_vault_status(db, data, run.id, target, collected_at)
+        
+        # Stocker les données d'état des comptes
+        if "accounts_status" in sections:
+            with span("db.store", **{"db.section": "accounts_status"}):
+                self._store_accounts_status(db, data, run.id, target, collected_at)
+        
+        # Stocker les données d'état de santé du système
+        if "system_health" in sections:
+            with span("db.store", **{"db.section": "system_health"}):
+                self._store_system_health(db, data, run.id, target, collected_at)
+        
+        # Stocker les événements de sécurité
+        if "events" in sections:
+            with span("db.store", **{"db.section": "events"}) as current:
+                inserted = self._store_security_events(db, data, run.id, target, collected_at)
+                current.set_attribute("db.rows", inserted)
+            if sections == {"events"} and inserted == 0:
+                # Aucun nouvel événement : ne pas enregistrer de cycle vide
+                db.delete(run)
+                db.flush()
+                logger.info(f"Aucun nouvel événement de sécurité pour {target.name}")
+                return None
+        
+        return run.id
+    
+    def _record_failed_run(self, started_at: datetime, started: float, source: str, target: Optional[str] = None,
+                           sections: Optional[str] = None):
+        """
+        Enregistrer un cycle de collecte en échec (écriture différée, comme les cycles terminés)
+        """
+        self.writer.submit({
+            "status": "failed",
+            "target": target,
+            "source": source,
+            "sections": [],
+            "partial": sections,
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "duration": time.monotonic() - started,
+            "data": None
+        })
+    
+    def _fetch_health_data(self, target: CollectionTarget,
+                           sections: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Récupérer les données de santé d'une cible (toutes les sections par défaut) via son client asynchrone
+        """
+        with span("collection.fetch", **{"collection.target": target.name}) as current:
+            data, success = self.loop.run(target.api.async_get_all_health_data(self.components_to_check, sections))
+            current.set_attribute("collection.success", success)
+        if success:
+            data = {"target": target.name, **data}
+        return data, success
+    
+    def _publish_sections(self, target: CollectionTarget, data: Dict[str, Any], sections: Iterable[str]):
+        """
+        Publier l'instantané d'une cible en y remplaçant les sections collectées
+
+        Les autres sections sont reprises de l'instantané courant, ou de la
+        base de données au démarrage. Un instantané identique n'est pas
+        republié (version et ETag inchangés) tant qu'il n'approche pas de
+        son âge maximal.
+        """
+        keys = [key for section in sections for key in SECTION_DATA_KEYS[section] if key in data]
+        current = target.snapshots.current()
+        if current is not None:
+            previous = current.data
+        else:
+            db = SessionLocal()
+            try:
+                previous = load_latest_health_data(db, target.name)
+            finally:
+                db.close()
+        
+        if current is not None and current.age() < target.snapshots.max_staleness / 2 and \
+                all(previous.get(key) == data[key] for key in keys):
+            return
+        
+        with span("snapshot.publish", **{"snapshot.target": target.name}):
+            target.snapshots.publish({**previous, **data}, "api")
     
-    def _store_component_status(self, db: Session, data: Dict[str, Any]):
+    def _store_component_status(self, db: Session, data: Dict[str, Any], run_id: int,
+                                target: Optional[CollectionTarget] = None, collected_at: Optional[datetime] = None):
         """
         Stocker les données d'état des composants
         """
+        target = target or self.target()
+        timestamp = collected_at or datetime.now()
         component_status_data = data.get("component_status", {}).get("Items", [])
+        all_component_details = data.get("component_details", {})
         
-        for component_type_data in component_status_data:
-            # Créer une entrée d'état de composant
-            component_status = ComponentStatus(
-                component_type=component_type_data.get("Component Type", "Unknown"),
-                total_amount=component_type_data.get("Total Amount", 0),
-                connected=component_type_data.get("Connected", 0),
-                disconnected=component_type_data.get("Disconnected", 0),
-                status="OK" if component_type_data.get("Disconnected", 0) == 0 else "Warning"
-            )
-            
-            db.add(component_status)
-            db.flush()
-            
+        # Insérer toutes les entrées d'état en un lot et récupérer leurs identifiants
+        status_rows = [
+            {
+                "collection_run_id": run_id,
+                "target": target.name,
+                "timestamp": timestamp,
+                "component_type": component_type_data.get("Component Type", "Unknown"),
+                "total_amount": component_type_data.get("Total Amount", 0),
+                "connected": component_type_data.get("Connected", 0),
+                "disconnected": component_type_data.get("Disconnected", 0),
+                "status": "OK" if component_type_data.get("Disconnected", 0) == 0 else "Warning"
+            }
+            for component_type_data in component_status_data
+        ]
+        status_ids = bulk_insert(db, ComponentStatus, status_rows, return_ids=True)
+        
+        component_rows = []
+        for component_type_data, component_status_id in zip(component_status_data, status_ids):
             # Récupérer les détails des composants si disponibles
             component_type = component_type_data.get("Component Type", "")
-            if component_type in self.components_to_check:
-                component_details = self.api.get_component_details(component_type)
-                
-                for detail in component_details:
-                    # Créer une entrée de composant
-                    component = Component(
-                        component_status_id=component_status.id,
-                        component_type=detail.get("Component Type", "Unknown"),
-                        component_version=detail.get("Component Version", "Unknown"),
-                        ip_address=detail.get("IP Address", "0.0.0.0"),
-                        component_user=detail.get("Component User", "Unknown"),
-                        connected=detail.get("Connected", False),
-                        last_connection=datetime.fromisoformat(detail.get("Last Connection", "").replace('Z', '+00:00')) if detail.get("Last Connection", "") else None,
-                        os=detail.get("OS", "Windows")
-                    )
-                    
-                    db.add(component)
-    
-    def _store_vault_status(self, db: Session, data: Dict[str, Any]):
+            if component_type not in self.components_to_check:
+                continue
+            
+            # Les détails sont récupérés en parallèle lors de la collecte (ou avant le dépôt du cycle)
+            component_details = all_component_details.get(component_type, [])
+            
+            for detail in component_details:
+                component_rows.append({
+                    "collection_run_id": run_id,
+                    "target": target.name,
+                    "timestamp": timestamp,
+                    "component_status_id": component_status_id,
+                    "component_type": detail.get("Component Type", "Unknown"),
+                    "component_version": detail.get("Component Version", "Unknown"),
+                    "ip_address": detail.get("IP Address", "0.0.0.0"),
+                    "component_user": detail.get("Component User", "Unknown"),
+                    "connected": detail.get("Connected", False),
+                    "last_connection": datetime.fromisoformat(detail.get("Last Connection", "").replace('Z', '+00:00')) if detail.get("Last Connection", "") else None,
+                    "os": detail.get("OS", "Windows")
+                })
+        
+        bulk_insert(db, Component, component_rows)
+    
+    def _store_vault_status(self, db: Session, data: Dict[str, Any], run_id: int,
+                    target: Optional[CollectionTarget] = None, collected_at: Optional[datetime] = None):
         """
         Stocker les données d'état du coffre-fort
         """
+        target = target or self.target()
+        timestamp = collected_at or datetime.now()
         vault_data = data.get("vault_status", {}).get("Safes", {})
         
         if vault_data:
-            vault_status = VaultStatus(
-                total_safes=vault_data.get("Total_Safes", 0),
-                total_accounts=vault_data.get("Total_Accounts", 0),
-                version=vault_data.get("Version", "Unknown"),
-                license_status=vault_data.get("License_Status", "Unknown"),
-                license_expiration=datetime.fromisoformat(vault_data.get("License_Expiration", "").replace('Z', '+00:00')) if vault_data.get("License_Expiration", "") else None
-            )
-            
-            db.add(vault_status)
+            bulk_insert(db, VaultStatus, [{
+                "collection_run_id": run_id,
+                "target": target.name,
+                "timestamp": timestamp,
+                "total_safes": vault_data.get("Total_Safes", 0),
+                "total_accounts": vault_data.get("Total_Accounts", 0),
+                "version": vault_data.get("Version", "Unknown"),
+                "license_status": vault_data.get("License_Status", "Unknown"),
+                "license_expiration": datetime.fromisoformat(vault_data.get("License_Expiration", "").replace('Z', '+00:00')) if vault_data.get("License_Expiration", "") else None
+            }])
     
-    def _store_accounts_status(self, db: Session, data: Dict[str, Any]):
+    def _store_accounts_status(self, db: Session, data: Dict[str, Any], run_id: int,
+                    target: Optional[CollectionTarget] = None, collected_at: Optional[datetime] = None):
         """
         Stocker les données d'état des comptes
         """
+        target = target or self.target()
+        timestamp = collected_at or datetime.now()
         accounts_data = data.get("accounts_status", {}).get("value", {})
         
         if accounts_data:
-            accounts_status = AccountsStatus(
-                total_accounts=accounts_data.get("Total_Accounts", 0),
-                managed_accounts=accounts_data.get("Managed_Accounts", 0),
-                non_managed_accounts=accounts_data.get("Non_Managed_Accounts", 0),
-                pending_accounts=accounts_data.get("Pending_Accounts", 0),
-                failed_accounts=accounts_data.get("Failed_Accounts", 0)
-            )
-            
-            db.add(accounts_status)
+            bulk_insert(db, AccountsStatus, [{
+                "collection_run_id": run_id,
+                "target": target.name,
+                "timestamp": timestamp,
+                "total_accounts": accounts_data.get("Total_Accounts", 0),
+                "managed_accounts": accounts_data.get("Managed_Accounts", 0),
+                "non_managed_accounts": accounts_data.get("Non_Managed_Accounts", 0),
+                "pending_accounts": accounts_data.get("Pending_Accounts", 0),
+                "failed_accounts": accounts_data.get("Failed_Accounts", 0)
+            }])
     
-    def _store_system_health(self, db: Session, data: Dict[str, Any]):
+    def _store_system_health(self, db: Session, data: Dict[str, Any], run_id: int,
+                    target: Optional[CollectionTarget] = None, collected_at: Optional[datetime] = None):
         """
         Stocker les données d'état de santé du système
         """
+        target = target or self.target()
+        timestamp = collected_at or datetime.now()
         health_data = data.get("system_health", {})
         
         if health_data:
-            system_health = SystemHealth(
-                cpu_usage=health_data.get("CPU_Usage", 0.0),
-                memory_usage=health_data.get("Memory_Usage", 0.0),
-                disk_usage=health_data.get("Disk_Usage", 0.0),
-                network_latency=health_data.get("Network_Latency", 0.0),
-                last_backup=datetime.fromisoformat(health_data.get("Last_Backup", "").replace('Z', '+00:00')) if health_data.get("Last_Backup", "") else None
-            )
-            
-            db.add(system_health)
+            bulk_insert(db, SystemHealth, [{
+                "collection_run_id": run_id,
+                "target": target.name,
+                "timestamp": timestamp,
+                "cpu_usage": health_data.get("CPU_Usage", 0.0),
+                "memory_usage": health_data.get("Memory_Usage", 0.0),
+                "disk_usage": health_data.get("Disk_Usage", 0.0),
+                "network_latency": health_data.get("Network_Latency", 0.0),
+                "last_backup": datetime.fromisoformat(health_data.get("Last_Backup", "").replace('Z', '+00:00')) if health_data.get("Last_Backup", "") else None
+            }])
     
-    def _store_security_events(self, db: Session, data: Dict[str, Any]):
+    def _store_security_events(self, db: Session, data: Dict[str, Any], run_id: int,
+                               target: Optional[CollectionTarget] = None, collected_at: Optional[datetime] = None):
         """
-        Stocker les événements de sécurité
+        Stocker les nouveaux événements de sécurité (ingestion incrémentale dédupliquée)
+
+        Retourne le nombre d'événements insérés.
         """
-        security_events = data.get("recent_activities", [])
+        target = target or self.target()
+        inserted = ingest_events(db, "recent_activities", data.get("recent_activities", []), lambda event: {
+            "event_type": event.get("EventType", "Unknown"),
+            "username": event.get("Username", "Unknown"),
+            "source_ip": event.get("Source_IP", "0.0.0.0"),
+            "target_safe": event.get("Target_Safe", None),
+            "target_account": event.get("Target_Account", None),
+            "severity": event.get("Severity", "Info"),
+            "description": event.get("Description", "")
+        }, run_id, target.name, collected_at)
         
-        for event in security_events:
-            security_event = SecurityEvent(
-                event_type=event.get("EventType", "Unknown"),
-                username=event.get("Username", "Unknown"),
-                source_ip=event.get("Source_IP", "0.0.0.0"),
-                target_safe=event.get("Target_Safe", None),
-                target_account=event.get("Target_Account", None),
-                severity=event.get("Severity", "Info"),
-                description=event.get("Description", ""),
-                raw_data=json.dumps(event)
-            )
-            
-            db.add(security_event)
-            
         # Stocker également les tentatives de connexion échouées
-        failed_logins = data.get("failed_logins", [])
-        
-        for login in failed_logins:
-            security_event = SecurityEvent(
-                event_type="Failed Login",
-                username=login.get("Username", "Unknown"),
-                source_ip=login.get("Source_IP", "0.0.0.0"),
-                severity=login.get("Severity", "Warning"),
-                description=login.get("Reason", ""),
-                raw_data=json.dumps(login)
-            )
-            
-            db.add(security_event)
+        inserted += ingest_events(db, "failed_logins", data.get("failed_logins", []), lambda login: {
+            "event_type": "Failed Login",
+            "username": login.get("Username", "Unknown"),
+            "source_ip": login.get("Source_IP", "0.0.0.0"),
+            "target_safe": None,
+            "target_account": None,
+            "severity": login.get("Severity", "Warning"),
+            "description": login.get("Reason", "")
+        }, run_id, target.name, collected_at)
+        return inserted
     
-    def get_latest_health_data(self) -> Dict[str, Any]:
+    def get_latest_snapshot(self, target: Optional[str] = None) -> Optional[HealthSnapshot]:
         """
-        Récupérer les dernières données de santé stockées
+        Récupérer le dernier instantané d'une cible, rechargé une seule fois s'il est périmé
         """
+        target = self.target(target)
+        return target.snapshots.get(lambda: self._load_health_data(target))
+    
+    def get_latest_health_data(self, target: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Récupérer les dernières données de santé d'une cible depuis l'instantané en mémoire
+        """
+        target = self.target(target)
         try:
-            # Récupérer les données depuis l'API si disponible, ou depuis la base de données sinon
-            # En cas d'échec complet, utiliser les données de démo
-            
-            # Si l'API est disponible, récupérer les données fraîches
-            api_data, success = self.api.get_all_health_data()
-            if success:
-                return api_data
-            
-            # Sinon, récupérer les dernières données stockées dans la base de données
+            snapshot = self.get_latest_snapshot(target.name)
+            if snapshot is not None:
+                return snapshot.data
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des dernières données de santé de {target.name}: {str(e)}")
+        
+        # En cas d'échec complet, retourner des données de démo
+        return target.api.demo_data or {
+            "target": target.name,
+            "component_status": {"Items": []},
+            "vault_status": {"Safes": {}},
+            "accounts_status": {"value": {}},
+            "system_health": {},
+            "recent_activities": [],
+            "failed_logins": [],
+            "last_update": datetime.now().isoformat()
+        }
+    
+    def _load_health_data(self, target: CollectionTarget) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Charger les dernières données de santé d'une cible depuis l'API, ou depuis la base de données sinon
+
+        Retourne None pour conserver l'instantané courant. Un processus qui
+        n'est pas le planificateur ne lit que la base de données.
+        """
+        with span("snapshot.reload", **{"snapshot.target": target.name}) as current:
+            loaded = self._reload_health_data(target)
+            current.set_attribute("snapshot.source", loaded[1] if loaded is not None else "kept")
+            return loaded
+    
+    def _reload_health_data(self, target: CollectionTarget) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Rechargement de l'instantané d'une cible (voir _load_health_data)
+        """
+        if self._delegates_collections():
             db = SessionLocal()
-            
             try:
-                # Récupérer le dernier état des composants
-                component_status_data = []
-                component_statuses = db.query(ComponentStatus).order_by(ComponentStatus.timestamp.desc()).limit(10).all()
-                
-                if component_statuses:
-                    for cs in component_statuses:
-                        component_status_data.append({
-                            "Component Type": cs.component_type,
-                            "Total Amount": cs.total_amount,
-                            "Connected": cs.connected,
-                            "Disconnected": cs.disconnected,
-                            "Status": cs.status
-                        })
-                
-                # Récupérer le dernier état du coffre-fort
-                vault_status = db.query(VaultStatus).order_by(VaultStatus.timestamp.desc()).first()
-                vault_data = {}
-                
-                if vault_status:
-                    vault_data = {
-                        "Total_Safes": vault_status.total_safes,
-                        "Total_Accounts": vault_status.total_accounts,
-                        "Version": vault_status.version,
-                        "License_Status": vault_status.license_status,
-                        "License_Expiration": vault_status.license_expiration.isoformat() if vault_status.license_expiration else ""
-                    }
-                
-                # Récupérer le dernier état des comptes
-                accounts_status = db.query(AccountsStatus).order_by(AccountsStatus.timestamp.desc()).first()
-                accounts_data = {}
-                
-                if accounts_status:
-                    accounts_data = {
-                        "Total_Accounts": accounts_status.total_accounts,
-                        "Managed_Accounts": accounts_status.managed_accounts,
-                        "Non_Managed_Accounts": accounts_status.non_managed_accounts,
-                        "Pending_Accounts": accounts_status.pending_accounts,
-                        "Failed_Accounts": accounts_status.failed_accounts
-                    }
-                
-                # Récupérer le dernier état de santé du système
-                system_health = db.query(SystemHealth).order_by(SystemHealth.timestamp.desc()).first()
-                health_data = {}
-                
-                if system_health:
-                    health_data = {
-                        "CPU_Usage": system_health.cpu_usage,
-                        "Memory_Usage": system_health.memory_usage,
-                        "Disk_Usage": system_health.disk_usage,
-                        "Network_Latency": system_health.network_latency,
-                        "Last_Backup": system_health.last_backup.isoformat() if system_health.last_backup else ""
-                    }
-                
-                # Récupérer les derniers événements de sécurité
-                security_events = db.query(SecurityEvent).order_by(SecurityEvent.timestamp.desc()).limit(10).all()
-                events_data = []
-                
-                if security_events:
-                    for event in security_events:
-                        if event.event_type != "Failed Login":
-                            events_data.append({
-                                "EventType": event.event_type,
-                                "Username": event.username,
-                                "Source_IP": event.source_ip,
-                                "Target_Safe": event.target_safe,
-                                "Target_Account": event.target_account,
-                                "Severity": event.severity,
-                                "Description": event.description,
-                                "Timestamp": event.timestamp.isoformat()
-                            })
-                
-                # Récupérer les dernières tentatives de connexion échouées
-                failed_logins = db.query(SecurityEvent).filter(SecurityEvent.event_type == "Failed Login").order_by(SecurityEvent.timestamp.desc()).limit(10).all()
-                logins_data = []
-                
-                if failed_logins:
-                    for login in failed_logins:
-                        logins_data.append({
-                            "Username": login.username,
-                            "Source_IP": login.source_ip,
-                            "Reason": login.description,
-                            "Severity": login.severity,
-                            "Timestamp": login.timestamp.isoformat()
-                        })
-                
-                # Construire le résultat
-                return {
-                    "component_status": {"Items": component_status_data},
-                    "vault_status": {"Safes": vault_data},
-                    "accounts_status": {"value": accounts_data},
-                    "system_health": health_data,
-                    "recent_activities": events_data,
-                    "failed_logins": logins_data,
-                    "last_update": datetime.now().isoformat()
-                }
-                
+                return load_latest_health_data(db, target.name), "database"
             finally:
                 db.close()
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la récupération des dernières données de santé: {str(e)}")
-            
-            # En cas d'échec complet, retourner des données de démo
-            return self.api.demo_data or {
-                "component_status": {"Items": []},
-                "vault_status": {"Safes": {}},
-                "accounts_status": {"value": {}},
-                "system_health": {},
-                "recent_activities": [],
-                "failed_logins": [],
-                "last_update": datetime.now().isoformat()
-            }
+        
+        # PVWA dégradé : conserver le dernier instantané valide sans attendre
+        if target.api.breaker.is_open() and target.snapshots.current() is not None:
+            logger.warning(f"PVWA {target.name} indisponible (disjoncteur ouvert), dernier instantané conservé")
+            return None
+        
+        # Si l'API est disponible, récupérer les données fraîches
+        api_data, success = self._fetch_health_data(target)
+        if success:
+            return api_data, "api"
+        
+        # Sinon, récupérer les dernières données stockées dans la base de données
+        db = SessionLocal()
+        
+        try:
+            return load_latest_health_data(db, target.name), "database"
+        finally:
+            db.close()
 
 # Créer une instance singleton du collecteur de données
 collector = HealthCollector()
\ No newline at end of file
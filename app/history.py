@@ -0,0 +1,301 @@
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import HISTORY_CONFIG
+from app.models import AccountsStatus, ComponentStatus, MetricRollup, RollupWatermark, SystemHealth
+from app.targets import qualified_name, target_condition
+
+# Agrégations disponibles pour les séries historiques
+AGGREGATIONS = ("avg", "min", "max", "last", "sum")
+
+# Tailles d'intervalle proposées lorsque l'intervalle demandé produirait trop de points
+NICE_BUCKETS = (30, 60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400)
+
+_BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Métriques exposées par série
+SYSTEM_METRICS = ("cpu_usage", "memory_usage", "disk_usage", "network_latency")
+COMPONENT_METRICS = ("connected", "disconnected", "total_amount", "availability")
+ACCOUNTS_METRICS = ("total_accounts", "managed_accounts", "non_managed_accounts", "pending_accounts", "failed_accounts")
+
+# Tables sources : modèle, métriques et colonne de série éventuelle
+SOURCES = {
+    "system_health": (SystemHealth, SYSTEM_METRICS, None),
+    "component_status": (ComponentStatus, COMPONENT_METRICS, "component_type"),
+    "accounts_status": (AccountsStatus, ACCOUNTS_METRICS, None),
+}
+
+# Tables d'agrégats, de la plus grossière à la plus fine
+ROLLUP_PERIODS = {"1d": 86400, "1h": 3600}
+
+_PARTIAL_COLUMNS = ["timestamp", "series", "metric", "samples", "min", "max", "avg", "sum", "last"]
+
+class HistoryQueryError(ValueError):
+    """
+    Paramètres de requête d'historique invalides
+    """
+
+def parse_bucket(bucket: str) -> int:
+    """
+    Convertir un intervalle ("30s", "5m", "1h", "1d") en secondes
+    """
+    match = re.fullmatch(r"(\d+)([smhd])", bucket.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise HistoryQueryError(f"Intervalle invalide: {bucket}")
+    return int(match.group(1)) * _BUCKET_UNITS[match.group(2)]
+
+def format_bucket(seconds: int) -> str:
+    """
+    Convertir un intervalle en secondes vers sa notation la plus courte
+    """
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+def parse_aggregations(agg: str) -> List[str]:
+    """
+    Valider la liste d'agrégations demandées ("avg,max")
+    """
+    aggregations = [name.strip().lower() for name in agg.split(",") if name.strip()]
+    unknown = [name for name in aggregations if name not in AGGREGATIONS]
+    if not aggregations or unknown:
+        raise HistoryQueryError(f"Agrégations invalides: {agg} (disponibles: {', '.join(AGGREGATIONS)})")
+    return aggregations
+
+def effective_bucket(start: datetime, end: datetime, bucket_seconds: Optional[int], series: int = 1) -> int:
+    """
+    Élargir l'intervalle pour que le nombre total de points reste sous HISTORY_MAX_POINTS
+    """
+    max_buckets = max(1, HISTORY_CONFIG["max_points"] // max(1, series))
+    minimum = math.ceil((end - start).total_seconds() / max_buckets)
+
+    if bucket_seconds is not None and bucket_seconds >= minimum:
+        return bucket_seconds
+
+    for nice in NICE_BUCKETS:
+        if nice >= minimum and (bucket_seconds is None or nice >= bucket_seconds):
+            return nice
+    return max(minimum, bucket_seconds or 0)
+
+def floor_time(value: datetime, seconds: int) -> datetime:
+    """
+    Arrondir une date à l'intervalle inférieur, aligné sur l'epoch
+    """
+    epoch = datetime(1970, 1, 1)
+    elapsed = int((value - epoch).total_seconds())
+    return epoch + timedelta(seconds=elapsed - elapsed % seconds)
+
+def raw_partials(db: Session, source: str, start: datetime, end: datetime,
+                 series: Optional[str] = None, target: Optional[str] = None) -> pd.DataFrame:
+    """
+    Charger les mesures brutes d'une cible sur la période sous forme d'agrégats partiels d'un échantillon
+
+    Seules les colonnes utiles sont lues (index sur timestamp).
+    """
+    model, metrics, series_column = SOURCES[source]
+    stored_metrics = [metric for metric in metrics if hasattr(model, metric)]
+    columns = [model.timestamp]
+    if series_column:
+        columns.append(getattr(model, series_column))
+    columns.extend(getattr(model, metric) for metric in stored_metrics)
+
+    statement = select(*columns).where(
+        model.timestamp >= start,
+        model.timestamp < end,
+        target_condition(model.target, target)
+    )
+    if series_column and series:
+        statement = statement.where(getattr(model, series_column) == series)
+
+    frame = pd.DataFrame.from_records(db.execute(statement).all(), columns=[column.key for column in columns])
+    if frame.empty:
+        return pd.DataFrame(columns=_PARTIAL_COLUMNS)
+
+    frame["series"] = frame.pop(series_column) if series_column else ""
+    if "availability" in metrics:
+        total = frame["total_amount"].astype(float)
+        frame["availability"] = np.where(total > 0, frame["connected"].astype(float) / total.where(total > 0), np.nan)
+
+    long = frame.melt(id_vars=["timestamp", "series"], value_vars=list(metrics), var_name="metric", value_name="value")
+    long = long.dropna(subset=["value"])
+    value = long["value"].astype(float)
+
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(long["timestamp"]),
+        "series": long["series"],
+        "metric": long["metric"],
+        "samples": 1,
+        "min": value,
+        "max": value,
+        "avg": value,
+        "sum": value,
+        "last": value
+    })
+
+def rollup_partials(db: Session, source: str, period: str, start: datetime, end: datetime,
+                    series: Optional[str] = None, target: Optional[str] = None) -> pd.DataFrame:
+    """
+    Charger les agrégats pré-calculés d'une cible sur une période
+    """
+    statement = select(
+        MetricRollup.bucket_start, MetricRollup.series, MetricRollup.metric, MetricRollup.samples,
+        MetricRollup.min, MetricRollup.max, MetricRollup.avg, MetricRollup.sum, MetricRollup.last
+    ).where(
+        MetricRollup.source == qualified_name(target, source),
+        MetricRollup.period == period,
+        MetricRollup.bucket_start >= start,
+        MetricRollup.bucket_start < end
+    )
+    if series:
+        statement = statement.where(MetricRollup.series == series)
+
+    frame = pd.DataFrame.from_records(db.execute(statement).all(), columns=_PARTIAL_COLUMNS)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    return frame
+
+def aggregate_partials(partials: pd.DataFrame, bucket_seconds: int) -> pd.DataFrame:
+    """
+    Combiner des agrégats partiels par intervalle, série et métrique
+
+    La moyenne est pondérée par le nombre d'échantillons, ce qui permet de
+    combiner indifféremment mesures brutes et agrégats pré-calculés.
+    """
+    partials = partials.sort_values("timestamp", kind="stable").copy()
+    partials["bucket"] = partials["timestamp"].dt.floor(f"{bucket_seconds}s")
+    partials["weighted"] = partials["avg"].astype(float) * partials["samples"]
+
+    result = partials.groupby(["bucket", "series", "metric"], sort=True).agg(
+        samples=("samples", "sum"),
+        min=("min", "min"),
+        max=("max", "max"),
+        sum=("sum", "sum"),
+        weighted=("weighted", "sum"),
+        last=("last", "last")
+    )
+    result["avg"] = result["weighted"] / result["samples"]
+    return result.drop(columns="weighted").reset_index()
+
+def _select_rollup_period(db: Session, source: str, bucket_seconds: int, target: Optional[str] = None):
+    """
+    Choisir la table d'agrégats la plus grossière compatible avec l'intervalle demandé
+    """
+    for period, period_seconds in ROLLUP_PERIODS.items():
+        if bucket_seconds % period_seconds != 0:
+            continue
+        watermark = db.execute(
+            select(RollupWatermark.watermark).where(
+                RollupWatermark.source == qualified_name(target, source),
+                RollupWatermark.period == period
+            )
+        ).scalar()
+        if watermark is not None:
+            return period, period_seconds, watermark
+    return None, None, None
+
+def _history(db: Session, source: str, start: datetime, end: datetime, bucket_seconds: int,
+             aggregations: List[str], series: Optional[str] = None, target: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Historique d'une source : agrégats pré-calculés jusqu'au filigrane, mesures brutes au-delà
+    """
+    period, period_seconds, watermark = _select_rollup_period(db, source, bucket_seconds, target)
+
+    # Les agrégats ne couvrent que les intervalles entièrement inclus dans la période demandée
+    # et antérieurs au filigrane ; les bords sont lus dans les mesures brutes
+    rollup_start = rollup_end = start
+    if period is not None:
+        rollup_start = min(floor_time(start + timedelta(seconds=period_seconds - 1), period_seconds), end)
+        rollup_end = max(rollup_start, min(watermark, floor_time(end, period_seconds)))
+
+    frames = []
+    if rollup_start > start:
+        frames.append(raw_partials(db, source, start, rollup_start, series, target))
+    if rollup_end > rollup_start:
+        frames.append(rollup_partials(db, source, period, rollup_start, rollup_end, series, target))
+    if end > rollup_end:
+        frames.append(raw_partials(db, source, rollup_end, end, series, target))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return []
+
+    result = aggregate_partials(pd.concat(frames, ignore_index=True), bucket_seconds)
+    return _to_points(result, SOURCES[source][1], aggregations, SOURCES[source][2])
+
+def _to_points(result: pd.DataFrame, metrics: Sequence[str], aggregations: List[str],
+               series_column: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Convertir un résultat agrégé (une ligne par intervalle, série et métrique) en points JSON
+    """
+    wide = result.pivot_table(
+        index=["bucket", "series"],
+        columns="metric",
+        values=["samples"] + aggregations,
+        aggfunc="first"
+    )
+    wide = wide.replace({np.nan: None})
+
+    points = []
+    for (bucket, series), row in wide.iterrows():
+        point = {"timestamp": bucket.isoformat()}
+        if series_column:
+            point[series_column] = series
+        point["samples"] = int(max(value for value in row["samples"].values if value is not None))
+        for aggregation in aggregations:
+            for metric in metrics:
+                point[f"{metric}_{aggregation}"] = row[aggregation].get(metric)
+        points.append(point)
+    return points
+
+def _response(start: datetime, end: datetime, bucket_seconds: int, aggregations: List[str],
+              points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "bucket": format_bucket(bucket_seconds),
+        "bucket_seconds": bucket_seconds,
+        "agg": aggregations,
+        "points": points
+    }
+
+def system_history(db: Session, start: datetime, end: datetime, bucket_seconds: Optional[int],
+                   aggregations: List[str], target: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Historique agrégé de la santé du système (CPU, mémoire, disque, latence)
+    """
+    bucket_seconds = effective_bucket(start, end, bucket_seconds)
+    points = _history(db, "system_health", start, end, bucket_seconds, aggregations, target=target)
+    return _response(start, end, bucket_seconds, aggregations, points)
+
+def accounts_history(db: Session, start: datetime, end: datetime, bucket_seconds: Optional[int],
+                     aggregations: List[str], target: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Historique agrégé de l'état des comptes
+    """
+    bucket_seconds = effective_bucket(start, end, bucket_seconds)
+    points = _history(db, "accounts_status", start, end, bucket_seconds, aggregations, target=target)
+    return _response(start, end, bucket_seconds, aggregations, points)
+
+def components_history(db: Session, start: datetime, end: datetime, bucket_seconds: Optional[int],
+                       aggregations: List[str], component_type: Optional[str] = None,
+                       target: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Historique agrégé des composants connectés/déconnectés et de leur disponibilité, une série par type
+    """
+    if component_type:
+        series = 1
+    else:
+        series = len(db.execute(
+            select(ComponentStatus.component_type).where(target_condition(ComponentStatus.target, target)).distinct()
+        ).all()) or 1
+
+    bucket_seconds = effective_bucket(start, end, bucket_seconds, series)
+    points = _history(db, "component_status", start, end, bucket_seconds, aggregations, component_type, target)
+    return _response(start, end, bucket_seconds, aggregations, points)
@@ -0,0 +1,231 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.config import HTTP_CACHE_CONFIG
+from app.models import DashboardData
+from app.snapshot import HealthSnapshot
+from app.targets import TARGET_NAMES
+
+try:
+    import orjson
+except ImportError:  # Encodeur de la bibliothèque standard, plus lent
+    orjson = None
+
+# Nombre de corps de réponse encodés conservés par cible (par représentation, version et encodage)
+MAX_CACHED_BODIES = 64
+
+def _brotli_module():
+    """
+    Retourner le module brotli s'il est installé
+    """
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+def snapshot_etag(snapshot: HealthSnapshot, encoding: Optional[str] = None) -> str:
+    """
+    ETag fort dérivé de la cible et de l'empreinte du contenu de l'instantané (une variante par encodage de contenu)
+
+    L'empreinte ne dépend que des données : chaque processus de l'API
+    retourne le même ETag pour le même cycle de collecte, et une requête
+    conditionnelle peut être servie par n'importe lequel d'entre eux.
+    """
+    suffix = f"-{encoding}" if encoding else ""
+    return f'"{snapshot.target}-{snapshot.digest}{suffix}"'
+
+def etag_matches(if_none_match: Optional[str], snapshot: HealthSnapshot) -> bool:
+    """
+    Comparer l'en-tête If-None-Match à l'instantané, quel que soit l'encodage de la représentation
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = snapshot_etag(snapshot).strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == opaque or tag in (f"{opaque}-gzip", f"{opaque}-br"):
+            return True
+    return False
+
+def select_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Choisir l'encodage de contenu accepté par le client (brotli si disponible, sinon gzip)
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+
+    if "br" in accepted and _brotli_module() is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def cache_control(next_update: Optional[datetime]) -> str:
+    """
+    En-tête Cache-Control valable jusqu'à la prochaine collecte planifiée
+
+    Les données sont propres à l'organisation : elles ne doivent pas être
+    conservées par des caches partagés.
+    """
+    if next_update is None:
+        return "private, no-cache"
+    max_age = max(0, int((next_update - datetime.now()).total_seconds()))
+    return f"private, max-age={max_age}, must-revalidate"
+
+def encode_json(payload: Any) -> bytes:
+    """
+    Encoder une réponse JSON compacte en UTF-8 (orjson si disponible)
+
+    Les types inconnus de l'encodeur (modèles Pydantic, etc.) passent par jsonable_encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+# Nombre d'événements retournés par défaut par /api/events et /api/logins/failed
+DEFAULT_EVENTS_LIMIT = 10
+
+def dashboard_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Champs de DashboardData, sans validation Pydantic (les données de l'instantané sont déjà conformes)
+    """
+    return {
+        name: data[name] if name in data else field.get_default(call_default_factory=True)
+        for name, field in DashboardData.model_fields.items()
+    }
+
+def events_payload(limit: int) -> Callable[[Dict[str, Any]], Any]:
+    return lambda data: {"events": data.get("recent_activities", [])[:limit]}
+
+def logins_payload(limit: int) -> Callable[[Dict[str, Any]], Any]:
+    return lambda data: {"logins": data.get("failed_logins", [])[:limit]}
+
+# Représentations des instantanés servies par l'API, encodées dès la publication
+REPRESENTATIONS: Dict[Tuple, Callable[[Dict[str, Any]], Any]] = {
+    ("dashboard",): dashboard_payload,
+    ("component_status",): lambda data: data.get("component_status", {"Items": []}),
+    ("vault_status",): lambda data: data.get("vault_status", {"Safes": {}}),
+    ("accounts_status",): lambda data: data.get("accounts_status", {"value": {}}),
+    ("system_health",): lambda data: data.get("system_health", {}),
+    ("events", DEFAULT_EVENTS_LIMIT): events_payload(DEFAULT_EVENTS_LIMIT),
+    ("logins", DEFAULT_EVENTS_LIMIT): logins_payload(DEFAULT_EVENTS_LIMIT),
+}
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return _brotli_module().compress(body, quality=HTTP_CACHE_CONFIG["brotli_quality"])
+    if encoding == "gzip":
+        # mtime fixe : les mêmes données donnent les mêmes octets dans tous les processus (ETag fort)
+        return gzip.compress(body, compresslevel=HTTP_CACHE_CONFIG["gzip_level"], mtime=0)
+    return body
+
+class _BodyCache:
+    def __init__(self, max_entries: int):
+        """
+        Corps de réponse déjà encodés et compressés, par représentation et version d'instantané
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._bodies: "OrderedDict[Tuple, Tuple[bytes, Optional[str]]]" = OrderedDict()
+
+    def get(self, key: Tuple, build: Callable[[], Tuple[bytes, Optional[str]]]) -> Tuple[bytes, Optional[str]]:
+        with self._lock:
+            if key in self._bodies:
+                self._bodies.move_to_end(key)
+                return self._bodies[key]
+
+        value = build()
+        with self._lock:
+            self._bodies[key] = value
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return value
+
+_bodies = _BodyCache(MAX_CACHED_BODIES * len(TARGET_NAMES))
+
+def _encoded_body(key: Tuple, snapshot_id: Optional[Tuple], data: Dict[str, Any],
+                  select: Callable[[Dict[str, Any]], Any], encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    Corps encodé d'une représentation, compressé si l'encodage est accepté et que la taille le justifie
+
+    snapshot_id: (cible, version) de l'instantané, None pour des données non versionnées
+    """
+    def build() -> Tuple[bytes, Optional[str]]:
+        if encoding is None:
+            return encode_json(select(data)), None
+        body, _ = _encoded_body(key, snapshot_id, data, select, None)
+        if len(body) < HTTP_CACHE_CONFIG["compression_min_size"]:
+            return body, None
+        return compress(body, encoding), encoding
+
+    return _bodies.get((key, snapshot_id, encoding), build)
+
+def prime_snapshot(snapshot: HealthSnapshot):
+    """
+    Encoder les représentations d'un nouvel instantané dès sa publication
+
+    Appelée par le magasin d'instantanés, hors de la boucle d'événements :
+    les requêtes suivantes servent directement les octets produits.
+    """
+    for key, select in REPRESENTATIONS.items():
+        _encoded_body(key, (snapshot.target, snapshot.version), snapshot.data, select, None)
+        _encoded_body(key, (snapshot.target, snapshot.version), snapshot.data, select, "gzip")
+
+def snapshot_response(request: Request, snapshot: Optional[HealthSnapshot], data: Dict[str, Any],
+                      key: Tuple, next_update: Optional[datetime]) -> Response:
+    """
+    Réponse JSON conditionnelle pour une représentation d'un instantané
+
+    Un client dont l'en-tête If-None-Match correspond à l'instantané courant
+    reçoit une réponse 304 sans corps. Sinon, le corps déjà encodé (et
+    compressé si le client l'accepte) pour cette version est servi tel quel.
+    """
+    select = REPRESENTATIONS.get(key)
+    if select is None:
+        select = events_payload(key[1]) if key[0] == "events" else logins_payload(key[1])
+
+    headers = {"Cache-Control": cache_control(next_update), "Vary": "Accept-Encoding"}
+
+    if snapshot is None:
+        # Données de secours non versionnées : pas de validation possible
+        headers["Cache-Control"] = "no-cache"
+        return Response(encode_json(select(data)), media_type="application/json", headers=headers)
+
+    # Encodage de la représentation (corps mis en cache) : la 304 porte le même ETag que la 200
+    accepted = select_encoding(request.headers.get("accept-encoding"))
+    body, encoding = _encoded_body(key, (snapshot.target, snapshot.version), data, select, accepted)
+    headers["ETag"] = snapshot_etag(snapshot, encoding)
+
+    if etag_matches(request.headers.get("if-none-match"), snapshot):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
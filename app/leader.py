@@ -0,0 +1,229 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import COLLECTOR_CONFIG, RETENTION_CONFIG, ROLLUP_CONFIG
+from app.health_collector import collector
+from app.models import SchedulerLease, SessionLocal
+from app.retention import retention_job
+from app.rollups import rollup_job
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('leader')
+
+class LeaderLease:
+    def __init__(self, name: str, ttl: float, owner: Optional[str] = None):
+        """
+        Bail exclusif stocké en base (table scheduler_leases)
+
+        Un seul processus, sur un ou plusieurs hôtes partageant la base,
+        détient le bail à un instant donné. Il le prolonge avant son
+        échéance ; s'il s'arrête ou se bloque, le bail expire et un autre
+        processus le reprend. Les horloges des hôtes doivent être
+        synchronisées à une fraction de `ttl` près.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        """
+        Prendre ou prolonger le bail ; retourne True si ce processus le détient
+        """
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.owner == self.owner, SchedulerLease.owner.is_(None), SchedulerLease.expires_at < now)
+                )
+                .values(owner=self.owner, expires_at=now + timedelta(seconds=self.ttl))
+            )
+            if result.rowcount == 1:
+                db.commit()
+                return True
+
+            exists = db.query(SchedulerLease.id).filter(SchedulerLease.name == self.name).first()
+            if exists:
+                db.rollback()
+                return False
+
+            # Première élection : la contrainte d'unicité départage les candidats simultanés
+            db.add(SchedulerLease(name=self.name, owner=self.owner, acquired_at=now,
+                                  expires_at=now + timedelta(seconds=self.ttl)))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def mark_acquired(self):
+        """
+        Enregistrer le début du mandat (consultation)
+        """
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.owner == self.owner)
+                .values(acquired_at=datetime.now())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def release(self):
+        """
+        Libérer le bail pour qu'un autre processus le reprenne sans attendre son échéance
+        """
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.owner == self.owner)
+                .values(owner=None, expires_at=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        """
+        Détenteur courant du bail, s'il n'a pas expiré
+        """
+        db = SessionLocal()
+        try:
+            lease = db.query(SchedulerLease).filter(SchedulerLease.name == self.name).first()
+            if lease is None or lease.owner is None or lease.expires_at < datetime.now():
+                return None
+            return {
+                "owner": lease.owner,
+                "acquired_at": lease.acquired_at.isoformat() if lease.acquired_at else None,
+                "expires_at": lease.expires_at.isoformat()
+            }
+        finally:
+            db.close()
+
+class LeaderElection:
+    def __init__(self, lease: LeaderLease, on_elected: Callable[[], None], on_demoted: Callable[[], None]):
+        """
+        Candidature permanente au bail : `on_elected` est appelé à la prise
+        du bail, `on_demoted` à sa perte ou à l'arrêt
+
+        Le bail est renouvelé tous les tiers de sa durée. Une erreur de base
+        de données lors du renouvellement fait perdre le rôle : mieux vaut
+        une collecte manquée que deux planificateurs simultanés.
+        """
+        self.lease = lease
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """
+        Démarrer la candidature
+        """
+        if self.thread and self.thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run_loop, name=f"election-{self.lease.name}")
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Candidature au rôle {self.lease.name} ({self.lease.owner})")
+
+    def stop(self):
+        """
+        Arrêter la candidature et libérer le bail s'il est détenu
+        """
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=30)
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                elected = self.lease.acquire()
+            except Exception as e:
+                logger.error(f"Erreur lors du renouvellement du bail {self.lease.name}: {str(e)}")
+                elected = False
+
+            if elected and not self.is_leader:
+                self._set_leader(True)
+            elif not elected and self.is_leader:
+                logger.warning(f"Bail {self.lease.name} perdu ({self.lease.owner})")
+                self._set_leader(False)
+
+            self._stop_event.wait(self.lease.ttl / 3)
+
+        if self.is_leader:
+            self._set_leader(False)
+            try:
+                self.lease.release()
+            except Exception as e:
+                logger.error(f"Erreur lors de la libération du bail {self.lease.name}: {str(e)}")
+
+    def _set_leader(self, leader: bool):
+        self.is_leader = leader
+        try:
+            if leader:
+                logger.info(f"Processus élu pour le rôle {self.lease.name} ({self.lease.owner})")
+                self.lease.mark_acquired()
+                self.on_elected()
+            else:
+                self.on_demoted()
+        except Exception as e:
+            logger.error(f"Erreur lors du changement de rôle {self.lease.name}: {str(e)}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        État de l'élection pour l'API
+        """
+        return {
+            "owner": self.lease.owner,
+            "is_leader": self.is_leader,
+            "leader": self.lease.holder()
+        }
+
+def start_scheduling():
+    """
+    Tâches réservées au processus élu : collectes planifiées, compaction et purge
+    """
+    collector.start()
+    if ROLLUP_CONFIG["enabled"]:
+        rollup_job.start()
+    if RETENTION_CONFIG["enabled"]:
+        retention_job.start()
+
+def stop_scheduling():
+    """
+    Rendre les tâches du processus élu (perte du bail ou arrêt)
+    """
+    collector.stop_scheduler()
+    rollup_job.stop()
+    retention_job.stop()
+
+# Créer une instance singleton de l'élection du planificateur
+scheduler_election = LeaderElection(
+    LeaderLease("scheduler", COLLECTOR_CONFIG["lease_ttl"]),
+    on_elected=start_scheduling,
+    on_demoted=stop_scheduling
+)
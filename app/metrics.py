@@ -0,0 +1,235 @@
+import logging
+import os
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app.targets import PRIMARY_TARGET
+
+if TYPE_CHECKING:
+    from app.snapshot import HealthSnapshot
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='api.log'
+)
+logger = logging.getLogger('metrics')
+
+# Appels au PVWA : de la première tentative au résultat (nouvelles tentatives et reconnexion comprises)
+CYBERARK_REQUEST_DURATION = Histogram(
+    "cyberark_api_request_duration_seconds",
+    "Durée des lectures de l'API CyberArk",
+    ["target", "endpoint", "outcome"],  # outcome : success, error, short_circuited
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+# Cycles de collecte
+COLLECTION_DURATION = Histogram(
+    "cyberark_collection_duration_seconds",
+    "Durée des cycles de collecte (récupération et stockage)",
+    ["target", "outcome"],  # outcome : success, failure
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+COLLECTED_SECTIONS = Counter(
+    "cyberark_collection_sections",
+    "Sections collectées par cible et résultat",
+    ["target", "section", "outcome"]
+)
+COLLECTION_SKIPPED_SLOTS = Counter(
+    "cyberark_collection_skipped_slots",
+    "Créneaux de collecte sautés (collecte précédente de la section non terminée)",
+    ["target", "section"]
+)
+COLLECTION_LAST_SUCCESS = Gauge(
+    "cyberark_collection_last_success_timestamp_seconds",
+    "Date de la dernière collecte réussie",
+    ["target"],
+    multiprocess_mode="max"
+)
+
+# Écritures en base de données
+DB_WRITE_DURATION = Histogram(
+    "cyberark_db_write_duration_seconds",
+    "Durée des insertions par lots",
+    ["table"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+DB_ROWS_WRITTEN = Counter(
+    "cyberark_db_rows_written",
+    "Lignes insérées par table",
+    ["table"]
+)
+
+# Écriture différée des cycles de collecte
+WRITE_BEHIND_PENDING = Gauge(
+    "cyberark_write_behind_pending_cycles",
+    "Cycles de collecte en attente d'écriture en base, en mémoire (memory) ou dans le journal (journal)",
+    ["location"],
+    multiprocess_mode="livesum"
+)
+WRITE_BEHIND_SPILLED = Counter(
+    "cyberark_write_behind_spilled_cycles",
+    "Cycles de collecte ajoutés au journal (base indisponible ou file pleine)"
+)
+
+# Lectures de l'instantané en mémoire
+SNAPSHOT_READS = Counter(
+    "cyberark_snapshot_reads",
+    "Lectures de l'instantané : hit (frais), miss (rechargement), shared (rechargement partagé)",
+    ["target", "result"]
+)
+
+# Requêtes HTTP servies par l'API
+HTTP_REQUEST_DURATION = Histogram(
+    "cyberark_http_request_duration_seconds",
+    "Durée des requêtes HTTP par route (durée de connexion pour /api/stream)",
+    ["method", "route", "status"]
+)
+
+# Dernières valeurs de santé publiées, pour alerter sans interroger /api/dashboard
+SNAPSHOT_TIMESTAMP = Gauge(
+    "cyberark_snapshot_timestamp_seconds", "Date de publication du dernier instantané",
+    ["target"], multiprocess_mode="mostrecent"
+)
+COMPONENTS_CONNECTED = Gauge(
+    "cyberark_components_connected", "Composants connectés par type",
+    ["target", "component_type"], multiprocess_mode="mostrecent"
+)
+COMPONENTS_DISCONNECTED = Gauge(
+    "cyberark_components_disconnected", "Composants déconnectés par type",
+    ["target", "component_type"], multiprocess_mode="mostrecent"
+)
+SYSTEM_USAGE = Gauge(
+    "cyberark_system_usage_percent", "Utilisation des ressources du système (cpu, memory, disk)",
+    ["target", "resource"], multiprocess_mode="mostrecent"
+)
+SYSTEM_NETWORK_LATENCY = Gauge(
+    "cyberark_system_network_latency_milliseconds", "Latence réseau mesurée par le PVWA",
+    ["target"], multiprocess_mode="mostrecent"
+)
+VAULT_SAFES = Gauge(
+    "cyberark_vault_safes", "Nombre de coffres",
+    ["target"], multiprocess_mode="mostrecent"
+)
+VAULT_LICENSE_EXPIRATION = Gauge(
+    "cyberark_vault_license_expiration_timestamp_seconds", "Date d'expiration de la licence",
+    ["target"], multiprocess_mode="mostrecent"
+)
+ACCOUNTS = Gauge(
+    "cyberark_accounts", "Comptes par état (total, managed, non_managed, pending, failed)",
+    ["target", "state"], multiprocess_mode="mostrecent"
+)
+
+# Types de composants exportés par cible, pour retirer ceux qui disparaissent
+_component_types: Dict[str, Set[str]] = {}
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _timestamp(value: Any) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+def _set(gauge: Gauge, value: Any, *labels: str):
+    number = _number(value)
+    if number is not None:
+        gauge.labels(*labels).set(number)
+
+def record_snapshot(snapshot: "HealthSnapshot"):
+    """
+    Exporter les valeurs de santé d'un instantané publié (écouteur du SnapshotStore)
+    """
+    data = snapshot.data
+    target = snapshot.target or PRIMARY_TARGET
+    SNAPSHOT_TIMESTAMP.labels(target).set(time.time())
+
+    component_types = set()
+    for item in data.get("component_status", {}).get("Items", []):
+        component_type = item.get("Component Type", "Unknown")
+        component_types.add(component_type)
+        _set(COMPONENTS_CONNECTED, item.get("Connected", 0), target, component_type)
+        _set(COMPONENTS_DISCONNECTED, item.get("Disconnected", 0), target, component_type)
+    for component_type in _component_types.get(target, set()) - component_types:
+        COMPONENTS_CONNECTED.remove(target, component_type)
+        COMPONENTS_DISCONNECTED.remove(target, component_type)
+    _component_types[target] = component_types
+
+    health = data.get("system_health", {})
+    for resource, key in (("cpu", "CPU_Usage"), ("memory", "Memory_Usage"), ("disk", "Disk_Usage")):
+        _set(SYSTEM_USAGE, health.get(key), target, resource)
+    _set(SYSTEM_NETWORK_LATENCY, health.get("Network_Latency"), target)
+
+    safes = data.get("vault_status", {}).get("Safes", {})
+    _set(VAULT_SAFES, safes.get("Total_Safes"), target)
+    if safes.get("License_Expiration"):
+        _set(VAULT_LICENSE_EXPIRATION, _timestamp(safes["License_Expiration"]), target)
+
+    accounts = data.get("accounts_status", {}).get("value", {})
+    for state, key in (("total", "Total_Accounts"), ("managed", "Managed_Accounts"),
+                       ("non_managed", "Non_Managed_Accounts"), ("pending", "Pending_Accounts"),
+                       ("failed", "Failed_Accounts")):
+        _set(ACCOUNTS, accounts.get(key), target, state)
+
+def render_metrics() -> bytes:
+    """
+    Exposition des métriques au format texte Prometheus
+
+    Si PROMETHEUS_MULTIPROC_DIR est défini, les métriques de tous les
+    processus de l'hôte (workers uvicorn, collecteur autonome) sont agrégées.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        """
+        Middleware ASGI mesurant la durée des requêtes HTTP par route
+
+        La route est le modèle de chemin de l'endpoint (ex: /api/runs/{run_id}/dashboard)
+        pour borner le nombre de séries ; les chemins hors API sont regroupés.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path", "other"),
+                str(status)
+            ).observe(time.perf_counter() - started)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, create_engine, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, create_engine, ForeignKey, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
@@ -9,7 +9,11 @@ from app.config import DB_CONFIG
 
 # Créer une connexion à la base de données
 if DB_CONFIG["connection_string"]:
-    engine = create_engine(DB_CONFIG["connection_string"])
+    engine_options = {}
+    if DB_CONFIG["connection_string"].startswith("mssql+pyodbc") and DB_CONFIG["fast_executemany"]:
+        # Envoyer les insertions par lots en un seul appel ODBC
+        engine_options["fast_executemany"] = True
+    engine = create_engine(DB_CONFIG["connection_string"], **engine_options)
 else:
     # Fallback to SQLite for demo if no connection string is provided
     engine = create_engine("sqlite:///cyberark_health.db")
@@ -21,11 +25,32 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 # Modèles SQLAlchemy pour la base de données
+class CollectionRun(Base):
+    __tablename__ = "collection_runs"
+    __table_args__ = (
+        Index("ix_collection_runs_status_id", "status", "id"),
+        Index("ix_collection_runs_target_status_id", "target", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    target = Column(String(100), nullable=True)  # Cible de collecte (environnement PVWA)
+    started_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+    duration = Column(Float, nullable=True)  # Durée en secondes
+    status = Column(String(50))  # running, complete, failed
+    source = Column(String(50))  # scheduled, api
+    sections = Column(String(200), nullable=True)  # Sections collectées séparées par des virgules (NULL : toutes)
+
 class ComponentStatus(Base):
     __tablename__ = "component_status"
+    __table_args__ = (
+        Index("ix_component_status_type_timestamp", "component_type", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.now)
+    collection_run_id = Column(Integer, ForeignKey("collection_runs.id"), nullable=True, index=True)
+    target = Column(String(100), nullable=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     component_type = Column(String(100))
     total_amount = Column(Integer)
     connected = Column(Integer)
@@ -38,8 +63,10 @@ class Component(Base):
     __tablename__ = "components"
 
     id = Column(Integer, primary_key=True, index=True)
-    component_status_id = Column(Integer, ForeignKey("component_status.id"))
-    timestamp = Column(DateTime, default=datetime.now)
+    collection_run_id = Column(Integer, ForeignKey("collection_runs.id"), nullable=True, index=True)
+    target = Column(String(100), nullable=True)
+    component_status_id = Column(Integer, ForeignKey("component_status.id"), index=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     component_type = Column(String(100))
     component_version = Column(String(100))
     ip_address = Column(String(100))
@@ -54,7 +81,9 @@ class VaultStatus(Base):
     __tablename__ = "vault_status"
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.now)
+    collection_run_id = Column(Integer, ForeignKey("collection_runs.id"), nullable=True, index=True)
+    target = Column(String(100), nullable=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     total_safes = Column(Integer)
     total_accounts = Column(Integer)
     version = Column(String(100))
@@ -65,7 +94,9 @@ class AccountsStatus(Base):
     __tablename__ = "accounts_status"
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.now)
+    collection_run_id = Column(Integer, ForeignKey("collection_runs.id"), nullable=True, index=True)
+    target = Column(String(100), nullable=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     total_accounts = Column(Integer)
     managed_accounts = Column(Integer)
     non_managed_accounts = Column(Integer)
@@ -76,7 +107,9 @@ class SystemHealth(Base):
     __tablename__ = "system_health"
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.now)
+    collection_run_id = Column(Integer, ForeignKey("collection_runs.id"), nullable=True, index=True)
+    target = Column(String(100), nullable=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     cpu_usage = Column(Float)
     memory_usage = Column(Float)
     disk_usage = Column(Float)
@@ -85,9 +118,24 @@ class SystemHealth(Base):
 
 class SecurityEvent(Base):
     __tablename__ = "security_events"
+    __table_args__ = (
+        Index("ix_security_events_type_timestamp", "event_type", "timestamp"),
+        # Pagination par curseur (timestamp, id), sans filtre ou filtrée par égalité sur une colonne
+        Index("ix_security_events_timestamp_id", "timestamp", "id"),
+        Index("ix_security_events_username_timestamp", "username", "timestamp", "id"),
+        Index("ix_security_events_source_ip_timestamp", "source_ip", "timestamp", "id"),
+        Index("ix_security_events_severity_timestamp", "severity", "timestamp", "id"),
+        Index("ix_security_events_target_safe_timestamp", "target_safe", "timestamp", "id"),
+        # Les lignes antérieures à la déduplication n'ont pas d'empreinte (index filtré sur SQL Server,
+        # qui n'accepte qu'une seule valeur NULL dans un index unique)
+        Index("ix_security_events_event_hash", "event_hash", unique=True,
+              mssql_where=text("event_hash IS NOT NULL")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.now)
+    collection_run_id = Column(Integer, ForeignKey("collection_runs.id"), nullable=True, index=True)
+    target = Column(String(100), nullable=True)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     event_type = Column(String(100))
     username = Column(String(255))
     source_ip = Column(String(100))
@@ -96,6 +144,89 @@ class SecurityEvent(Base):
     severity = Column(String(50))
     description = Column(Text)
     raw_data = Column(Text)
+    event_hash = Column(String(64), nullable=True)  # Empreinte SHA-256 du contenu de l'événement
+
+class SecurityEventArchive(Base):
+    __tablename__ = "security_events_archive"
+    
+    # Les identifiants d'origine sont conservés
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    collection_run_id = Column(Integer, nullable=True)
+    target = Column(String(100), nullable=True)
+    timestamp = Column(DateTime, index=True)
+    event_type = Column(String(100))
+    username = Column(String(255))
+    source_ip = Column(String(100))
+    target_safe = Column(String(255), nullable=True)
+    target_account = Column(String(255), nullable=True)
+    severity = Column(String(50))
+    description = Column(Text)
+    raw_data = Column(Text)
+    event_hash = Column(String(64), nullable=True)
+    archived_at = Column(DateTime, default=datetime.now)
+
+class IngestionCursor(Base):
+    __tablename__ = "ingestion_cursors"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(50), unique=True)  # recent_activities, failed_logins (préfixé par la cible hors cible principale)
+    last_timestamp = Column(DateTime, nullable=True)  # Date du dernier événement stocké
+    last_hash = Column(String(64), nullable=True)  # Empreinte du dernier événement stocké
+    updated_at = Column(DateTime, default=datetime.now)
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(50), unique=True)  # Rôle exclusif (scheduler)
+    owner = Column(String(200), nullable=True)  # Processus détenteur (hôte:pid:identifiant)
+    acquired_at = Column(DateTime, nullable=True)  # Début du mandat du détenteur courant
+    expires_at = Column(DateTime, nullable=True)  # Échéance du bail, prolongée tant que le détenteur est actif
+
+class CollectionRequest(Base):
+    __tablename__ = "collection_requests"
+    __table_args__ = (
+        Index("ix_collection_requests_status_id", "status", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    target = Column(String(100))  # Cible à collecter
+    source = Column(String(50))  # api
+    status = Column(String(50))  # pending, running, succeeded, failed
+    error = Column(Text, nullable=True)
+    requested_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class MetricRollup(Base):
+    __tablename__ = "metric_rollups"
+    __table_args__ = (
+        Index("ix_metric_rollups_lookup", "source", "period", "bucket_start", "series", "metric", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(50))  # system_health, component_status, accounts_status (préfixé par la cible hors cible principale)
+    period = Column(String(10))  # 1h, 1d
+    bucket_start = Column(DateTime)
+    series = Column(String(100))  # Type de composant pour component_status, vide sinon
+    metric = Column(String(50))
+    samples = Column(Integer)
+    min = Column(Float)
+    max = Column(Float)
+    avg = Column(Float)
+    sum = Column(Float)
+    last = Column(Float)
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    __table_args__ = (
+        Index("ix_rollup_watermarks_source_period", "source", "period", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(50))
+    period = Column(String(10))
+    watermark = Column(DateTime)  # Les intervalles antérieurs à cette date sont agrégés
 
 # Modèles Pydantic pour l'API
 class ComponentStatusBase(BaseModel):
@@ -146,6 +277,7 @@ class SecurityEventBase(BaseModel):
     raw_data: Optional[str] = None
 
 class DashboardData(BaseModel):
+    target: Optional[str] = None
     component_status: dict
     vault_status: dict
     accounts_status: dict
@@ -154,6 +286,92 @@ class DashboardData(BaseModel):
     failed_logins: List[dict] = []
     last_update: str
 
+# Table FTS5 (SQLite) indexant la description et les données brutes des événements
+SECURITY_EVENTS_FTS = "security_events_fts"
+
+# Catalogue de recherche en texte intégral (SQL Server)
+FULL_TEXT_CATALOG = "cyberark_health_catalog"
+
 # Créer les tables dans la base de données
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+    if DB_CONFIG["full_text_search"]:
+        create_search_index()
+
+# Mettre à niveau une base existante (create_all ne modifie pas les tables déjà créées)
+def upgrade_schema():
+    inspector = inspect(engine)
+    
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        
+        # Ajouter les colonnes nullables ajoutées aux modèles (les contraintes de clé étrangère
+        # ne sont pas créées sur les tables existantes)
+        with engine.begin() as connection:
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD {column.name} {column_type}"))
+        
+        # Créer les index ajoutés aux modèles après la création des tables
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=engine)
+
+# Créer l'index plein texte des événements de sécurité, tenu à jour par la base à chaque insertion
+def create_search_index():
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SECURITY_EVENTS_FTS}
+            ).first()
+            if exists:
+                return
+            # Table à contenu externe : seul l'index est stocké, les déclencheurs le synchronisent
+            fts = SECURITY_EVENTS_FTS
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                "description, raw_data, content='security_events', content_rowid='id')"
+            ))
+            connection.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS security_events_fts_insert AFTER INSERT ON security_events BEGIN "
+                f"INSERT INTO {fts}(rowid, description, raw_data) VALUES (new.id, new.description, new.raw_data); END"
+            ))
+            connection.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS security_events_fts_delete AFTER DELETE ON security_events BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, description, raw_data) "
+                "VALUES ('delete', old.id, old.description, old.raw_data); END"
+            ))
+            connection.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS security_events_fts_update "
+                "AFTER UPDATE OF description, raw_data ON security_events BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, description, raw_data) "
+                "VALUES ('delete', old.id, old.description, old.raw_data); "
+                f"INSERT INTO {fts}(rowid, description, raw_data) VALUES (new.id, new.description, new.raw_data); END"
+            ))
+            # Indexer les événements déjà stockés
+            connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    
+    elif engine.dialect.name == "mssql":
+        # CREATE FULLTEXT INDEX n'est pas accepté dans une transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            if not connection.execute(text("SELECT FULLTEXTSERVICEPROPERTY('IsFullTextInstalled')")).scalar():
+                return
+            if connection.execute(text(
+                "SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('security_events')"
+            )).first():
+                return
+            if not connection.execute(
+                text("SELECT 1 FROM sys.fulltext_catalogs WHERE name = :name"), {"name": FULL_TEXT_CATALOG}
+            ).first():
+                connection.execute(text(f"CREATE FULLTEXT CATALOG {FULL_TEXT_CATALOG}"))
+            key_index = connection.execute(text(
+                "SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID('security_events') AND is_primary_key = 1"
+            )).scalar()
+            # Suivi automatique des modifications : l'index est alimenté en continu, sans tâche planifiée
+            connection.execute(text(
+                "CREATE FULLTEXT INDEX ON security_events (description, raw_data) "
+                f"KEY INDEX {key_index} ON {FULL_TEXT_CATALOG} WITH CHANGE_TRACKING AUTO"
+            ))
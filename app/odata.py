@@ -0,0 +1,335 @@
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, and_, func, not_, or_, select, true
+from sqlalchemy.orm import Session
+
+from app.config import ODATA_CONFIG
+from app.export import EXPORT_TABLES
+from app.targets import target_condition
+
+# Espace de noms des types du document $metadata
+ODATA_NAMESPACE = "CyberArkHealth"
+
+# Types EDM des colonnes, du plus spécifique au plus général (String par défaut)
+_EDM_TYPES = ((Boolean, "Edm.Boolean"), (Integer, "Edm.Int64"), (Float, "Edm.Double"), (DateTime, "Edm.DateTimeOffset"))
+
+# Lexèmes de $filter : chaîne 'entre apostrophes', date, nombre, identifiant, ponctuation
+_FILTER_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<datetime>\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:\d{2})?)?)
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<punct>[(),])
+    )""", re.VERBOSE)
+
+_COMPARISONS = {
+    "eq": lambda column, value: column.is_(None) if value is None else column == value,
+    "ne": lambda column, value: column.is_not(None) if value is None else column != value,
+    "gt": lambda column, value: column > value,
+    "ge": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "le": lambda column, value: column <= value,
+}
+# Comparaison équivalente lorsque le littéral est à gauche (5 lt x : x gt 5)
+_REVERSED = {"eq": "eq", "ne": "ne", "gt": "lt", "ge": "le", "lt": "gt", "le": "ge"}
+
+_STRING_FUNCTIONS = {
+    "contains": lambda column, value: column.contains(value, autoescape=True),
+    "startswith": lambda column, value: column.startswith(value, autoescape=True),
+    "endswith": lambda column, value: column.endswith(value, autoescape=True),
+}
+
+_LITERALS = {"null": None, "true": True, "false": False}
+
+class ODataQueryError(ValueError):
+    """
+    Options de requête OData invalides ou non prises en charge
+    """
+
+def edm_type(column) -> str:
+    for sql_type, name in _EDM_TYPES:
+        if isinstance(column.type, sql_type):
+            return name
+    return "Edm.String"
+
+def metadata_document() -> str:
+    """
+    Document $metadata (CSDL, OData 4.0) décrivant un type et un ensemble d'entités par table exposée
+    """
+    types, sets = [], []
+    for name, model in EXPORT_TABLES.items():
+        properties = "".join(
+            f'<Property Name="{column.name}" Type="{edm_type(column)}"'
+            f'{"" if column.nullable else " Nullable=" + quoteattr("false")}/>'
+            for column in model.__table__.columns
+        )
+        types.append(f'<EntityType Name="{name}"><Key><PropertyRef Name="id"/></Key>{properties}</EntityType>')
+        sets.append(f'<EntitySet Name="{name}" EntityType="{ODATA_NAMESPACE}.{name}"/>')
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<edmx:Edmx Version="4.0" xmlns:edmx="http://docs.oasis-open.org/odata/ns/edmx"><edmx:DataServices>'
+        f'<Schema Namespace="{ODATA_NAMESPACE}" xmlns="http://docs.oasis-open.org/odata/ns/edm">'
+        f'{"".join(types)}<EntityContainer Name="Container">{"".join(sets)}</EntityContainer>'
+        '</Schema></edmx:DataServices></edmx:Edmx>'
+    )
+
+def parse_datetime(value: str) -> datetime:
+    """
+    Convertir une date OData (2024-01-01, 2024-01-01T00:00:00Z) en date locale sans fuseau, comme les dates stockées
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ODataQueryError(f"Date invalide: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _FILTER_TOKEN.match(expression, position)
+        if match is None:
+            raise ODataQueryError(f"$filter invalide près de: {expression[position:position + 20]}")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+class _FilterParser:
+    """
+    Analyseur de $filter produisant une condition SQLAlchemy
+
+    Grammaire prise en charge : comparaisons (eq, ne, gt, ge, lt, le) entre
+    une colonne et un littéral, and, or, not, parenthèses, fonctions
+    contains, startswith et endswith, colonne booléenne seule.
+    """
+    def __init__(self, model, expression: str):
+        self.columns = model.__table__.columns
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def parse(self):
+        condition = self._or()
+        if self.position < len(self.tokens):
+            raise ODataQueryError(f"$filter invalide près de: {self.tokens[self.position][1]}")
+        return condition
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _take(self, expected: Optional[str] = None) -> str:
+        kind, value = self._peek()
+        if kind is None or (expected is not None and value != expected):
+            raise ODataQueryError(f"$filter incomplet: {expected or 'expression'} attendu")
+        self.position += 1
+        return value
+
+    def _keyword(self, keyword: str) -> bool:
+        kind, value = self._peek()
+        if kind == "name" and value == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def _or(self):
+        conditions = [self._and()]
+        while self._keyword("or"):
+            conditions.append(self._and())
+        return conditions[0] if len(conditions) == 1 else or_(*conditions)
+
+    def _and(self):
+        conditions = [self._unary()]
+        while self._keyword("and"):
+            conditions.append(self._unary())
+        return conditions[0] if len(conditions) == 1 else and_(*conditions)
+
+    def _unary(self):
+        if self._keyword("not"):
+            return not_(self._unary())
+        kind, value = self._peek()
+        if value == "(":
+            self._take("(")
+            condition = self._or()
+            self._take(")")
+            return condition
+        if kind == "name" and value in _STRING_FUNCTIONS:
+            self._take()
+            self._take("(")
+            column = self._column(self._take())
+            self._take(",")
+            literal = self._literal(column)
+            self._take(")")
+            if not isinstance(literal, str):
+                raise ODataQueryError(f"{value}() attend une chaîne")
+            return _STRING_FUNCTIONS[value](column, literal)
+        if kind == "name" and self.tokens[self.position + 1:self.position + 2] == [("punct", "(")]:
+            raise ODataQueryError(f"Fonction non prise en charge dans $filter: {value}")
+        return self._comparison()
+
+    def _comparison(self):
+        kind, value = self._peek()
+        if kind == "name" and value not in _LITERALS:
+            column = self._column(self._take())
+            operator = self._operator()
+            if operator is None:
+                # Colonne booléenne seule : connected équivaut à connected eq true
+                if isinstance(column.type, Boolean):
+                    return column == true()
+                raise ODataQueryError(f"Opérateur de comparaison attendu après {column.name}")
+            return _COMPARISONS[operator](column, self._literal(column))
+
+        # Littéral à gauche : la colonne est lue après l'opérateur
+        start = self.position
+        self._take()
+        operator = self._operator()
+        if operator is None:
+            raise ODataQueryError(f"$filter invalide près de: {value}")
+        column = self._column(self._take())
+        end, self.position = self.position, start
+        literal = self._literal(column)
+        self.position = end
+        return _COMPARISONS[_REVERSED[operator]](column, literal)
+
+    def _operator(self) -> Optional[str]:
+        kind, value = self._peek()
+        if kind == "name" and value in _COMPARISONS:
+            self.position += 1
+            return value
+        return None
+
+    def _column(self, name: str):
+        if name not in self.columns:
+            raise ODataQueryError(f"Propriété inconnue: {name}")
+        return self.columns[name]
+
+    def _literal(self, column) -> Any:
+        kind, value = self._peek()
+        self._take()
+        if kind == "name" and value in _LITERALS:
+            return _LITERALS[value]
+        if kind == "string":
+            value = value[1:-1].replace("''", "'")
+            return parse_datetime(value) if isinstance(column.type, DateTime) else value
+        if kind == "datetime":
+            if not isinstance(column.type, DateTime):
+                raise ODataQueryError(f"Date comparée à une propriété {edm_type(column)}: {column.name}")
+            return parse_datetime(value)
+        if kind == "number":
+            return float(value) if re.search(r"[.eE]", value) else int(value)
+        raise ODataQueryError(f"Littéral attendu, trouvé: {value}")
+
+def parse_filter(model, expression: str):
+    return _FilterParser(model, expression).parse()
+
+def parse_select(model, expression: Optional[str]) -> List[Any]:
+    columns = model.__table__.columns
+    if not expression or expression.strip() == "*":
+        return list(columns)
+    names = [name.strip() for name in expression.split(",") if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise ODataQueryError(f"Propriétés inconnues dans $select: {', '.join(unknown)}")
+    return [columns[name] for name in dict.fromkeys(names)]
+
+def parse_orderby(model, expression: Optional[str]) -> List[Any]:
+    """
+    Tri demandé, complété par id pour un ordre stable d'une page à l'autre
+    """
+    columns = model.__table__.columns
+    ordering, names = [], set()
+    for clause in (expression or "").split(","):
+        parts = clause.split()
+        if not parts:
+            continue
+        if len(parts) > 2 or parts[0] not in columns or (len(parts) == 2 and parts[1] not in ("asc", "desc")):
+            raise ODataQueryError(f"$orderby invalide: {clause.strip()}")
+        column = columns[parts[0]]
+        ordering.append(column.desc() if parts[-1] == "desc" else column.asc())
+        names.add(parts[0])
+    if "id" not in names:
+        ordering.append(columns["id"].asc())
+    return ordering
+
+def _serialize(value: Any) -> Any:
+    # Dates stockées en heure locale sans fuseau : Edm.DateTimeOffset exige un décalage
+    if isinstance(value, datetime):
+        return value.astimezone().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def query_entity_set(db: Session, entity_set: str, filter_expression: Optional[str] = None,
+                     select_expression: Optional[str] = None, orderby: Optional[str] = None,
+                     top: Optional[int] = None, skip: int = 0, skiptoken: Optional[str] = None,
+                     count: bool = False, range_start: Optional[str] = None, range_end: Optional[str] = None,
+                     target: Optional[str] = None, max_page_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lire une page d'un ensemble d'entités, filtres, tri et pagination exécutés par la base
+
+    $filter, $orderby, $top et $skip sont traduits en WHERE, ORDER BY, LIMIT
+    et OFFSET ; $select limite les colonnes lues. RangeStart et RangeEnd
+    (actualisation incrémentielle de Power BI) restreignent timestamp à
+    [RangeStart, RangeEnd[. Les pages font au plus max_page_size lignes ;
+    sans $orderby, la page suivante reprend après le dernier id lu
+    ($skiptoken) au lieu d'un OFFSET croissant.
+
+    Retourne les lignes, le nombre total éventuel ($count) et les options de
+    la page suivante, ou None s'il n'y en a pas.
+    """
+    if entity_set not in EXPORT_TABLES:
+        raise ODataQueryError(f"Ensemble d'entités inconnu: {entity_set}")
+    if (top is not None and top < 0) or skip < 0:
+        raise ODataQueryError("$top et $skip doivent être positifs")
+    model = EXPORT_TABLES[entity_set]
+    columns = parse_select(model, select_expression)
+    page_size = min(max_page_size or ODATA_CONFIG["max_page_size"], ODATA_CONFIG["max_page_size"])
+
+    conditions = []
+    if filter_expression:
+        conditions.append(parse_filter(model, filter_expression))
+    if range_start:
+        conditions.append(model.timestamp >= parse_datetime(range_start))
+    if range_end:
+        conditions.append(model.timestamp < parse_datetime(range_end))
+    if target:
+        conditions.append(target_condition(model.target, target))
+
+    total = None
+    if count:
+        total = db.execute(select(func.count()).select_from(model).where(*conditions)).scalar_one()
+
+    keyset = not orderby
+    if skiptoken is not None:
+        if not keyset or not skiptoken.isdigit():
+            raise ODataQueryError(f"$skiptoken invalide: {skiptoken}")
+        conditions.append(model.id > int(skiptoken))
+
+    limit = page_size if top is None else min(top, page_size)
+    # id toujours lu, pour le $skiptoken de la page suivante
+    statement = select(model.id, *columns).where(*conditions).order_by(*parse_orderby(model, orderby))
+    statement = statement.offset(skip or None).limit(limit + 1)
+    rows = db.execute(statement).all()
+
+    next_options = None
+    remaining = None if top is None else top - limit
+    if len(rows) > limit and (remaining is None or remaining > 0):
+        rows = rows[:limit]
+        next_options = {"$top": remaining}
+        if keyset:
+            # Les lignes sautées ($skip) sont déjà avant le dernier id lu
+            next_options.update({"$skiptoken": str(rows[-1][0]), "$skip": None})
+        else:
+            next_options["$skip"] = skip + limit
+    rows = rows[:limit]
+
+    names = [column.name for column in columns]
+    return {
+        "value": [{name: _serialize(value) for name, value in zip(names, row[1:])} for row in rows],
+        "count": total,
+        "next": next_options,
+    }
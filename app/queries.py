@@ -0,0 +1,241 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from app.models import (
+    CollectionRun,
+    ComponentStatus,
+    VaultStatus,
+    AccountsStatus,
+    SystemHealth,
+    SecurityEvent
+)
+from app.targets import PRIMARY_TARGET, target_condition
+
+# Nombre d'événements récents et de connexions échouées retournés avec le tableau de bord
+RECENT_EVENTS_LIMIT = 10
+
+def latest_component_statuses(db: Session, target: Optional[str] = None) -> List[ComponentStatus]:
+    """
+    Récupérer la dernière entrée d'état de chaque type de composant d'une cible
+
+    Le MAX(timestamp) par type est résolu sur l'index
+    (component_type, timestamp), puis chaque ligne est relue par jointure sur
+    ce même index. En cas d'égalité de timestamp, la ligne la plus récente
+    (identifiant le plus élevé) est conservée.
+    """
+    latest = (
+        db.query(
+            ComponentStatus.component_type.label("component_type"),
+            func.max(ComponentStatus.timestamp).label("timestamp")
+        )
+        .filter(target_condition(ComponentStatus.target, target))
+        .group_by(ComponentStatus.component_type)
+        .subquery()
+    )
+
+    rows = (
+        db.query(ComponentStatus)
+        .join(latest, and_(
+            ComponentStatus.component_type == latest.c.component_type,
+            ComponentStatus.timestamp == latest.c.timestamp
+        ))
+        .filter(target_condition(ComponentStatus.target, target))
+        .order_by(ComponentStatus.component_type, ComponentStatus.id.desc())
+        .all()
+    )
+
+    statuses = {}
+    for row in rows:
+        statuses.setdefault(row.component_type, row)
+    return list(statuses.values())
+
+def latest_complete_run(db: Session, target: Optional[str] = None) -> Optional[CollectionRun]:
+    """
+    Récupérer le dernier cycle de collecte terminé d'une cible (index (target, status, id))
+    """
+    return (
+        db.query(CollectionRun)
+        .filter(CollectionRun.status == "complete", target_condition(CollectionRun.target, target))
+        .order_by(CollectionRun.id.desc())
+        .first()
+    )
+
+def list_collection_runs(db: Session, limit: int = 50, target: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Lister les derniers cycles de collecte, du plus récent au plus ancien (toutes cibles si aucune n'est fournie)
+    """
+    query = db.query(CollectionRun)
+    if target:
+        query = query.filter(target_condition(CollectionRun.target, target))
+    runs = query.order_by(CollectionRun.id.desc()).limit(limit).all()
+    return [
+        {
+            "id": run.id,
+            "target": run.target or PRIMARY_TARGET,
+            "started_at": run.started_at.isoformat() if run.started_at else None,
+            "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+            "duration": run.duration,
+            "status": run.status,
+            "source": run.source,
+            "sections": run.sections.split(",") if run.sections else None
+        }
+        for run in runs
+    ]
+
+def load_run_health_data(db: Session, run: CollectionRun) -> Dict[str, Any]:
+    """
+    Reconstruire les données du tableau de bord à l'issue d'un cycle de collecte par accès indexés sur son identifiant
+
+    Un cycle peut ne collecter que certaines sections : chaque section est
+    lue dans le dernier cycle de la cible, jusqu'à celui-ci, qui l'a collectée.
+    """
+    def as_of(model):
+        return db.query(model).filter(model.collection_run_id <= run.id, target_condition(model.target, run.target))
+
+    component_run_id = (
+        db.query(func.max(ComponentStatus.collection_run_id))
+        .filter(ComponentStatus.collection_run_id <= run.id, target_condition(ComponentStatus.target, run.target))
+        .scalar()
+    )
+    component_statuses = (
+        db.query(ComponentStatus)
+        .filter(ComponentStatus.collection_run_id == component_run_id)
+        .order_by(ComponentStatus.id)
+        .all()
+    ) if component_run_id is not None else []
+    vault_status = as_of(VaultStatus).order_by(VaultStatus.collection_run_id.desc()).first()
+    accounts_status = as_of(AccountsStatus).order_by(AccountsStatus.collection_run_id.desc()).first()
+    system_health = as_of(SystemHealth).order_by(SystemHealth.collection_run_id.desc()).first()
+
+    # Les événements sont dédupliqués : un cycle ne stocke que ceux qu'il a découverts,
+    # les plus récents connus à la date du cycle sont donc lus sur tous les cycles jusqu'à celui-ci
+    known_events = as_of(SecurityEvent)
+
+    return build_health_data(
+        component_statuses,
+        vault_status,
+        accounts_status,
+        system_health,
+        known_events.filter(SecurityEvent.event_type != "Failed Login")
+        .order_by(SecurityEvent.timestamp.desc(), SecurityEvent.id.desc()).limit(RECENT_EVENTS_LIMIT).all(),
+        known_events.filter(SecurityEvent.event_type == "Failed Login")
+        .order_by(SecurityEvent.timestamp.desc(), SecurityEvent.id.desc()).limit(RECENT_EVENTS_LIMIT).all(),
+        run.finished_at or run.started_at,
+        run.target or PRIMARY_TARGET
+    )
+
+def load_latest_health_data(db: Session, target: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Reconstruire les dernières données du tableau de bord d'une cible stockées en base
+
+    Le dernier cycle terminé est utilisé ; les bases antérieures aux cycles
+    de collecte sont lues table par table.
+    """
+    run = latest_complete_run(db, target)
+    if run is not None:
+        return load_run_health_data(db, run)
+
+    def latest(model):
+        return db.query(model).filter(target_condition(model.target, target)).order_by(model.timestamp.desc())
+
+    return build_health_data(
+        latest_component_statuses(db, target),
+        latest(VaultStatus).first(),
+        latest(AccountsStatus).first(),
+        latest(SystemHealth).first(),
+        latest(SecurityEvent).filter(SecurityEvent.event_type != "Failed Login").limit(RECENT_EVENTS_LIMIT).all(),
+        latest(SecurityEvent).filter(SecurityEvent.event_type == "Failed Login").limit(RECENT_EVENTS_LIMIT).all(),
+        datetime.now(),
+        target or PRIMARY_TARGET
+    )
+
+def build_health_data(component_statuses: List[ComponentStatus],
+                      vault_status: Optional[VaultStatus],
+                      accounts_status: Optional[AccountsStatus],
+                      system_health: Optional[SystemHealth],
+                      events: List[SecurityEvent],
+                      failed_logins: List[SecurityEvent],
+                      last_update: datetime,
+                      target: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Convertir les lignes stockées au format des données du tableau de bord
+    """
+    component_status_data = [
+        {
+            "Component Type": cs.component_type,
+            "Total Amount": cs.total_amount,
+            "Connected": cs.connected,
+            "Disconnected": cs.disconnected,
+            "Status": cs.status
+        }
+        for cs in component_statuses
+    ]
+
+    vault_data = {}
+    if vault_status:
+        vault_data = {
+            "Total_Safes": vault_status.total_safes,
+            "Total_Accounts": vault_status.total_accounts,
+            "Version": vault_status.version,
+            "License_Status": vault_status.license_status,
+            "License_Expiration": vault_status.license_expiration.isoformat() if vault_status.license_expiration else ""
+        }
+
+    accounts_data = {}
+    if accounts_status:
+        accounts_data = {
+            "Total_Accounts": accounts_status.total_accounts,
+            "Managed_Accounts": accounts_status.managed_accounts,
+            "Non_Managed_Accounts": accounts_status.non_managed_accounts,
+            "Pending_Accounts": accounts_status.pending_accounts,
+            "Failed_Accounts": accounts_status.failed_accounts
+        }
+
+    health_data = {}
+    if system_health:
+        health_data = {
+            "CPU_Usage": system_health.cpu_usage,
+            "Memory_Usage": system_health.memory_usage,
+            "Disk_Usage": system_health.disk_usage,
+            "Network_Latency": system_health.network_latency,
+            "Last_Backup": system_health.last_backup.isoformat() if system_health.last_backup else ""
+        }
+
+    events_data = [
+        {
+            "EventType": event.event_type,
+            "Username": event.username,
+            "Source_IP": event.source_ip,
+            "Target_Safe": event.target_safe,
+            "Target_Account": event.target_account,
+            "Severity": event.severity,
+            "Description": event.description,
+            "Timestamp": event.timestamp.isoformat()
+        }
+        for event in events
+    ]
+
+    logins_data = [
+        {
+            "Username": login.username,
+            "Source_IP": login.source_ip,
+            "Reason": login.description,
+            "Severity": login.severity,
+            "Timestamp": login.timestamp.isoformat()
+        }
+        for login in failed_logins
+    ]
+
+    return {
+        "target": target or PRIMARY_TARGET,
+        "component_status": {"Items": component_status_data},
+        "vault_status": {"Safes": vault_data},
+        "accounts_status": {"value": accounts_data},
+        "system_health": health_data,
+        "recent_activities": events_data,
+        "failed_logins": logins_data,
+        "last_update": last_update.isoformat()
+    }
@@ -0,0 +1,146 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from app.config import CYBERARK_API
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='cyberark_api.log'
+)
+logger = logging.getLogger('resilience')
+
+# Codes HTTP pour lesquels une nouvelle tentative a une chance d'aboutir
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+class RetryPolicy:
+    def __init__(self, attempts: int, base_delay: float, max_delay: float):
+        """
+        Nouvelles tentatives bornées avec attente exponentielle et gigue complète
+
+        attempts: nombre total de tentatives (1 = aucune nouvelle tentative)
+        """
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """
+        Attente avant la tentative suivante (attempt commence à 0)
+
+        La gigue complète (tirage uniforme jusqu'au plafond exponentiel)
+        évite que les clients en échec ne relancent tous au même instant.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, name: str = "pvwa"):
+        """
+        Disjoncteur : après `failure_threshold` échecs consécutifs, les appels
+        échouent immédiatement pendant `reset_timeout` secondes, puis un seul
+        appel d'essai est autorisé pour vérifier le rétablissement.
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def is_open(self) -> bool:
+        """
+        Vérifier si les appels doivent être court-circuités, sans réserver d'appel d'essai
+        """
+        return self.state == self.OPEN
+
+    def allow(self) -> bool:
+        """
+        Autoriser un appel ; en demi-ouverture, un seul appel d'essai passe à la fois
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Disjoncteur {self.name} refermé")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Disjoncteur {self.name} ouvert après {self._failures} échecs consécutifs")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Libérer l'appel d'essai resté sans verdict (appel abandonné avant une réponse du PVWA)
+
+        Sans effet si un succès ou un échec a déjà été enregistré.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def to_dict(self) -> Dict[str, object]:
+        state = self.state
+        with self._lock:
+            return {"state": state, "consecutive_failures": self._failures}
+
+def parse_endpoint_timeouts(value: str) -> Dict[str, float]:
+    """
+    Lire les délais par endpoint au format "Components=5,System/Health=5,Activities=15"
+    """
+    timeouts = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        path, _, seconds = item.partition("=")
+        timeouts[path.strip()] = float(seconds)
+    return timeouts
+
+# Délais par endpoint configurés
+ENDPOINT_TIMEOUTS = parse_endpoint_timeouts(CYBERARK_API["endpoint_timeouts"])
+
+def endpoint_timeout(path: str, timeouts: Optional[Dict[str, float]] = None) -> float:
+    """
+    Délai d'une requête : entrée la plus spécifique (préfixe le plus long) de la configuration
+    """
+    timeouts = ENDPOINT_TIMEOUTS if timeouts is None else timeouts
+    matches = [prefix for prefix in timeouts if path == prefix or path.startswith(prefix + "/")]
+    if matches:
+        return timeouts[max(matches, key=len)]
+    return CYBERARK_API["timeout"]
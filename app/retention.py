@@ -0,0 +1,226 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, and_, delete, exists, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.config import RETENTION_CONFIG
+from app.models import (
+    AccountsStatus, CollectionRun, ComponentStatus, SecurityEvent, SecurityEventArchive,
+    SessionLocal, SystemHealth, VaultStatus
+)
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('retention')
+
+# Tables dont les cycles de collecte sont référencés
+_RUN_REFERENCES = (ComponentStatus, VaultStatus, AccountsStatus, SystemHealth, SecurityEvent)
+
+def _run_is_unreferenced():
+    """
+    Condition: aucune ligne de données ne référence le cycle de collecte
+    """
+    return and_(*(~exists().where(model.collection_run_id == CollectionRun.id) for model in _RUN_REFERENCES))
+
+# Tables soumises à la rétention : modèle, colonne de date, table d'archive et condition supplémentaire
+RETENTION_TABLES = {
+    "security_events": (SecurityEvent, SecurityEvent.timestamp, SecurityEventArchive, None),
+    "vault_status": (VaultStatus, VaultStatus.timestamp, None, None),
+    # Un cycle n'est supprimé qu'une fois toutes ses données purgées
+    "collection_runs": (CollectionRun, CollectionRun.started_at, None, _run_is_unreferenced),
+}
+
+def purge_batched(db: Session, model, condition, batch_size: Optional[int] = None, archive_model=None,
+                  children: Sequence[Tuple[Any, Any]] = (), pause: float = 0,
+                  stop_event: Optional[threading.Event] = None) -> int:
+    """
+    Supprimer les lignes répondant à une condition par lots bornés
+
+    Chaque lot est sélectionné par identifiant puis supprimé (et
+    éventuellement copié dans la table d'archive) dans sa propre
+    transaction, afin de ne jamais verrouiller la table longtemps.
+    `children` liste les couples (modèle, clé étrangère) à supprimer
+    avant leurs parents. Retourne le nombre de lignes supprimées.
+    """
+    batch_size = batch_size or RETENTION_CONFIG["batch_size"]
+    purged = 0
+
+    while stop_event is None or not stop_event.is_set():
+        ids = db.execute(
+            select(model.id).where(condition).order_by(model.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        if archive_model is not None:
+            columns = [column for column in model.__table__.columns if column.key in archive_model.__table__.columns]
+            db.execute(
+                insert(archive_model.__table__).from_select(
+                    [column.key for column in columns] + ["archived_at"],
+                    select(*columns, literal(datetime.now(), DateTime)).where(model.id.in_(ids))
+                )
+            )
+
+        for child_model, foreign_key in children:
+            db.execute(delete(child_model).where(foreign_key.in_(ids)))
+        db.execute(delete(model).where(model.id.in_(ids)))
+        db.commit()
+        purged += len(ids)
+
+        if len(ids) < batch_size:
+            break
+        if pause:
+            if stop_event is not None:
+                stop_event.wait(pause)
+            else:
+                time.sleep(pause)
+
+    return purged
+
+def purge_table(db: Session, table: str, max_age_days: int, now: Optional[datetime] = None,
+                stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    Appliquer la rétention à une table et retourner les métriques de la purge
+    """
+    model, time_column, archive_model, extra_condition = RETENTION_TABLES[table]
+    cutoff = (now or datetime.now()) - timedelta(days=max_age_days)
+
+    condition = time_column < cutoff
+    if extra_condition is not None:
+        condition = condition & extra_condition()
+
+    archive = archive_model if RETENTION_CONFIG["archive"] else None
+    started = time.monotonic()
+    purged = purge_batched(
+        db, model, condition,
+        archive_model=archive,
+        pause=RETENTION_CONFIG["batch_pause"],
+        stop_event=stop_event
+    )
+
+    return {
+        "cutoff": cutoff.isoformat(),
+        "purged": purged,
+        "archived": purged if archive is not None else 0,
+        "duration": round(time.monotonic() - started, 3)
+    }
+
+def run_retention(now: Optional[datetime] = None, stop_event: Optional[threading.Event] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Appliquer la rétention configurée à toutes les tables
+
+    Les cycles de collecte sont traités en dernier, une fois leurs données purgées.
+    """
+    stats = {}
+    db = SessionLocal()
+
+    try:
+        for table in RETENTION_TABLES:
+            max_age_days = RETENTION_CONFIG["max_age_days"].get(table, 0)
+            if max_age_days <= 0:
+                continue
+            stats[table] = purge_table(db, table, max_age_days, now, stop_event)
+
+        return stats
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+class RetentionJob:
+    def __init__(self, interval=None):
+        """
+        Tâche d'arrière-plan qui purge les données plus anciennes que la rétention configurée
+        """
+        self.interval = interval or RETENTION_CONFIG["interval"]
+        self.thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+    def start(self):
+        """
+        Démarrer la purge périodique
+        """
+        if self.thread and self.thread.is_alive():
+            logger.warning("La purge est déjà en cours d'exécution")
+            return
+
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run_loop, name="retention")
+        self.thread.daemon = True
+        self.thread.start()
+
+        logger.info(f"Purge périodique démarrée avec un intervalle de {self.interval} secondes")
+
+    def stop(self):
+        """
+        Arrêter la purge périodique
+        """
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+
+        logger.info("Purge périodique arrêtée")
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Exécuter une purge et enregistrer ses métriques
+        """
+        started_at = datetime.now()
+        started = time.monotonic()
+        tables = run_retention(now, self._stop_event)
+
+        run = {
+            "started_at": started_at.isoformat(),
+            "duration": round(time.monotonic() - started, 3),
+            "tables": tables
+        }
+        with self._lock:
+            self.last_run = run
+            for table, table_stats in tables.items():
+                totals = self.totals.setdefault(table, {"purged": 0, "archived": 0, "duration": 0.0})
+                totals["purged"] += table_stats["purged"]
+                totals["archived"] += table_stats["archived"]
+                totals["duration"] = round(totals["duration"] + table_stats["duration"], 3)
+
+        for table, table_stats in tables.items():
+            logger.info(f"Rétention {table}: {table_stats['purged']} lignes purgées "
+                        f"({table_stats['archived']} archivées) en {table_stats['duration']:.1f} s")
+        return run
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Métriques de la dernière purge et cumuls depuis le démarrage
+        """
+        with self._lock:
+            return {
+                "enabled": RETENTION_CONFIG["enabled"],
+                "archive": RETENTION_CONFIG["archive"],
+                "max_age_days": dict(RETENTION_CONFIG["max_age_days"]),
+                "last_run": self.last_run,
+                "totals": {table: dict(totals) for table, totals in self.totals.items()}
+            }
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erreur lors de la purge: {str(e)}")
+
+            self._stop_event.wait(self.interval)
+
+# Créer une instance singleton de la tâche de purge
+retention_job = RetentionJob()
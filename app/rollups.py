@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.bulk_insert import bulk_insert
+from app.config import ROLLUP_CONFIG
+from app.history import ROLLUP_PERIODS, SOURCES, aggregate_partials, floor_time, raw_partials
+from app.models import Component, ComponentStatus, MetricRollup, RollupWatermark, SessionLocal
+from app.retention import purge_batched
+from app.targets import TARGET_NAMES, qualified_name, target_condition
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('rollups')
+
+# Nombre maximal d'intervalles agrégés par transaction, pour borner la mémoire utilisée
+MAX_BUCKETS_PER_CHUNK = 24 * 7
+
+def _get_watermark(db: Session, source: str, period: str) -> Optional[RollupWatermark]:
+    return db.execute(
+        select(RollupWatermark).where(RollupWatermark.source == source, RollupWatermark.period == period)
+    ).scalar_one_or_none()
+
+def compact_source(db: Session, source: str, period: str, now: Optional[datetime] = None,
+                   target: Optional[str] = None) -> int:
+    """
+    Agréger les intervalles complets d'une source d'une cible depuis le dernier filigrane
+
+    Chaque lot d'intervalles est inséré dans la même transaction que le
+    nouveau filigrane : une compaction interrompue reprend là où elle s'est
+    arrêtée, sans doublon. Un lot dont le filigrane a été ramené en arrière
+    pendant son calcul (cycle écrit en retard, voir rewind_watermarks) est
+    annulé et recalculé. Retourne le nombre de lignes d'agrégats écrites.
+    """
+    model = SOURCES[source][0]
+    period_seconds = ROLLUP_PERIODS[period]
+    upto = floor_time(now or datetime.now(), period_seconds)
+    rollup_source = qualified_name(target, source)
+
+    watermark = _get_watermark(db, rollup_source, period)
+    if watermark is None:
+        first = db.execute(select(func.min(model.timestamp)).where(target_condition(model.target, target))).scalar()
+        if first is None:
+            return 0
+        watermark = RollupWatermark(source=rollup_source, period=period, watermark=floor_time(first, period_seconds))
+        db.add(watermark)
+        db.flush()
+
+    written = 0
+    while watermark.watermark < upto:
+        chunk_start = watermark.watermark
+        chunk_end = min(upto, chunk_start + timedelta(seconds=period_seconds * MAX_BUCKETS_PER_CHUNK))
+
+        partials = raw_partials(db, source, chunk_start, chunk_end, target=target)
+        rows = []
+        if not partials.empty:
+            result = aggregate_partials(partials, period_seconds)
+            result = result.replace({np.nan: None})
+            rows = [
+                {
+                    "source": rollup_source,
+                    "period": period,
+                    "bucket_start": row["bucket"].to_pydatetime(),
+                    "series": row["series"],
+                    "metric": row["metric"],
+                    "samples": int(row["samples"]),
+                    "min": row["min"],
+                    "max": row["max"],
+                    "avg": row["avg"],
+                    "sum": row["sum"],
+                    "last": row["last"]
+                }
+                for row in result.to_dict(orient="records")
+            ]
+            bulk_insert(db, MetricRollup, rows)
+
+        advanced = db.execute(
+            update(RollupWatermark)
+            .where(RollupWatermark.id == watermark.id, RollupWatermark.watermark == chunk_start)
+            .values(watermark=chunk_end)
+        ).rowcount
+        if not advanced:
+            # Filigrane ramené en arrière entre-temps : reprendre depuis sa nouvelle position
+            db.rollback()
+            db.refresh(watermark)
+            continue
+        db.commit()
+        written += len(rows)
+
+    return written
+
+def rewind_watermarks(db: Session, source: str, timestamp: datetime, target: Optional[str] = None):
+    """
+    Ramener les filigranes d'une source d'une cible à l'intervalle d'une mesure écrite en retard
+
+    Un cycle relu du journal ou resté en file porte sa date de collecte,
+    qui peut précéder un filigrane déjà avancé. Les agrégats des intervalles
+    concernés sont supprimés et seront recalculés avec cette mesure par la
+    compaction suivante ; la purge des mesures brutes, bornée par les
+    filigranes, ne les supprime pas avant. À appeler dans la transaction qui
+    écrit la mesure.
+    """
+    rollup_source = qualified_name(target, source)
+    for period, period_seconds in ROLLUP_PERIODS.items():
+        watermark = _get_watermark(db, rollup_source, period)
+        bucket = floor_time(timestamp, period_seconds)
+        if watermark is None or watermark.watermark <= bucket:
+            continue
+
+        if ROLLUP_CONFIG["raw_retention_days"] > 0 and \
+                bucket < datetime.now() - timedelta(days=ROLLUP_CONFIG["raw_retention_days"]):
+            # Mesures brutes de ces intervalles déjà purgées : les recalculer perdrait des données
+            logger.warning(f"Mesure de {rollup_source} du {timestamp} antérieure à la rétention des mesures brutes, "
+                           f"non agrégée ({period})")
+            continue
+
+        db.execute(delete(MetricRollup).where(
+            MetricRollup.source == rollup_source,
+            MetricRollup.period == period,
+            MetricRollup.bucket_start >= bucket
+        ))
+        logger.info(f"Filigrane {period} de {rollup_source} ramené de {watermark.watermark} à {bucket} (cycle écrit en retard)")
+        watermark.watermark = bucket
+
+def purge_raw_rows(db: Session, source: str, retention_days: int, now: Optional[datetime] = None,
+                   target: Optional[str] = None) -> int:
+    """
+    Supprimer les mesures brutes d'une cible plus anciennes que la rétention et déjà agrégées à toutes les périodes
+    """
+    model = SOURCES[source][0]
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+
+    watermarks = [_get_watermark(db, qualified_name(target, source), period) for period in ROLLUP_PERIODS]
+    if any(watermark is None for watermark in watermarks):
+        return 0
+    cutoff = min([cutoff] + [watermark.watermark for watermark in watermarks])
+
+    # Les composants détaillés référencent les états de composants
+    children = [(Component, Component.component_status_id)] if model is ComponentStatus else []
+    return purge_batched(
+        db, model, and_(model.timestamp < cutoff, target_condition(model.target, target)),
+        batch_size=ROLLUP_CONFIG["purge_batch_size"],
+        children=children
+    )
+
+def run_compaction(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Exécuter une passe de compaction complète et, si configurée, la purge des mesures brutes
+    """
+    stats = {"rollup_rows": 0, "purged_rows": 0}
+    db = SessionLocal()
+
+    try:
+        for target in TARGET_NAMES:
+            for source in SOURCES:
+                for period in ROLLUP_PERIODS:
+                    stats["rollup_rows"] += compact_source(db, source, period, now, target)
+
+                if ROLLUP_CONFIG["raw_retention_days"] > 0:
+                    stats["purged_rows"] += purge_raw_rows(db, source, ROLLUP_CONFIG["raw_retention_days"], now, target)
+
+        return stats
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+class RollupJob:
+    def __init__(self, interval=None):
+        """
+        Tâche d'arrière-plan qui maintient les agrégats horaires et journaliers
+        """
+        self.interval = interval or ROLLUP_CONFIG["interval"]
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """
+        Démarrer la compaction périodique
+        """
+        if self.thread and self.thread.is_alive():
+            logger.warning("La compaction est déjà en cours d'exécution")
+            return
+
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run_loop, name="rollups")
+        self.thread.daemon = True
+        self.thread.start()
+
+        logger.info(f"Compaction périodique démarrée avec un intervalle de {self.interval} secondes")
+
+    def stop(self):
+        """
+        Arrêter la compaction périodique
+        """
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+
+        logger.info("Compaction périodique arrêtée")
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                stats = run_compaction()
+                logger.info(f"Compaction terminée en {time.monotonic() - started:.1f} s: "
+                            f"{stats['rollup_rows']} agrégats écrits, {stats['purged_rows']} mesures brutes purgées")
+            except Exception as e:
+                logger.error(f"Erreur lors de la compaction: {str(e)}")
+
+            self._stop_event.wait(self.interval)
+
+# Créer une instance singleton de la tâche de compaction
+rollup_job = RollupJob()
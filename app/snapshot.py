@@ -0,0 +1,162 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.metrics import SNAPSHOT_READS
+from app.targets import PRIMARY_TARGET
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('snapshot')
+
+@dataclass(frozen=True)
+class HealthSnapshot:
+    """
+    Instantané immuable des dernières données de santé publiées
+
+    Les données sont copiées au moment de la publication : elles ne doivent
+    pas être modifiées par les lecteurs.
+    """
+    version: int
+    data: Dict[str, Any]
+    source: str  # "api" ou "database"
+    target: Optional[str] = None  # Cible de collecte
+    digest: str = ""  # Empreinte du contenu, identique dans tous les processus pour les mêmes données
+    created_at: datetime = field(default_factory=datetime.now)
+    created_monotonic: float = field(default_factory=time.monotonic, repr=False)
+
+    def age(self) -> float:
+        """
+        Âge de l'instantané en secondes
+        """
+        return time.monotonic() - self.created_monotonic
+
+def content_digest(data: Dict[str, Any]) -> str:
+    """
+    Empreinte des données d'un instantané (SHA-256 de leur sérialisation JSON à clés triées)
+    """
+    serialized = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:32]
+
+class _InFlight:
+    """
+    Chargement en cours partagé entre les lecteurs concurrents
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[HealthSnapshot] = None
+        self.error: Optional[BaseException] = None
+
+class SnapshotStore:
+    def __init__(self, max_staleness: float, target: Optional[str] = None):
+        """
+        Initialiser le magasin d'instantanés
+
+        max_staleness: âge maximal (en secondes) d'un instantané servi sans rechargement
+        target: cible de collecte dont les instantanés sont publiés
+        """
+        self.max_staleness = max_staleness
+        self.target = target
+        self._lock = threading.Lock()
+        self._snapshot: Optional[HealthSnapshot] = None
+        self._version = 0
+        self._inflight: Optional[_InFlight] = None
+        self._listeners: List[Callable[[HealthSnapshot], None]] = []
+    
+    def add_listener(self, listener: Callable[[HealthSnapshot], None]):
+        """
+        Enregistrer une fonction appelée après chaque publication (diffusion aux clients)
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def current(self) -> Optional[HealthSnapshot]:
+        """
+        Retourner le dernier instantané publié, quel que soit son âge
+        """
+        return self._snapshot
+
+    def is_fresh(self, snapshot: Optional[HealthSnapshot]) -> bool:
+        """
+        Vérifier si un instantané peut être servi sans rechargement
+        """
+        return snapshot is not None and snapshot.age() <= self.max_staleness
+
+    def publish(self, data: Dict[str, Any], source: str) -> HealthSnapshot:
+        """
+        Publier un nouvel instantané à partir des données collectées
+        """
+        frozen_data = copy.deepcopy(data)
+        digest = content_digest(frozen_data)
+        with self._lock:
+            self._version += 1
+            snapshot = HealthSnapshot(version=self._version, data=frozen_data, source=source, target=self.target,
+                                      digest=digest)
+            self._snapshot = snapshot
+
+        logger.info(f"Instantané {snapshot.version} publié (source: {source}, cible: {self.target})")
+
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Erreur lors de la notification de l'instantané {snapshot.version}: {str(e)}")
+        return snapshot
+
+    def count_read(self, result: str):
+        """
+        Compter une lecture de l'instantané : hit (frais), miss (rechargement) ou shared (rechargement partagé)
+        """
+        SNAPSHOT_READS.labels(self.target or PRIMARY_TARGET, result).inc()
+
+    def get(self, loader: Callable[[], Optional[Tuple[Dict[str, Any], str]]]) -> Optional[HealthSnapshot]:
+        """
+        Retourner un instantané frais, en rechargeant via `loader` si nécessaire
+
+        Les lecteurs concurrents qui constatent un instantané périmé partagent
+        un seul appel à `loader` (déduplication « single-flight »).
+        """
+        snapshot = self._snapshot
+        if self.is_fresh(snapshot):
+            self.count_read("hit")
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self.is_fresh(snapshot):
+                self.count_read("hit")
+                return snapshot
+
+            flight = self._inflight
+            leader = flight is None
+            if leader:
+                flight = self._inflight = _InFlight()
+        self.count_read("miss" if leader else "shared")
+
+        if leader:
+            try:
+                result = loader()
+                flight.result = self.publish(*result) if result else self._snapshot
+            except BaseException as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    self._inflight = None
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+
+        return flight.result
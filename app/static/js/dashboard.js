@@ -2,22 +2,110 @@
  * CyberArk Health Dashboard - Frontend JavaScript
  */
 
+// Intervalle de l'actualisation périodique, utilisée lorsque le flux n'est pas disponible
+const POLLING_INTERVAL = 30000;
+
+// État reçu par le flux et empreinte de l'instantané correspondant (identique sur tous les processus du serveur)
+let dashboardState = null;
+let dashboardVersion = null;
+let pollingTimer = null;
+
+// Cible de collecte affichée (paramètre ?target= de la page, sinon la cible par défaut du serveur)
+const TARGET = new URLSearchParams(window.location.search).get('target');
+
+/**
+ * Ajoute la cible affichée aux paramètres d'une URL de l'API
+ */
+function withTarget(url) {
+    return TARGET ? `${url}?target=${encodeURIComponent(TARGET)}` : url;
+}
+
 document.addEventListener('DOMContentLoaded', function() {
-    // Charger les données initiales
-    fetchDashboardData();
-    
-    // Configurer l'actualisation automatique toutes les 30 secondes
-    setInterval(fetchDashboardData, 30000);
+    // Recevoir les mises à jour poussées par le serveur, ou actualiser périodiquement
+    if (window.EventSource) {
+        connectStream();
+    } else {
+        fetchDashboardData();
+        startPolling();
+    }
     
     // Configurer les gestionnaires d'événements
     setupEventHandlers();
 });
 
+/**
+ * Se connecte au flux des mises à jour du tableau de bord (Server-Sent Events)
+ */
+function connectStream() {
+    const source = new EventSource(withTarget('/api/stream'));
+    
+    source.addEventListener('open', stopPolling);
+    
+    // État complet, envoyé à la connexion ou après une resynchronisation
+    source.addEventListener('snapshot', event => {
+        const message = JSON.parse(event.data);
+        applyDashboardData(message.data, message.version);
+    });
+    
+    // Sections modifiées depuis la version précédente
+    source.addEventListener('diff', event => {
+        const message = JSON.parse(event.data);
+        if (dashboardState === null || message.base_version !== dashboardVersion) {
+            // Une mise à jour a été manquée : se reconnecter pour recevoir l'état complet
+            source.close();
+            connectStream();
+            return;
+        }
+        
+        const data = Object.assign({}, dashboardState, message.changed);
+        message.removed.forEach(section => delete data[section]);
+        applyDashboardData(data, message.version);
+    });
+    
+    source.addEventListener('error', () => {
+        // Le navigateur se reconnecte automatiquement ; en attendant, actualiser périodiquement
+        startPolling();
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(connectStream, POLLING_INTERVAL);
+        }
+    });
+}
+
+/**
+ * Applique un état complet reçu par le flux
+ */
+function applyDashboardData(data, version) {
+    dashboardState = data;
+    dashboardVersion = version;
+    updateDashboard(data);
+    updateLastUpdateTime(data.last_update);
+}
+
+/**
+ * Démarre l'actualisation périodique de secours
+ */
+function startPolling() {
+    if (pollingTimer === null) {
+        pollingTimer = setInterval(fetchDashboardData, POLLING_INTERVAL);
+    }
+}
+
+/**
+ * Arrête l'actualisation périodique lorsque le flux est connecté
+ */
+function stopPolling() {
+    if (pollingTimer !== null) {
+        clearInterval(pollingTimer);
+        pollingTimer = null;
+    }
+}
+
 /**
  * Récupère les données du tableau de bord depuis l'API
  */
 function fetchDashboardData() {
-    fetch('/api/dashboard')
+    // Toujours revalider auprès du serveur (réponse 304 sans corps si rien n'a changé)
+    fetch(withTarget('/api/dashboard'), { cache: 'no-cache' })
         .then(response => {
             if (!response.ok) {
                 throw new Error('Erreur réseau lors de la récupération des données');
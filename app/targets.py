@@ -0,0 +1,42 @@
+from typing import List, Optional
+
+from sqlalchemy import or_
+
+from app.config import COLLECTION_TARGETS
+
+# Noms des cibles de collecte, dans l'ordre de la configuration
+TARGET_NAMES: List[str] = [target["name"] for target in COLLECTION_TARGETS]
+
+# Cible servie par défaut ; les lignes stockées sans cible lui appartiennent
+PRIMARY_TARGET = TARGET_NAMES[0]
+
+class UnknownTargetError(ValueError):
+    """
+    Cible de collecte non configurée
+    """
+
+def resolve_target(target: Optional[str]) -> str:
+    """
+    Valider un nom de cible (la cible principale si aucun n'est fourni)
+    """
+    if not target:
+        return PRIMARY_TARGET
+    if target not in TARGET_NAMES:
+        raise UnknownTargetError(f"Cible inconnue: {target} (disponibles: {', '.join(TARGET_NAMES)})")
+    return target
+
+def qualified_name(target: Optional[str], name: str) -> str:
+    """
+    Nom propre à une cible (points de reprise, agrégats), inchangé pour la cible principale
+    """
+    target = target or PRIMARY_TARGET
+    return name if target == PRIMARY_TARGET else f"{target}:{name}"
+
+def target_condition(column, target: Optional[str]):
+    """
+    Condition de filtrage des lignes d'une cible, lignes sans cible comprises pour la cible principale
+    """
+    target = target or PRIMARY_TARGET
+    if target == PRIMARY_TARGET:
+        return or_(column == target, column.is_(None))
+    return column == target
@@ -0,0 +1,431 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app.resilience import endpoint_timeout
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='cyberark_api.log'
+)
+logger = logging.getLogger('token_manager')
+
+# Intervalle en secondes entre deux lectures du magasin en attendant la connexion d'un autre processus
+LEASE_POLL_INTERVAL = 0.1
+
+# Attente maximale en secondes du renouvellement suivant après un échec ou en l'absence de jeton
+REFRESH_CHECK_INTERVAL = 60
+
+# Jeton stocké : (jeton, expiration en secondes depuis l'epoch)
+StoredToken = Tuple[str, float]
+
+class TokenStore(ABC):
+    """
+    Magasin de jetons partagé par les processus d'un même hôte
+
+    Chaque entrée contient le jeton d'une cible et un bail de connexion :
+    le processus qui détient le bail se connecte au PVWA, les autres
+    attendent le jeton qu'il enregistre.
+    """
+    kind = "none"
+
+    @abstractmethod
+    def load(self, key: str) -> Optional[StoredToken]:
+        ...
+
+    @abstractmethod
+    def save(self, key: str, token: str, expiry: float):
+        ...
+
+    @abstractmethod
+    def discard(self, key: str, token: str):
+        """
+        Supprimer le jeton s'il est toujours celui rejeté par le PVWA
+        """
+        ...
+
+    @abstractmethod
+    def acquire_lease(self, key: str, owner: str, seconds: float) -> bool:
+        ...
+
+    @abstractmethod
+    def release_lease(self, key: str, owner: str):
+        ...
+
+class FileTokenStore(TokenStore):
+    kind = "file"
+
+    def __init__(self, path: str):
+        """
+        Magasin dans un fichier JSON, protégé par un verrou de fichier exclusif
+        """
+        self.path = path if os.path.splitext(path)[1] else f"{path}.json"
+        self.lock_path = f"{self.path}.lock"
+
+    @contextmanager
+    def _locked(self):
+        """
+        Verrou exclusif inter-processus, le temps d'une lecture-modification-écriture
+        """
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            os.close(fd)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, entries: Dict[str, Dict[str, Any]]):
+        # Écriture atomique, lisible uniquement par le compte de service
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(temp_path, self.path)
+
+    def load(self, key: str) -> Optional[StoredToken]:
+        with self._locked():
+            entry = self._read().get(key) or {}
+        if entry.get("token"):
+            return entry["token"], entry["expiry"]
+        return None
+
+    def save(self, key: str, token: str, expiry: float):
+        with self._locked():
+            entries = self._read()
+            entries.setdefault(key, {}).update(token=token, expiry=expiry)
+            self._write(entries)
+
+    def discard(self, key: str, token: str):
+        with self._locked():
+            entries = self._read()
+            entry = entries.get(key)
+            if entry and entry.get("token") == token:
+                entry.update(token=None, expiry=None)
+                self._write(entries)
+
+    def acquire_lease(self, key: str, owner: str, seconds: float) -> bool:
+        with self._locked():
+            entries = self._read()
+            entry = entries.setdefault(key, {})
+            if entry.get("lease_owner") not in (None, owner) and entry.get("lease_until", 0) > time.time():
+                return False
+            entry.update(lease_owner=owner, lease_until=time.time() + seconds)
+            self._write(entries)
+            return True
+
+    def release_lease(self, key: str, owner: str):
+        with self._locked():
+            entries = self._read()
+            entry = entries.get(key)
+            if entry and entry.get("lease_owner") == owner:
+                entry.update(lease_owner=None, lease_until=None)
+                self._write(entries)
+
+class SQLiteTokenStore(TokenStore):
+    kind = "sqlite"
+
+    def __init__(self, path: str):
+        """
+        Magasin dans une base SQLite locale (verrouillage assuré par SQLite)
+        """
+        self.path = path if os.path.splitext(path)[1] else f"{path}.db"
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS cyberark_tokens ("
+            "key TEXT PRIMARY KEY, token TEXT, expiry REAL, lease_owner TEXT, lease_until REAL)",
+            ()
+        )
+        try:
+            os.chmod(self.path, 0o600)
+        except OSError:
+            pass
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level="IMMEDIATE")
+
+    def _execute(self, statement: str, parameters: tuple) -> sqlite3.Cursor:
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(statement, parameters)
+        finally:
+            conn.close()
+
+    def load(self, key: str) -> Optional[StoredToken]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT token, expiry FROM cyberark_tokens WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        if row and row[0]:
+            return row[0], row[1]
+        return None
+
+    def save(self, key: str, token: str, expiry: float):
+        self._execute(
+            "INSERT INTO cyberark_tokens (key, token, expiry) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET token = excluded.token, expiry = excluded.expiry",
+            (key, token, expiry)
+        )
+
+    def discard(self, key: str, token: str):
+        self._execute("UPDATE cyberark_tokens SET token = NULL, expiry = NULL WHERE key = ? AND token = ?", (key, token))
+
+    def acquire_lease(self, key: str, owner: str, seconds: float) -> bool:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO cyberark_tokens (key) VALUES (?)", (key,))
+                cursor = conn.execute(
+                    "UPDATE cyberark_tokens SET lease_owner = ?, lease_until = ? "
+                    "WHERE key = ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_until < ?)",
+                    (owner, now + seconds, key, owner, now)
+                )
+                return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def release_lease(self, key: str, owner: str):
+        self._execute(
+            "UPDATE cyberark_tokens SET lease_owner = NULL, lease_until = NULL WHERE key = ? AND lease_owner = ?",
+            (key, owner)
+        )
+
+# Magasins ouverts, partagés par les cibles qui utilisent le même fichier
+_stores: Dict[Tuple[str, str], TokenStore] = {}
+_stores_lock = threading.Lock()
+
+def token_store_from_config(config: Dict[str, Any]) -> Optional[TokenStore]:
+    """
+    Magasin de jetons configuré (CYBERARK_TOKEN_STORE), ou None si les jetons ne sont pas partagés
+    """
+    kind = config.get("token_store", "")
+    if not kind or kind == "none":
+        return None
+    store_classes = {"file": FileTokenStore, "sqlite": SQLiteTokenStore}
+    if kind not in store_classes:
+        logger.error(f"Magasin de jetons non supporté: {kind}, jetons non partagés")
+        return None
+
+    path = config.get("token_store_path", "cyberark_tokens")
+    with _stores_lock:
+        if (kind, path) not in _stores:
+            _stores[(kind, path)] = store_classes[kind](path)
+            logger.info(f"Jetons CyberArk partagés via {_stores[(kind, path)].path}")
+        return _stores[(kind, path)]
+
+class TokenManager:
+    def __init__(self, api, store: Optional[TokenStore] = None):
+        """
+        Cycle de vie du jeton de session d'un client CyberArk
+
+        - une seule connexion à la fois : les appels concurrents qui trouvent
+          le jeton absent, expiré ou rejeté (401) attendent la même connexion ;
+        - renouvellement en arrière-plan `token_refresh_before` secondes avant
+          l'expiration, pour que les collectes ne paient jamais la connexion ;
+        - avec un magasin partagé, les processus d'un hôte réutilisent le même
+          jeton et un seul d'entre eux se connecte (bail de connexion).
+        """
+        self.api = api
+        self.store = store
+        # Renouveler au plus tard à mi-vie, pour qu'un jeton neuf ne soit jamais déjà à renouveler
+        self.refresh_before = min(api.config.get("token_refresh_before", 600), api.token_lifetime / 2)
+        self.key = f"{api.config.get('name', 'default')}|{api.base_url}|{api.auth_type}|{api.username}"
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.logins = 0  # Connexions au PVWA effectuées par ce processus
+        self.shared_reuses = 0  # Jetons repris du magasin partagé
+        self.last_refresh: Optional[datetime] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _needs_refresh(self) -> bool:
+        """
+        Vérifier si le jeton courant entre dans la fenêtre de renouvellement
+        """
+        expiry = self.api.token_expiry
+        return self.api.token is None or expiry is None or \
+            (expiry - datetime.now()).total_seconds() <= self.refresh_before
+
+    def _adopt(self, token: str, expiry: float):
+        """
+        Utiliser un jeton obtenu par un autre processus
+        """
+        self.api.token = token
+        self.api.token_expiry = datetime.fromtimestamp(expiry)
+        self.api.session.headers.update({"Authorization": token})
+        self.shared_reuses += 1
+
+    def _acceptable(self, stored: Optional[StoredToken], rejected: Optional[str], fresh: bool) -> bool:
+        """
+        Vérifier si un jeton du magasin est utilisable (hors fenêtre de renouvellement si `fresh`)
+        """
+        if stored is None or stored[0] == rejected:
+            return False
+        margin = self.refresh_before if fresh else self.api.token_expiry_margin.total_seconds()
+        return stored[1] - time.time() > margin
+
+    async def _store_call(self, method, *args):
+        # Le magasin fait des entrées-sorties locales bloquantes (verrou de fichier, SQLite)
+        return await asyncio.to_thread(method, *args)
+
+    async def _login(self) -> bool:
+        ok = await self.api.async_login()
+        if ok:
+            self.logins += 1
+        return ok
+
+    async def _acquire(self, rejected: Optional[str] = None, fresh: bool = False) -> bool:
+        """
+        Obtenir un jeton : depuis le magasin partagé si possible, sinon par une connexion
+        """
+        if self.store is None or self.api.demo_mode:
+            return await self._login()
+
+        stored = await self._store_call(self.store.load, self.key)
+        if self._acceptable(stored, rejected, fresh):
+            self._adopt(*stored)
+            return True
+
+        lease_seconds = endpoint_timeout("Logon") + 5
+        leased = await self._store_call(self.store.acquire_lease, self.key, self.owner, lease_seconds)
+        if not leased:
+            # Un autre processus se connecte : attendre le jeton qu'il va enregistrer
+            deadline = time.monotonic() + lease_seconds
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+                stored = await self._store_call(self.store.load, self.key)
+                if self._acceptable(stored, rejected, fresh):
+                    self._adopt(*stored)
+                    return True
+            logger.warning(f"Pas de jeton partagé pour {self.key} après {lease_seconds:.0f} s, connexion directe")
+
+        try:
+            if not await self._login():
+                return False
+            await self._store_call(self.store.save, self.key, self.api.token, self.api.token_expiry.timestamp())
+            return True
+        finally:
+            if leased:
+                await self._store_call(self.store.release_lease, self.key, self.owner)
+
+    async def ensure_token(self) -> bool:
+        """
+        S'assurer qu'un jeton valide est disponible, sans connexions concurrentes
+        """
+        if self.api.is_token_valid():
+            return True
+
+        async with self._get_lock():
+            if self.api.is_token_valid():
+                return True
+            return await self._acquire()
+
+    async def handle_unauthorized(self, rejected: Optional[str]) -> bool:
+        """
+        Réagir à un 401 : une seule reconnexion pour tous les appels qui ont utilisé le jeton rejeté
+        """
+        async with self._get_lock():
+            if self.api.token is not None and self.api.token != rejected and self.api.is_token_valid():
+                # Un autre appel a déjà obtenu un nouveau jeton
+                return True
+
+            logger.warning(f"Jeton rejeté par le PVWA ({self.key}), reconnexion")
+            self.api.token = None
+            self.api.token_expiry = None
+            if self.store is not None and rejected:
+                await self._store_call(self.store.discard, self.key, rejected)
+            return await self._acquire(rejected=rejected)
+
+    async def refresh(self) -> bool:
+        """
+        Renouveler le jeton s'il entre dans la fenêtre de renouvellement
+        """
+        async with self._get_lock():
+            if not self._needs_refresh():
+                return True
+
+            previous = self.api.token
+            if not await self._acquire(fresh=True):
+                return False
+            self.last_refresh = datetime.now()
+            logger.info(f"Jeton CyberArk renouvelé avant expiration ({self.key})")
+
+        # Libérer la session précédente, sauf si d'autres processus peuvent encore l'utiliser
+        if previous and previous != self.api.token and self.store is None:
+            await self.api.async_logoff(previous)
+        return True
+
+    def _seconds_until_refresh(self) -> float:
+        if self.api.token is None or self.api.token_expiry is None:
+            return REFRESH_CHECK_INTERVAL
+        remaining = (self.api.token_expiry - datetime.now()).total_seconds() - self.refresh_before
+        return max(0.0, min(remaining, REFRESH_CHECK_INTERVAL))
+
+    async def run_refresh(self):
+        """
+        Boucle de renouvellement en arrière-plan, jusqu'à son annulation
+
+        Aucun jeton n'est demandé tant que la première collecte ne s'est pas connectée.
+        """
+        if self.api.demo_mode:
+            return
+
+        while True:
+            await asyncio.sleep(self._seconds_until_refresh())
+            if self.api.token is None or not self._needs_refresh():
+                continue
+            try:
+                if not await self.refresh():
+                    logger.warning(f"Échec du renouvellement du jeton ({self.key}), nouvel essai dans {REFRESH_CHECK_INTERVAL} s")
+                    await asyncio.sleep(REFRESH_CHECK_INTERVAL)
+            except Exception as e:
+                logger.error(f"Erreur lors du renouvellement du jeton ({self.key}): {str(e)}")
+                await asyncio.sleep(REFRESH_CHECK_INTERVAL)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        État du jeton pour l'API (sans le jeton lui-même)
+        """
+        return {
+            "expires_at": self.api.token_expiry.isoformat() if self.api.token and self.api.token_expiry else None,
+            "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "logins": self.logins,
+            "shared_reuses": self.shared_reuses,
+            "store": self.store.kind if self.store is not None else None
+        }
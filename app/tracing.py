@@ -0,0 +1,140 @@
+import contextlib
+import logging
+import os
+import time
+from typing import Any, ContextManager
+
+from app.config import TRACING_CONFIG
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='api.log'
+)
+logger = logging.getLogger('tracing')
+
+class _NoopSpan:
+    """
+    Span inactif retourné lorsque les traces sont désactivées
+    """
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: dict):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+_NOOP_CONTEXT = contextlib.nullcontext(_NOOP_SPAN)
+
+# Traceur OpenTelemetry, None tant que les traces ne sont pas configurées
+_tracer = None
+
+def configure_tracing() -> bool:
+    """
+    Configurer l'export des traces selon TRACING_CONFIG (une seule fois par processus)
+
+    Les traces sont optionnelles : si opentelemetry-sdk (ou l'exporteur
+    OTLP) n'est pas installé, elles restent désactivées avec un
+    avertissement. L'échantillonnage est décidé à la racine de la trace et
+    suivi par tous ses spans (requête API, collecte, appels CyberArk, écritures).
+    """
+    global _tracer
+    if _tracer is not None or not TRACING_CONFIG["enabled"]:
+        return _tracer is not None
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+        if TRACING_CONFIG["exporter"] == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter(endpoint=TRACING_CONFIG["otlp_endpoint"])
+        else:
+            exporter = ConsoleSpanExporter(
+                out=open(TRACING_CONFIG["file"], "a", encoding="utf-8"),
+                formatter=lambda span: span.to_json(indent=None) + os.linesep
+            )
+    except ImportError as e:
+        logger.warning(f"Traces demandées mais OpenTelemetry n'est pas installé ({str(e)}), traces désactivées")
+        return False
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACING_CONFIG["service_name"]}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_CONFIG["sample_ratio"]))
+    )
+    # Export par lots dans un thread dédié : les spans n'attendent jamais l'exporteur
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("app")
+
+    logger.info(f"Traces activées (export: {TRACING_CONFIG['exporter']}, échantillonnage: {TRACING_CONFIG['sample_ratio']})")
+    return True
+
+def shutdown_tracing():
+    """
+    Exporter les spans en attente avant l'arrêt du processus
+    """
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_tracer_provider().shutdown()
+
+def span(name: str, **attributes: Any) -> ContextManager:
+    """
+    Ouvrir un span enfant du span courant (contextvars), sans coût si les traces sont désactivées
+
+    Les attributs nuls sont ignorés. Le span retourné par `with` accepte
+    set_attribute() pour les valeurs connues en fin d'opération (lignes
+    écrites, résultat) ; une exception est enregistrée sur le span.
+    """
+    if _tracer is None:
+        return _NOOP_CONTEXT
+    return _tracer.start_as_current_span(
+        name, attributes={key: value for key, value in attributes.items() if value is not None}
+    )
+
+def add_event(name: str, **attributes: Any):
+    """
+    Ajouter un événement horodaté au span courant (nouvelle tentative, reconnexion)
+    """
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().add_event(
+        name, attributes={key: value for key, value in attributes.items() if value is not None}
+    )
+
+class TracingMiddleware:
+    def __init__(self, app):
+        """
+        Middleware ASGI ouvrant le span racine de chaque requête HTTP
+
+        Les collectes déclenchées par la requête (refresh=true, rechargement
+        d'un instantané périmé) sont rattachées à sa trace.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        with span(f"{scope['method']} {scope['path']}", **{"http.method": scope["method"]}) as current:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    current.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            started = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    current.update_name(f"{scope['method']} {route.path}")
+                    current.set_attribute("http.route", route.path)
+                current.set_attribute("http.duration_ms", round((time.perf_counter() - started) * 1000, 3))
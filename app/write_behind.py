@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.config import WRITE_BEHIND_CONFIG
+from app.metrics import WRITE_BEHIND_PENDING, WRITE_BEHIND_SPILLED
+
+# Configuration du logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    filename='health_collector.log'
+)
+logger = logging.getLogger('write_behind')
+
+# Attente maximale en secondes de la file par l'écrivain (vérification de l'arrêt)
+WRITER_TICK = 1.0
+
+# Attente maximale en secondes de l'écriture des cycles en file à l'arrêt
+STOP_TIMEOUT = 30
+
+def database_unavailable(error: Exception) -> bool:
+    """
+    Vérifier si une erreur d'écriture vient de l'indisponibilité de la base (à réessayer) plutôt que des données
+    """
+    if isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+class CollectionJournal:
+    def __init__(self, directory: str):
+        """
+        Journal sur disque des cycles de collecte en attente d'écriture en base
+
+        Les cycles sont ajoutés, un objet JSON par ligne, à des segments
+        nommés par le numéro du premier cycle qu'ils contiennent : relire les
+        segments dans l'ordre de leur nom restitue l'ordre de collecte. La
+        position de relecture est enregistrée après chaque lot écrit en base,
+        pour ne pas réécrire un cycle après un redémarrage. Les cycles refusés
+        par la base (données invalides) sont conservés dans rejected.jsonl.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._progress_path = self.directory / "replay.offset"
+        self._rejected_path = self.directory / "rejected.jsonl"
+        self._current: Optional[Path] = None  # Segment recevant les cycles les plus récents
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob("cycles-*.jsonl"))
+
+    def append(self, items: List[Dict[str, Any]], new_segment: bool = False):
+        """
+        Ajouter des cycles au dernier segment, ou à un nouveau segment (cycles antérieurs à ceux du journal)
+        """
+        path = self._current
+        if new_segment or path is None or not path.exists():
+            path = self.directory / f"cycles-{items[0]['seq']:020d}.jsonl"
+        with open(path, "ab") as journal:
+            journal.write(b"".join(json.dumps(item, default=str).encode("utf-8") + b"\n" for item in items))
+            journal.flush()
+            os.fsync(journal.fileno())
+        if self._current is None or not self._current.exists() or path.name > self._current.name:
+            self._current = path
+
+    def read(self, segment: Path, offset: int, end: int) -> Iterator[Tuple[Dict[str, Any], int]]:
+        """
+        Lire les cycles d'un segment entre deux positions ; chaque cycle est suivi de la position de sa fin
+        """
+        with open(segment, "rb") as journal:
+            journal.seek(offset)
+            while offset < end:
+                line = journal.readline()
+                if not line.endswith(b"\n"):
+                    # Dernière ligne tronquée par un arrêt brutal pendant l'ajout, jamais confirmée
+                    logger.warning(f"Fin de segment tronquée ignorée: {segment.name}")
+                    return
+                offset += len(line)
+                yield json.loads(line), offset
+
+    def count(self) -> int:
+        """
+        Nombre de cycles restant à relire
+        """
+        total = 0
+        for segment in self.segments():
+            with open(segment, "rb") as journal:
+                journal.seek(self.offset(segment))
+                total += sum(1 for _ in journal)
+        return total
+
+    def offset(self, segment: Path) -> int:
+        try:
+            name, offset = self._progress_path.read_text().split()
+        except (FileNotFoundError, ValueError):
+            return 0
+        return int(offset) if name == segment.name else 0
+
+    def save_offset(self, segment: Path, offset: int):
+        temporary = self._progress_path.with_suffix(".tmp")
+        temporary.write_text(f"{segment.name} {offset}")
+        os.replace(temporary, self._progress_path)
+
+    def remove(self, segment: Path):
+        """
+        Supprimer un segment entièrement écrit en base
+        """
+        segment.unlink()
+        self._progress_path.unlink(missing_ok=True)
+        if segment == self._current:
+            self._current = None
+
+    def reject(self, item: Dict[str, Any], error: Exception):
+        with open(self._rejected_path, "ab") as rejected:
+            rejected.write(json.dumps({**item, "error": str(error)}, default=str).encode("utf-8") + b"\n")
+
+class WriteBehindQueue:
+    def __init__(self, write_batch: Callable[[List[Dict[str, Any]]], None]):
+        """
+        File bornée des cycles de collecte à écrire en base par un thread dédié
+
+        Les collectes déposent leurs cycles sans attendre la base de données ;
+        l'écrivain les écrit par lots (une transaction par lot, via
+        write_batch). Si la base est indisponible ou si la file est pleine,
+        les cycles sont ajoutés au journal sur disque (CollectionJournal), et
+        tous les suivants aussi jusqu'à ce que le journal soit relu : l'ordre
+        d'écriture reste celui de la collecte.
+        """
+        self.write_batch = write_batch
+        self.enabled = WRITE_BEHIND_CONFIG["enabled"]
+        self.batch_size = WRITE_BEHIND_CONFIG["batch_size"]
+        self.retry_interval = WRITE_BEHIND_CONFIG["retry_interval"]
+        self.thread = None
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=WRITE_BEHIND_CONFIG["queue_size"])
+        self._stop_event = threading.Event()
+        # Protège le choix entre file et journal, et les ajouts au journal
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.journal: Optional[CollectionJournal] = None
+        self.journal_entries = 0
+        # Attentes de l'écriture des cycles déposés par ce processus, par numéro de cycle
+        self._written: Dict[int, Future] = {}
+        self.spilling = False  # Vrai tant que le journal contient des cycles à relire
+        self.available = True
+        self.written = 0
+
+    def start(self):
+        """
+        Démarrer l'écrivain, après avoir repris le journal laissé par une exécution précédente
+        """
+        with self._lock:
+            if not self.enabled or (self.thread and self.thread.is_alive()):
+                return
+
+            self.journal = self.journal or CollectionJournal(WRITE_BEHIND_CONFIG["journal_dir"])
+            self.journal_entries = self.journal.count()
+            self.spilling = bool(self.journal.segments())
+            if self.spilling:
+                logger.warning(f"{self.journal_entries} cycle(s) de collecte en attente dans le journal, relecture")
+            WRITE_BEHIND_PENDING.labels("journal").set(self.journal_entries)
+
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._run_loop, name="db-writer")
+            self.thread.daemon = True
+            self.thread.start()
+
+        logger.info(f"Écriture différée des cycles démarrée (file: {self._queue.maxsize}, lots: {self.batch_size})")
+
+    def stop(self, timeout: float = STOP_TIMEOUT):
+        """
+        Écrire les cycles en file avant l'arrêt ; ceux qui ne peuvent pas l'être sont ajoutés au journal
+        """
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+
+        # Écrivain bloqué par une base trop lente : ne rien perdre
+        remaining = self._drain()
+        if remaining:
+            self._spill(remaining)
+
+        logger.info("Écriture différée des cycles arrêtée")
+
+    def submit(self, item: Dict[str, Any]) -> Optional[Future]:
+        """
+        Déposer un cycle de collecte sans attendre son écriture
+
+        Retourne un Future résolu à True quand le cycle est écrit en base
+        (False s'il est refusé), ou None s'il n'a pu être ni écrit ni
+        conservé. Sans écriture différée (WRITE_BEHIND_ENABLED=false), le
+        cycle est écrit immédiatement.
+        """
+        written: Future = Future()
+        if not self.enabled:
+            try:
+                self.write_batch([item])
+            except Exception as e:
+                logger.error(f"Erreur lors du stockage du cycle de {item.get('target')}: {str(e)}")
+                return None
+            written.set_result(True)
+            return written
+
+        if self.thread is None:
+            self.start()
+        with self._lock:
+            self._seq = max(self._seq + 1, time.time_ns())
+            item = {"seq": self._seq, **item}
+            if not self.spilling:
+                try:
+                    self._queue.put_nowait(item)
+                    WRITE_BEHIND_PENDING.labels("memory").set(self._queue.qsize())
+                    self._written[self._seq] = written
+                    return written
+                except queue.Full:
+                    logger.warning("File d'écriture pleine, cycles ajoutés au journal")
+            try:
+                self._append([item])
+            except OSError as e:
+                logger.error(f"Impossible d'ajouter le cycle de {item.get('target')} au journal: {str(e)}")
+                return None
+            self._written[self._seq] = written
+            return written
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "database_available": self.available,
+            "queued": self._queue.qsize(),
+            "journal": self.journal_entries,
+            "written": self.written
+        }
+
+    def _append(self, items: List[Dict[str, Any]], new_segment: bool = False):
+        # Appelée avec self._lock
+        self.journal.append(items, new_segment)
+        self.spilling = True
+        self.journal_entries += len(items)
+        WRITE_BEHIND_PENDING.labels("journal").set(self.journal_entries)
+        WRITE_BEHIND_SPILLED.inc(len(items))
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        WRITE_BEHIND_PENDING.labels("memory").set(self._queue.qsize())
+        return items
+
+    def _spill(self, batch: List[Dict[str, Any]]):
+        """
+        Ajouter au journal un lot non écrit et les cycles encore en file, antérieurs à ceux déjà journalisés
+        """
+        with self._lock:
+            items = batch + self._drain()
+            if items:
+                self._append(items, new_segment=True)
+                logger.warning(f"{len(items)} cycle(s) de collecte ajoutés au journal")
+
+    def _settle(self, items: List[Dict[str, Any]], written: bool):
+        """
+        Signaler l'écriture (ou le refus) de cycles à ceux qui l'attendent
+
+        Les cycles relus du journal d'une exécution précédente n'ont pas d'attente.
+        """
+        with self._lock:
+            waiters = [self._written.pop(item.get("seq"), None) for item in items]
+        for waiter in waiters:
+            if waiter is not None:
+                waiter.set_result(written)
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        try:
+            batch = [self._queue.get(timeout=WRITER_TICK)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        WRITE_BEHIND_PENDING.labels("memory").set(self._queue.qsize())
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        """
+        Écrire un lot de cycles ; retourne False si la base est indisponible (lot à réessayer)
+
+        Un lot refusé pour une autre raison est réécrit cycle par cycle, et
+        seul le cycle en cause est écarté vers rejected.jsonl.
+        """
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            if database_unavailable(e):
+                if self.available:
+                    logger.error(f"Base de données indisponible, cycles conservés jusqu'à son retour: {str(e)}")
+                self.available = False
+                return False
+            if len(batch) > 1:
+                return all(self._write([item]) for item in batch)
+            logger.error(f"Cycle de {batch[0].get('target')} refusé par la base, écarté du journal: {str(e)}")
+            if self.journal is not None:
+                self.journal.reject(batch[0], e)
+            self._settle(batch, False)
+            return True
+
+        if not self.available:
+            logger.info("Base de données de nouveau disponible")
+        self.available = True
+        self.written += len(batch)
+        self._settle(batch, True)
+        return True
+
+    def _write_replayed(self, segment: Path, batch: List[Dict[str, Any]], position: int) -> bool:
+        """
+        Écrire un lot relu du journal et enregistrer la position de relecture qui le suit
+        """
+        if not self._write(batch):
+            return False
+        self.journal.save_offset(segment, position)
+        with self._lock:
+            self.journal_entries -= len(batch)
+            WRITE_BEHIND_PENDING.labels("journal").set(self.journal_entries)
+        return True
+
+    def _replay(self) -> bool:
+        """
+        Relire le journal dans l'ordre et écrire ses cycles par lots ; retourne False si la base est indisponible
+        """
+        for segment in self.journal.segments():
+            offset = self.journal.offset(segment)
+            with self._lock:
+                end = segment.stat().st_size
+            batch, position = [], offset
+            for item, position in self.journal.read(segment, offset, end):
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    if not self._write_replayed(segment, batch, position):
+                        return False
+                    batch = []
+                if self._stop_event.is_set():
+                    return True
+            # Derniers cycles du segment, y compris ceux qui précèdent une fin tronquée
+            if batch and not self._write_replayed(segment, batch, position):
+                return False
+
+            with self._lock:
+                if segment.stat().st_size != end:
+                    # Cycles ajoutés pendant la relecture : reprendre à la position enregistrée
+                    return True
+                self.journal.remove(segment)
+
+        with self._lock:
+            if not self.journal.segments():
+                self.spilling = False
+                self.journal_entries = 0
+                WRITE_BEHIND_PENDING.labels("journal").set(0)
+                logger.info("Journal des cycles de collecte entièrement relu")
+        return True
+
+    def _run_loop(self):
+        """
+        Boucle de l'écrivain : cycles en file d'abord (antérieurs au journal), puis relecture du journal
+        """
+        while not self._stop_event.is_set():
+            try:
+                batch = self._take_batch()
+                if batch:
+                    if not self._write(batch):
+                        self._spill(batch)
+                        self._stop_event.wait(self.retry_interval)
+                    continue
+
+                if self.spilling and not self._replay():
+                    self._stop_event.wait(self.retry_interval)
+            except Exception as e:
+                logger.error(f"Erreur de l'écriture différée des cycles: {str(e)}")
+                self._stop_event.wait(self.retry_interval)
+
+        # Arrêt : une dernière tentative pour les cycles en file
+        remaining = self._drain()
+        if remaining and not self._write(remaining):
+            self._spill(remaining)
@@ -0,0 +1,107 @@
+"""
+Comparer le débit d'écriture du collecteur : ORM ligne par ligne contre insertion par lots
+
+Chaque cycle simulé écrit des états de composants, leurs composants et des
+événements de sécurité. La base utilisée est DB_CONNECTION_STRING si elle
+est définie, sinon une base SQLite temporaire.
+
+Usage:
+    python scripts/bench_bulk_insert.py --types 50 --components 40 --events 2000 --cycles 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_cycle(types, components, events):
+    """
+    Générer les données d'un cycle de collecte synthétique
+    """
+    items = [
+        {"Component Type": f"TYPE-{t}", "Total Amount": components, "Connected": components, "Disconnected": 0}
+        for t in range(types)
+    ]
+    details = {
+        item["Component Type"]: [
+            {"Component Type": item["Component Type"], "Component Version": "12.6.0",
+             "IP Address": f"10.0.{t}.{c % 255}", "Component User": "svc", "Connected": True,
+             "Last Connection": "2023-04-20T15:30:22Z", "OS": "Windows"}
+            for c in range(components)
+        ]
+        for t, item in enumerate(items)
+    }
+    activities = [
+        {"EventType": "Login", "Username": f"user{e % 50}", "Source_IP": "192.168.1.1",
+         "Severity": "Info", "Description": f"event {e}", "Timestamp": "2023-04-20T15:30:22"}
+        for e in range(events)
+    ]
+    return {
+        "component_status": {"Items": items},
+        "component_details": details,
+        "recent_activities": activities,
+        "failed_logins": []
+    }
+
+def store_orm(db, data, models):
+    """
+    Chemin historique : un objet ORM par ligne et un flush par état de composant
+    """
+    ComponentStatus, Component, SecurityEvent = models
+    for item in data["component_status"]["Items"]:
+        status = ComponentStatus(component_type=item["Component Type"], total_amount=item["Total Amount"],
+                                 connected=item["Connected"], disconnected=item["Disconnected"], status="OK")
+        db.add(status)
+        db.flush()
+        for detail in data["component_details"][item["Component Type"]]:
+            db.add(Component(component_status_id=status.id, component_type=detail["Component Type"],
+                             component_version=detail["Component Version"], ip_address=detail["IP Address"],
+                             component_user=detail["Component User"], connected=detail["Connected"], os=detail["OS"]))
+    for event in data["recent_activities"]:
+        db.add(SecurityEvent(event_type=event["EventType"], username=event["Username"],
+                             source_ip=event["Source_IP"], severity=event["Severity"],
+                             description=event["Description"], raw_data=json.dumps(event)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit d'écriture du collecteur")
+    parser.add_argument("--types", type=int, default=50)
+    parser.add_argument("--components", type=int, default=40)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    from app.models import SessionLocal, create_tables, ComponentStatus, Component, SecurityEvent
+    from app.health_collector import HealthCollector
+
+    create_tables()
+    collector = HealthCollector()
+    collector.components_to_check = [f"TYPE-{t}" for t in range(args.types)]
+    data = make_cycle(args.types, args.components, args.events)
+    rows_per_cycle = args.types * (1 + args.components) + args.events
+
+    def run(store):
+        start = time.perf_counter()
+        for _ in range(args.cycles):
+            db = SessionLocal()
+            try:
+                store(db)
+                db.commit()
+            finally:
+                db.close()
+        elapsed = time.perf_counter() - start
+        return rows_per_cycle * args.cycles / elapsed
+
+    orm_rate = run(lambda db: store_orm(db, data, (ComponentStatus, Component, SecurityEvent)))
+    bulk_rate = run(lambda db: (collector._store_component_status(db, data, None), collector._store_security_events(db, data, None)))
+
+    print(f"Lignes par cycle: {rows_per_cycle}, cycles: {args.cycles}")
+    print(f"ORM ligne par ligne: {orm_rate:10.0f} lignes/s")
+    print(f"Insertion par lots:  {bulk_rate:10.0f} lignes/s ({bulk_rate / orm_rate:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Mesurer la durée d'un cycle de collecte contre le serveur PVWA factice
+
+Compare l'exécution séquentielle des appels (comportement historique) à
+l'exécution parallèle du client asynchrone.
+
+Usage:
+    python scripts/bench_collection.py --latency 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pvwa_stub import start_in_thread  # noqa: E402
+
+async def run(api, component_types):
+    await api.async_ensure_logged_in()
+
+    start = time.perf_counter()
+    await api.async_get_component_status()
+    await api.async_get_vault_status()
+    await api.async_get_accounts_status()
+    await api.async_get_system_health()
+    await api.async_get_recent_activities()
+    await api.async_get_failed_logins()
+    for component_type in component_types:
+        await api.async_get_component_details(component_type)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data, success = await api.async_get_all_health_data(component_types)
+    concurrent = time.perf_counter() - start
+
+    await api.aclose()
+    return sequential, concurrent, success
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du cycle de collecte")
+    parser.add_argument("--latency", type=float, default=200.0, help="Latence par requête, en millisecondes")
+    args = parser.parse_args()
+
+    server = start_in_thread(latency=args.latency / 1000.0)
+    os.environ["DEMO_MODE"] = "false"
+    os.environ["CYBERARK_API_URL"] = server.url
+
+    from app.config import COLLECTOR_CONFIG
+    from app.cyberark_async_api import AsyncCyberArkAPI
+
+    component_types = COLLECTOR_CONFIG["components_to_check"]
+    sequential, concurrent, success = asyncio.run(run(AsyncCyberArkAPI(), component_types))
+
+    print(f"Appels par cycle: {6 + len(component_types)}, latence par appel: {args.latency:.0f} ms")
+    print(f"Séquentiel: {sequential * 1000:.0f} ms")
+    print(f"Parallèle:  {concurrent * 1000:.0f} ms (succès: {success})")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
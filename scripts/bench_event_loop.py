@@ -0,0 +1,93 @@
+"""
+Mesurer la latence de /api/health pendant que des collectes s'exécutent
+
+Démarre le serveur PVWA factice et l'API (uvicorn) en local, puis mesure
+les percentiles de /api/health au repos et pendant des rafraîchissements
+forcés (/api/dashboard?refresh=true). Le p99 doit rester stable.
+
+Usage:
+    python scripts/bench_event_loop.py --latency 300 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pvwa_stub import start_in_thread  # noqa: E402
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def measure_health(client, count, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get("/api/health")
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*[one() for _ in range(count)])
+    return latencies
+
+async def refresh_loop(client, stop):
+    while not stop.is_set():
+        await client.get("/api/dashboard", params={"refresh": "true"}, timeout=60)
+
+async def run(base_url, count, concurrency):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        idle = await measure_health(client, count, concurrency)
+
+        stop = asyncio.Event()
+        refreshers = [asyncio.create_task(refresh_loop(client, stop)) for _ in range(4)]
+        await asyncio.sleep(0.2)
+        busy = await measure_health(client, count, concurrency)
+        stop.set()
+        await asyncio.gather(*refreshers)
+
+    return idle, busy
+
+def main():
+    parser = argparse.ArgumentParser(description="Latence de /api/health pendant les collectes")
+    parser.add_argument("--latency", type=float, default=300.0, help="Latence PVWA par requête, en millisecondes")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub = start_in_thread(latency=args.latency / 1000.0)
+    os.environ["DEMO_MODE"] = "false"
+    os.environ["CYBERARK_API_URL"] = stub.url
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    import uvicorn
+    from app.api import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    idle, busy = asyncio.run(run(f"http://127.0.0.1:{args.port}", args.requests, args.concurrency))
+
+    for label, values in (("Au repos", idle), ("Pendant les collectes", busy)):
+        print(f"{label:<22} p50={percentile(values, 50):7.1f} ms  p99={percentile(values, 99):7.1f} ms  max={max(values):7.1f} ms")
+
+    server.should_exit = True
+    thread.join(timeout=10)
+    stub.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Mesurer le coût d'une page d'événements selon sa position : curseur contre OFFSET
+
+La table security_events est remplie d'événements synthétiques (plusieurs
+par seconde, pour avoir des dates égales), puis parcourue page par page avec
+query_security_events, sans filtre et filtrée par utilisateur. La durée de
+la première et de la dernière page lue est comparée à celle d'une requête
+LIMIT/OFFSET équivalente. Le parcours vérifie aussi qu'aucun événement
+n'est omis ni répété. La base utilisée est DB_CONNECTION_STRING si elle est
+définie, sinon une base SQLite temporaire.
+
+Usage:
+    python scripts/bench_event_pages.py --events 200000 --pages 500 --limit 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def fill(db, events, users):
+    from app.bulk_insert import bulk_insert
+    from app.models import SecurityEvent
+
+    origin = datetime(2024, 1, 1)
+    rows = [
+        {"timestamp": origin + timedelta(seconds=e // 4), "event_type": "Login" if e % 7 else "Failed Login",
+         "username": f"user{e % users}", "source_ip": f"10.0.{e % 250}.{e % 200}", "severity": "Info",
+         "description": f"event {e}", "raw_data": "{}"}
+        for e in range(events)
+    ]
+    bulk_insert(db, SecurityEvent, rows, chunk_size=5000)
+    db.commit()
+
+def timed(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def walk(db, pages, limit, filters):
+    from app.event_queries import query_security_events
+    from app.models import SecurityEvent
+
+    cursor, seen, page_count = None, [], 0
+    while page_count < pages:
+        last_cursor = cursor
+        result = query_security_events(db, filters=filters, cursor=cursor, limit=limit)
+        page_count += 1
+        seen.extend(event["id"] for event in result["events"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+
+    # Même page par OFFSET, pour comparaison
+    def by_offset(offset):
+        query = db.query(SecurityEvent)
+        for key, value in filters.items():
+            query = query.filter(getattr(SecurityEvent, key) == value)
+        return query.order_by(SecurityEvent.timestamp.desc(), SecurityEvent.id.desc()).offset(offset).limit(limit).all()
+
+    last_offset = (page_count - 1) * limit
+    _, first_offset_time = timed(lambda: by_offset(0))
+    _, last_offset_time = timed(lambda: by_offset(last_offset))
+
+    # Première et dernière page rejouées pour des mesures comparables (cache chaud)
+    _, first_cursor_time = timed(lambda: query_security_events(db, filters=filters, limit=limit))
+    _, last_cursor_time = timed(lambda: query_security_events(db, filters=filters, cursor=last_cursor, limit=limit))
+    return {
+        "pages": page_count,
+        "events": len(seen),
+        "unique": len(set(seen)),
+        "first_cursor": first_cursor_time,
+        "last_cursor": last_cursor_time,
+        "first_offset": first_offset_time,
+        "last_offset": last_offset_time,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pagination des événements: curseur contre OFFSET")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    from app.models import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    start = time.perf_counter()
+    fill(db, args.events, args.users)
+    print(f"{args.events} événements insérés en {time.perf_counter() - start:.1f} s, pages de {args.limit}")
+
+    for label, filters in (("sans filtre", {}), ("username=user3", {"username": "user3"})):
+        result = walk(db, args.pages, args.limit, filters)
+        print(f"{label}: {result['pages']} pages, {result['events']} événements ({result['unique']} distincts)")
+        print(f"  curseur: page 1 {result['first_cursor'] * 1000:.2f} ms, "
+              f"page {result['pages']} {result['last_cursor'] * 1000:.2f} ms")
+        print(f"  OFFSET:  page 1 {result['first_offset'] * 1000:.2f} ms, "
+              f"page {result['pages']} {result['last_offset'] * 1000:.2f} ms")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Mesurer la recherche plein texte dans les événements de sécurité
+
+La table security_events est remplie d'événements synthétiques aux
+descriptions réalistes (accès à des serveurs, récupérations de mots de
+passe, connexions échouées), pour moitié sans index plein texte puis pour
+moitié avec, afin de mesurer le coût de la synchronisation à l'insertion et
+de la construction de l'index sur des données existantes. Plusieurs
+recherches (terme absent, rare ou fréquent, expression, préfixe, avec filtre,
+page profonde) sont ensuite chronométrées avec l'index et par parcours
+LIKE. La base utilisée est DB_CONNECTION_STRING si elle est définie, sinon
+une base SQLite temporaire.
+
+Usage:
+    python scripts/bench_event_search.py --events 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GROUPS = ["Domain Admins", "Server Operators", "Backup Operators", "Vault Admins", "Auditors"]
+REASONS = ["Invalid password", "Account locked", "Expired credentials", "Unknown user"]
+
+def make_rows(start, count, seed=0):
+    """
+    Générer des événements synthétiques (une seconde d'écart entre deux événements)
+    """
+    rng = random.Random(seed + start)
+    origin = datetime(2024, 1, 1)
+    rows = []
+    for e in range(start, start + count):
+        user = f"user{rng.randrange(500)}"
+        host = f"WIN-{rng.randrange(5000)}"
+        safe = f"Safe-{rng.randrange(50)}"
+        kind = rng.randrange(4)
+        if kind == 0:
+            event_type, description = "Access", f"{user} accessed {host} in {rng.choice(GROUPS)}"
+        elif kind == 1:
+            event_type, description = "Retrieve", f"Password retrieved for account svc{rng.randrange(2000)} in safe {safe}"
+        elif kind == 2:
+            event_type, description = "Failed Login", f"Failed logon for {user}: {rng.choice(REASONS)}"
+        else:
+            event_type, description = "CPM", f"CPM changed password of svc{rng.randrange(2000)} on {host}"
+        event = {"EventType": event_type, "Username": user, "Target_Safe": safe, "Description": description}
+        rows.append({
+            "timestamp": origin + timedelta(seconds=e), "event_type": event_type, "username": user,
+            "source_ip": f"10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.randrange(256)}", "target_safe": safe,
+            "severity": "Warning" if kind == 2 else "Info", "description": description, "raw_data": json.dumps(event)
+        })
+    return rows
+
+def insert(db, first, count, batch=50000):
+    from app.bulk_insert import bulk_insert
+    from app.models import SecurityEvent
+
+    started = time.perf_counter()
+    for offset in range(first, first + count, batch):
+        bulk_insert(db, SecurityEvent, make_rows(offset, min(batch, first + count - offset)), chunk_size=5000)
+        db.commit()
+    return count / (time.perf_counter() - started)
+
+def timed(function, repeat=3):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Recherche plein texte dans les événements")
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    os.environ["DB_FULL_TEXT_SEARCH"] = "false"
+
+    from app import event_queries
+    from app.event_queries import search_security_events
+    from app.models import SessionLocal, create_search_index, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    half = args.events // 2
+
+    rate_without = insert(db, 0, half)
+    started = time.perf_counter()
+    create_search_index()
+    build = time.perf_counter() - started
+    rate_with = insert(db, half, args.events - half)
+    print(f"{args.events} événements: insertion {rate_without:.0f} lignes/s sans index plein texte, "
+          f"{rate_with:.0f} lignes/s avec; index construit sur {half} événements en {build:.1f} s")
+
+    searches = [
+        ("terme absent", "WIN-99999", {}),
+        ("terme rare", "WIN-4242", {}),
+        ("terme fréquent", "password", {}),
+        ("expression", '"Domain Admins"', {}),
+        ("préfixe", "svc12*", {}),
+        ("avec filtre", "locked", {"username": "user42"}),
+    ]
+    print(f"{'recherche':<16} {'résultats':>9} {'index':>10} {'LIKE':>10}")
+    for label, query, filters in searches:
+        timings = {}
+        for backend in ("fts5", "like"):
+            event_queries._search_backend = backend
+            result, elapsed = timed(lambda: search_security_events(db, query, filters=filters, limit=args.limit))
+            timings[backend] = elapsed
+        print(f"{label:<16} {len(result['events']):>9} {timings['fts5'] * 1000:>8.1f}ms {timings['like'] * 1000:>8.1f}ms")
+
+    # Page profonde d'un terme fréquent : le curseur reprend dans l'index sans trier les correspondances
+    event_queries._search_backend = "fts5"
+    cursor = None
+    for _ in range(200):
+        page = search_security_events(db, "password", cursor=cursor, limit=args.limit)
+        previous, cursor = cursor, page["next_cursor"]
+    _, deep = timed(lambda: search_security_events(db, "password", cursor=previous, limit=args.limit))
+    print(f"page 200 de 'password': {deep * 1000:.1f}ms")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Mesurer le débit et la mémoire de l'export en masse (/api/export) selon le format et le volume
+
+La table security_events est remplie d'événements synthétiques, puis
+exportée entièrement en CSV, NDJSON et Parquet, sur une partie des lignes
+puis sur toutes : le débit (lignes/s, Mo/s) et la mémoire maximale
+(allocations Python mesurées par tracemalloc, plus le pool mémoire de
+pyarrow pour Parquet) sont affichés pour chaque volume. Avec la lecture par
+lots, la mémoire ne doit pas croître avec le nombre de lignes exportées.
+La base utilisée est DB_CONNECTION_STRING si elle est définie, sinon une
+base SQLite temporaire.
+
+Usage:
+    python scripts/bench_export.py --events 500000 --batch-size 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def fill(db, events, batch=50000):
+    from app.bulk_insert import bulk_insert
+    from app.models import SecurityEvent
+
+    origin = datetime(2024, 1, 1)
+    for offset in range(0, events, batch):
+        rows = [
+            {"timestamp": origin + timedelta(seconds=e), "event_type": "Login" if e % 7 else "Failed Login",
+             "username": f"user{e % 500}", "source_ip": f"10.0.{e % 250}.{e % 200}", "severity": "Info",
+             "description": f"user{e % 500} accessed WIN-{e % 5000}", "raw_data": '{"EventType": "Login"}'}
+            for e in range(offset, min(offset + batch, events))
+        ]
+        bulk_insert(db, SecurityEvent, rows, chunk_size=5000)
+        db.commit()
+    return origin
+
+def export(db, export_format, end, batch_size):
+    from app.export import encode_export
+
+    pool = None
+    if export_format == "parquet":
+        import pyarrow
+        pool = pyarrow.default_memory_pool()
+        pool.release_unused()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = 0
+    for chunk in encode_export(db, "security_events", export_format, end=end, batch_size=batch_size):
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Pool mémoire de pyarrow, non suivi par tracemalloc (max_memory : maximum depuis le démarrage)
+    arrow_peak = pool.max_memory() if pool is not None else 0
+    return size, elapsed, peak, arrow_peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit et mémoire de l'export en masse")
+    parser.add_argument("--events", type=int, default=500000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    from app.export import parquet_available
+    from app.models import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    start = time.perf_counter()
+    origin = fill(db, args.events)
+    print(f"{args.events} événements insérés en {time.perf_counter() - start:.1f} s, lots de {args.batch_size} lignes")
+
+    formats = ["csv", "ndjson"] + (["parquet"] if parquet_available() else [])
+    print(f"{'format':<8} {'lignes':>8} {'taille':>9} {'lignes/s':>10} {'Mo/s':>7} {'mémoire Python':>15} {'pool pyarrow':>13}")
+    for export_format in formats:
+        for rows in (args.events // 10, args.events):
+            size, elapsed, peak, arrow_peak = export(db, export_format, origin + timedelta(seconds=rows), args.batch_size)
+            print(f"{export_format:<8} {rows:>8} {size / 2 ** 20:>7.1f}Mo {rows / elapsed:>10.0f} "
+                  f"{size / 2 ** 20 / elapsed:>7.1f} {peak / 2 ** 20:>13.1f}Mo {arrow_peak / 2 ** 20:>11.1f}Mo")
+    db.close()
+
+if __name__ == "__main__":
+    main()
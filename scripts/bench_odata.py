@@ -0,0 +1,110 @@
+"""
+Mesurer l'actualisation d'une table par le flux OData : complète contre incrémentielle
+
+La table security_events est remplie d'événements synthétiques répartis
+sur plusieurs jours, puis lue entièrement par /odata/security_events en
+suivant les @odata.nextLink, comme le fait une actualisation complète de
+Power BI. L'actualisation incrémentielle ne relit que la dernière partition
+(RangeStart/RangeEnd sur le dernier jour). La dernière page d'une lecture
+complète par $skiptoken est comparée à la même page par $skip. La base
+utilisée est DB_CONNECTION_STRING si elle est définie, sinon une base
+SQLite temporaire.
+
+Usage:
+    python scripts/bench_odata.py --events 500000 --days 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def fill(db, events, days, batch=50000):
+    from app.bulk_insert import bulk_insert
+    from app.models import SecurityEvent
+
+    origin = datetime(2024, 1, 1)
+    step = days * 86400 / events
+    for offset in range(0, events, batch):
+        rows = [
+            {"timestamp": origin + timedelta(seconds=e * step), "event_type": "Login" if e % 7 else "Failed Login",
+             "username": f"user{e % 500}", "source_ip": f"10.0.{e % 250}.{e % 200}", "severity": "Info",
+             "description": f"user{e % 500} accessed WIN-{e % 5000}", "raw_data": "{}"}
+            for e in range(offset, min(offset + batch, events))
+        ]
+        bulk_insert(db, SecurityEvent, rows, chunk_size=5000)
+        db.commit()
+    return origin
+
+def refresh(client, params):
+    """
+    Lire toutes les pages d'une requête ; retourne lignes, pages, octets, durée et URL de la dernière page
+    """
+    started = time.perf_counter()
+    response = client.get("/odata/security_events", params=params)
+    rows, pages, size, last = 0, 0, 0, None
+    while True:
+        payload = response.json()
+        rows += len(payload["value"])
+        pages += 1
+        size += len(response.content)
+        link = payload.get("@odata.nextLink")
+        if link is None:
+            break
+        last = link
+        response = client.get(link)
+    return rows, pages, size, time.perf_counter() - started, last
+
+def timed(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualisation complète et incrémentielle par le flux OData")
+    parser.add_argument("--events", type=int, default=500000)
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    from fastapi.testclient import TestClient
+
+    from app.api import app
+    from app.models import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    start = time.perf_counter()
+    origin = fill(db, args.events, args.days)
+    db.close()
+    print(f"{args.events} événements sur {args.days} jours insérés en {time.perf_counter() - start:.1f} s")
+
+    client = TestClient(app)
+    last_day = origin + timedelta(days=args.days - 1)
+    runs = (
+        ("complète", {}),
+        ("incrémentielle", {"RangeStart": last_day.isoformat(), "RangeEnd": (last_day + timedelta(days=1)).isoformat()}),
+    )
+    last_link = None
+    for label, params in runs:
+        rows, pages, size, elapsed, last = refresh(client, params)
+        last_link = last_link or last
+        print(f"actualisation {label:<15} {rows:>8} lignes, {pages:>4} pages, {size / 2 ** 20:>7.1f} Mo, {elapsed:>6.2f} s")
+
+    # Dernière page de la lecture complète : reprise par id contre OFFSET
+    if last_link is not None:
+        token = int(last_link.rsplit("=", 1)[1])
+        skiptoken = timed(lambda: client.get("/odata/security_events", params={"$skiptoken": token}))
+        skip = timed(lambda: client.get("/odata/security_events", params={"$orderby": "id", "$skip": token}))
+        print(f"dernière page: $skiptoken {skiptoken * 1000:.1f} ms, $skip {skip * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Vérifier le comportement du client CyberArk face à un PVWA dégradé
+
+Trois scénarios contre le serveur PVWA factice avec injection de pannes :
+- erreurs 503 intermittentes : proportion de lectures réussies sans et avec
+  nouvelles tentatives ;
+- PVWA bloqué : durée d'un cycle de collecte avant et après ouverture du
+  disjoncteur ;
+- nœud principal lent : latence d'une lecture sans et avec requêtes redondées
+  vers un second nœud.
+
+Usage:
+    python scripts/bench_resilience.py --error-rate 0.3 --reads 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pvwa_stub import start_in_thread  # noqa: E402
+
+def make_api(base_url, attempts=1, failure_threshold=1000, reset_timeout=30, nodes=None, hedge_delay=0):
+    from app.cyberark_async_api import AsyncCyberArkAPI
+    from app.resilience import CircuitBreaker, RetryPolicy
+
+    api = AsyncCyberArkAPI()
+    api.base_url = base_url
+    api.nodes = nodes or [base_url]
+    api.hedge_delay = hedge_delay
+    api.retry = RetryPolicy(attempts, 0.02, 0.2)
+    api.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+    return api
+
+async def success_ratio(api, reads):
+    ok = 0
+    for _ in range(reads):
+        if await api._get_json("Components", None) is not None:
+            ok += 1
+    await api.aclose()
+    return ok / reads
+
+async def cycle_durations(api, component_types, cycles):
+    durations = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        await api.async_get_all_health_data(component_types)
+        durations.append(time.perf_counter() - start)
+    await api.aclose()
+    return durations
+
+async def read_latencies(api, reads):
+    await api.async_ensure_logged_in()
+    latencies = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        await api._get_json("Components", None)
+        latencies.append(time.perf_counter() - start)
+    await api.aclose()
+    return latencies
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Nouvelles tentatives, disjoncteur et requêtes redondées")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="Proportion de réponses 503 injectées")
+    parser.add_argument("--reads", type=int, default=200, help="Nombre de lectures par mesure")
+    parser.add_argument("--slow-latency", type=float, default=500.0, help="Latence du nœud lent, en millisecondes")
+    parser.add_argument("--hedge-delay", type=float, default=50.0, help="Délai avant requête redondée, en millisecondes")
+    args = parser.parse_args()
+
+    os.environ["DEMO_MODE"] = "false"
+    os.environ.setdefault("CYBERARK_API_TIMEOUT", "2")
+    os.environ.setdefault("CYBERARK_ENDPOINT_TIMEOUTS", "Logon=2")
+
+    from app.config import COLLECTOR_CONFIG
+    component_types = COLLECTOR_CONFIG["components_to_check"]
+
+    # 1. Erreurs intermittentes
+    flaky = start_in_thread(error_rate=args.error_rate)
+    print(f"Erreurs 503 injectées: {args.error_rate:.0%} des lectures")
+    for attempts in (1, 3, 5):
+        ratio = asyncio.run(success_ratio(make_api(flaky.url, attempts=attempts), args.reads))
+        print(f"  {attempts} tentative(s): {ratio:6.1%} de lectures réussies")
+    flaky.shutdown()
+
+    # 2. PVWA bloqué : chaque lecture attend le délai, jusqu'à l'ouverture du disjoncteur
+    stuck = start_in_thread(hang_rate=1.0, hang_seconds=5)
+    api = make_api(stuck.url, attempts=1, failure_threshold=3)
+    durations = asyncio.run(cycle_durations(api, component_types, 3))
+    print("PVWA bloqué (délai de lecture 2 s, disjoncteur ouvert après 3 échecs)")
+    for i, duration in enumerate(durations, 1):
+        print(f"  cycle {i}: {duration * 1000:8.1f} ms")
+    print(f"  état du disjoncteur: {api.breaker.state}")
+    stuck.shutdown()
+
+    # 3. Nœud principal lent, second nœud rapide
+    slow = start_in_thread(latency=args.slow_latency / 1000.0)
+    fast = start_in_thread(latency=0.02)
+    fast.share_sessions(slow)
+    print(f"Nœud principal à {args.slow_latency:.0f} ms, second nœud à 20 ms")
+    for label, hedge_delay in (("sans redondance", 0), (f"redondance après {args.hedge_delay:.0f} ms", args.hedge_delay / 1000.0)):
+        api = make_api(slow.url, nodes=[slow.url, fast.url], hedge_delay=hedge_delay)
+        latencies = asyncio.run(read_latencies(api, min(args.reads, 20)))
+        print(f"  {label:<28} médiane {statistics.median(latencies) * 1000:7.1f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms")
+    slow.shutdown()
+    fast.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Mesurer la planification des collectes par section
+
+Deux scénarios contre le serveur PVWA factice, sur la même durée :
+- intervalle unique : toutes les sections collectées ensemble ;
+- intervalles par section : mesures système fréquentes, statistiques du
+  coffre et des comptes rares (durées réduites par --scale).
+
+Pour chacun : lectures par route du PVWA, cycles stockés, nombre de collectes
+de la section system_health par rapport au nombre de créneaux, et dérive
+maximale des débuts de collecte par rapport à leurs créneaux (gigue
+désactivée). Mesure aussi la durée de l'arrêt du planificateur.
+
+Usage:
+    python scripts/bench_scheduler.py --latency 100 --duration 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pvwa_stub import start_in_thread  # noqa: E402
+
+# Intervalles par section de la configuration par défaut, en secondes
+DEFAULT_INTERVALS = {
+    "system_health": 30,
+    "component_status": 120,
+    "vault_status": 3600,
+    "accounts_status": 3600,
+    "events": 15,
+}
+
+def run_scenario(server, duration, interval=None):
+    from app.config import COLLECTION_SECTIONS
+    from app.health_collector import HealthCollector
+    from app.models import CollectionRun, SessionLocal
+
+    collector = HealthCollector(interval=interval)
+    collector.jitter = 0.0
+    target = collector.target()
+
+    starts = []
+    collect = collector.collect_and_store_health_data
+
+    def recorded(source="api", target=None, sections=None):
+        starts.append((time.monotonic(), set(sections or COLLECTION_SECTIONS)))
+        return collect(source, target, sections)
+
+    collector.collect_and_store_health_data = recorded
+
+    db = SessionLocal()
+    first_run = db.query(CollectionRun.id).order_by(CollectionRun.id.desc()).limit(1).scalar() or 0
+    reads = dict(server.read_counts)
+
+    # Arrêter entre deux créneaux de system_health pour compter les créneaux sans ambiguïté
+    health_interval = target.section_intervals["system_health"]
+    duration = (duration // health_interval + 0.5) * health_interval
+
+    collector.start()
+    origin = time.monotonic()
+    time.sleep(duration)
+    start = time.perf_counter()
+    collector.stop_scheduler()
+    stop_latency = time.perf_counter() - start
+    collector.stop()
+
+    runs = db.query(CollectionRun).filter(CollectionRun.id > first_run).count()
+    db.close()
+
+    routes = {}
+    for route, count in server.read_counts.items():
+        key = "Components/*/Details" if route.endswith("/Details") else route
+        routes[key] = routes.get(key, 0) + count - reads.get(route, 0)
+
+    health_starts = [moment - origin for moment, sections in starts if "system_health" in sections]
+    drift = max(abs(offset - round(offset / health_interval) * health_interval) for offset in health_starts)
+    return {
+        "routes": routes,
+        "runs": runs,
+        "health_collections": len(health_starts),
+        "health_slots": int(duration // health_interval) + 1,
+        "drift": drift,
+        "skipped": sum(target.skipped.values()),
+        "stop": stop_latency,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Planification des collectes par section")
+    parser.add_argument("--latency", type=float, default=100.0, help="Latence du PVWA factice, en millisecondes")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée de chaque scénario, en secondes")
+    parser.add_argument("--scale", type=float, default=30.0, help="Facteur de réduction des intervalles par défaut")
+    args = parser.parse_args()
+
+    server = start_in_thread(latency=args.latency / 1000.0)
+    intervals = {section: seconds / args.scale for section, seconds in DEFAULT_INTERVALS.items()}
+
+    os.environ["DEMO_MODE"] = "false"
+    os.environ["CYBERARK_API_URL"] = server.url
+    os.environ["COLLECTOR_SECTION_INTERVALS"] = ",".join(f"{section}={seconds}" for section, seconds in intervals.items())
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    print(f"Latence {args.latency:.0f} ms, {args.duration:.0f} s par scénario, "
+          f"intervalles: {', '.join(f'{section}={seconds:g} s' for section, seconds in intervals.items())}")
+    for label, interval in (("intervalle unique", intervals["system_health"]), ("intervalles par section", None)):
+        result = run_scenario(server, args.duration, interval)
+        print(f"{label}:")
+        print(f"  lectures PVWA: {sum(result['routes'].values())} "
+              f"({', '.join(f'{route} {count}' for route, count in sorted(result['routes'].items()))})")
+        print(f"  cycles stockés: {result['runs']}, créneaux sautés: {result['skipped']}")
+        print(f"  system_health: {result['health_collections']} collectes pour {result['health_slots']} créneaux, "
+              f"dérive maximale {result['drift'] * 1000:.0f} ms")
+        print(f"  arrêt du planificateur: {result['stop'] * 1000:.1f} ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Mesurer le débit (requêtes/s) des endpoints servis depuis l'instantané
+
+Compare, sur les mêmes données et avec le même générateur de charge :
+- "avant" : gestionnaires qui retournent le dict de l'instantané, validé par
+  response_model puis encodé en JSON à chaque requête ;
+- "après" : l'API actuelle, qui sert les octets encodés à la publication
+  de l'instantané (orjson), avec ou sans If-None-Match.
+
+Le coût de production du corps de /api/dashboard par requête est aussi
+mesuré sans réseau : sur une machine avec peu de cœurs, le générateur de
+charge et le serveur se partagent le processeur et le débit HTTP mesuré
+sous-estime l'écart.
+
+Usage:
+    python scripts/bench_snapshot_responses.py --duration 5 --concurrency 64 --clients 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = ("/api/dashboard", "/api/components", "/api/events")
+
+def legacy_app(data):
+    """
+    Gestionnaires équivalents à ceux d'avant la pré-sérialisation
+    """
+    from fastapi import FastAPI
+    from app.models import DashboardData
+
+    legacy = FastAPI()
+
+    @legacy.get("/api/dashboard", response_model=DashboardData)
+    async def dashboard():
+        return data
+
+    @legacy.get("/api/components")
+    async def components():
+        return data.get("component_status", {"Items": []})
+
+    @legacy.get("/api/events")
+    async def events(limit: int = 10):
+        return {"events": data.get("recent_activities", [])[:limit]}
+
+    return legacy
+
+def serve(port, legacy_data=None):
+    """
+    Exécuter l'API (ou l'application « avant ») dans un processus dédié
+    """
+    import uvicorn
+
+    if legacy_data is None:
+        from app.api import app
+    else:
+        app = legacy_app(legacy_data)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+def wait_until_ready(url, timeout=60):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Serveur indisponible: {url}")
+
+async def _load(url, duration, concurrency, headers):
+    import httpx
+
+    count = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal count
+            while time.perf_counter() < deadline:
+                response = await client.get(url, headers=headers)
+                if response.status_code not in (200, 304):
+                    raise RuntimeError(f"{url}: {response.status_code}")
+                count += 1
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return count
+
+def _load_process(args):
+    return asyncio.run(_load(*args))
+
+def measure(pool, processes, url, duration, concurrency, headers=None):
+    """
+    Générer la charge depuis plusieurs processus pour ne pas être limité par le client
+    """
+    per_process = max(1, concurrency // processes)
+    started = time.perf_counter()
+    counts = pool.map(_load_process, [(url, duration, per_process, headers)] * processes)
+    return sum(counts) / (time.perf_counter() - started)
+
+def encoding_cost(data, iterations=2000):
+    """
+    Coût moyen en microsecondes de production du corps de /api/dashboard
+    """
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from app.http_cache import REPRESENTATIONS, _encoded_body, encode_json
+    from app.models import DashboardData
+
+    def before():
+        # Validation response_model, puis encodage de JSONResponse
+        payload = jsonable_encoder(DashboardData.model_validate(data).model_dump(mode="json"))
+        return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    def encode_once():
+        return encode_json(REPRESENTATIONS[("dashboard",)](data))
+
+    def after():
+        return _encoded_body(("dashboard",), (None, 1), data, REPRESENTATIONS[("dashboard",)], None)
+
+    results = {}
+    for label, function in (("avant", before), ("encodage orjson", encode_once), ("après (pré-encodé)", after)):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        results[label] = (time.perf_counter() - started) / iterations * 1e6
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit des endpoints servis depuis l'instantané")
+    parser.add_argument("--duration", type=float, default=5.0, help="Durée de chaque mesure, en secondes")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=4, help="Nombre de processus générateurs de charge")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DEMO_MODE", "true")
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+    import httpx
+
+    current_url = f"http://127.0.0.1:{args.port}"
+    legacy_url = f"http://127.0.0.1:{args.port + 1}"
+
+    current = multiprocessing.Process(target=serve, args=(args.port,), daemon=True)
+    current.start()
+    wait_until_ready(f"{current_url}/api/dashboard")
+
+    # L'application « avant » sert exactement les mêmes données
+    data = httpx.get(f"{current_url}/api/dashboard").json()
+    legacy = multiprocessing.Process(target=serve, args=(args.port + 1, data), daemon=True)
+    legacy.start()
+    wait_until_ready(f"{legacy_url}/api/dashboard")
+
+    for label, cost in encoding_cost(data).items():
+        print(f"Corps de /api/dashboard, {label:<20} {cost:8.1f} µs/requête")
+    print()
+
+    print(f"{'Endpoint':<18} {'avant':>10} {'après':>10} {'après (304)':>12}")
+    with multiprocessing.Pool(args.clients) as pool:
+        for path in ENDPOINTS:
+            etag = httpx.get(f"{current_url}{path}").headers["etag"]
+            before = measure(pool, args.clients, f"{legacy_url}{path}", args.duration, args.concurrency)
+            after = measure(pool, args.clients, f"{current_url}{path}", args.duration, args.concurrency)
+            not_modified = measure(pool, args.clients, f"{current_url}{path}", args.duration, args.concurrency,
+                                   {"If-None-Match": etag})
+            print(f"{path:<18} {before:>8.0f}/s {after:>8.0f}/s {not_modified:>10.0f}/s")
+
+    for process in (current, legacy):
+        process.terminate()
+        process.join(timeout=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Mesurer la durée d'un cycle de collecte de plusieurs cibles PVWA
+
+Chaque cible est un serveur PVWA factice avec sa propre latence. Compare la
+collecte des cibles l'une après l'autre à leur collecte en parallèle par le
+collecteur : la durée du cycle doit suivre la cible la plus lente, pas la
+somme des cibles.
+
+Usage:
+    python scripts/bench_targets.py --latencies 100,200,400
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pvwa_stub import start_in_thread  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description="Collecte parallèle de plusieurs cibles")
+    parser.add_argument("--latencies", default="100,200,400", help="Latence par requête de chaque cible, en millisecondes")
+    parser.add_argument("--cycles", type=int, default=3)
+    args = parser.parse_args()
+
+    latencies = [float(value) for value in args.latencies.split(",")]
+    names = [f"pvwa{index}" for index in range(len(latencies))]
+    servers = [start_in_thread(latency=latency / 1000.0) for latency in latencies]
+
+    os.environ["DEMO_MODE"] = "false"
+    os.environ["CYBERARK_TARGETS"] = ",".join(names)
+    os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    for name, server in zip(names, servers):
+        os.environ[f"CYBERARK_{name.upper()}_API_URL"] = server.url
+
+    from app.health_collector import HealthCollector
+
+    collector = HealthCollector()
+    # Premier cycle : connexion de chaque cible
+    for job in collector.request_all_collections():
+        job.future.result()
+
+    sequential = []
+    concurrent = []
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        for name in names:
+            collector.request_collection(target=name).future.result()
+        sequential.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for job in collector.request_all_collections():
+            job.future.result()
+        concurrent.append(time.perf_counter() - start)
+
+    print(f"Cibles: {len(names)}, latences: {args.latencies} ms")
+    print(f"Une cible après l'autre: {min(sequential) * 1000:.0f} ms")
+    print(f"En parallèle:            {min(concurrent) * 1000:.0f} ms")
+    collector.stop()
+    for server in servers:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
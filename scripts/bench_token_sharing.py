@@ -0,0 +1,113 @@
+"""
+Mesurer les connexions au PVWA du gestionnaire de jetons
+
+Trois scénarios contre le serveur PVWA factice :
+- jeton révoqué côté PVWA pendant des lectures concurrentes : nombre de
+  connexions déclenchées par les 401 ;
+- plusieurs processus (workers uvicorn) démarrant en même temps : nombre de
+  connexions et de sessions ouvertes sans magasin de jetons, avec le magasin
+  fichier et avec le magasin SQLite ;
+- jeton arrivant à expiration : latence de la première lecture qui suit,
+  sans et avec renouvellement en arrière-plan.
+
+Usage:
+    python scripts/bench_token_sharing.py --latency 100 --workers 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pvwa_stub import start_in_thread  # noqa: E402
+
+def make_api(base_url, **settings):
+    from app.config import CYBERARK_API
+    from app.cyberark_async_api import AsyncCyberArkAPI
+
+    return AsyncCyberArkAPI({**CYBERARK_API, "name": "bench", "base_url": base_url, **settings})
+
+async def concurrent_reads_after_revocation(server, reads):
+    api = make_api(server.url)
+    await api._get_json("Components", None)
+    server.revoke_sessions()
+    logons = server.logon_count
+    results = await asyncio.gather(*[api._get_json("Components", None) for _ in range(reads)])
+    await api.aclose()
+    return sum(result is not None for result in results), server.logon_count - logons
+
+def worker(base_url, settings, barrier):
+    async def run():
+        api = make_api(base_url, **settings)
+        ok = await api._get_json("Components", None) is not None
+        await api.aclose()
+        return ok
+
+    barrier.wait()
+    if not asyncio.run(run()):
+        raise SystemExit(1)
+
+def start_workers(server, count, settings):
+    logons = server.logon_count
+    server.revoke_sessions()
+    barrier = multiprocessing.Barrier(count)
+    processes = [multiprocessing.Process(target=worker, args=(server.url, settings, barrier)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    failures = sum(process.exitcode != 0 for process in processes)
+    return server.logon_count - logons, len(server.sessions), failures
+
+async def read_after_expiry(server, lifetime, refresh):
+    api = make_api(server.url, token_lifetime=lifetime, token_refresh_before=lifetime / 2)
+    await api._get_json("Components", None)
+    refresher = asyncio.ensure_future(api.tokens.run_refresh()) if refresh else None
+
+    # Attendre que le jeton ne soit plus considéré valide
+    await asyncio.sleep(lifetime - api.token_expiry_margin.total_seconds() + 0.2)
+    start = time.perf_counter()
+    await api._get_json("Components", None)
+    latency = time.perf_counter() - start
+
+    if refresher is not None:
+        refresher.cancel()
+    await api.aclose()
+    return latency
+
+def main():
+    parser = argparse.ArgumentParser(description="Connexions au PVWA du gestionnaire de jetons")
+    parser.add_argument("--latency", type=float, default=100.0, help="Latence du PVWA factice, en millisecondes")
+    parser.add_argument("--reads", type=int, default=50, help="Lectures concurrentes après révocation du jeton")
+    parser.add_argument("--workers", type=int, default=4, help="Processus démarrés simultanément")
+    parser.add_argument("--lifetime", type=float, default=4.0, help="Durée de vie du jeton pour le renouvellement, en secondes")
+    args = parser.parse_args()
+
+    os.environ["DEMO_MODE"] = "false"
+    server = start_in_thread(latency=args.latency / 1000.0)
+
+    ok, logons = asyncio.run(concurrent_reads_after_revocation(server, args.reads))
+    print(f"Jeton révoqué, {args.reads} lectures concurrentes: {ok} réussies, {logons} connexion(s)")
+
+    directory = tempfile.mkdtemp()
+    print(f"{args.workers} processus démarrés simultanément")
+    for label, settings in (
+        ("sans magasin", {"token_store": ""}),
+        ("magasin fichier", {"token_store": "file", "token_store_path": os.path.join(directory, "tokens.json")}),
+        ("magasin SQLite", {"token_store": "sqlite", "token_store_path": os.path.join(directory, "tokens.db")}),
+    ):
+        logons, sessions, failures = start_workers(server, args.workers, settings)
+        print(f"  {label:<16} {logons} connexion(s), {sessions} session(s) ouverte(s), {failures} échec(s)")
+
+    print(f"Première lecture après expiration du jeton (durée de vie {args.lifetime:.0f} s)")
+    for label, refresh in (("connexion à la demande", False), ("renouvellement anticipé", True)):
+        latency = asyncio.run(read_after_expiry(server, args.lifetime, refresh))
+        print(f"  {label:<24} {latency * 1000:7.1f} ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Mesurer la cadence des collectes et les cycles perdus pendant une indisponibilité de la base
+
+Des cycles de collecte (mode démo, sans PVWA) sont lancés à intervalle
+fixe sur une base SQLite temporaire ; au milieu de la série, la base est
+verrouillée par une autre connexion (BEGIN EXCLUSIVE) pendant --outage
+secondes, ce qui fait échouer les écritures comme une base injoignable.
+La mesure est faite avec écriture directe (WRITE_BEHIND_ENABLED=false) puis
+avec écriture différée : durée des collectes (médiane, maximum), cycles
+stockés, et délai de relecture du journal après le retour de la base.
+
+Usage:
+    python scripts/bench_write_behind.py --cycles 40 --interval 0.5 --outage 10
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(collector, database, cycles, interval, outage):
+    from app.models import CollectionRun, SessionLocal
+
+    db = SessionLocal()
+    before = db.query(CollectionRun).filter(CollectionRun.status == "complete").count()
+    db.close()
+
+    durations, lock, locked_at = [], None, None
+    for cycle in range(cycles):
+        if cycle == cycles // 4:
+            lock = sqlite3.connect(database, isolation_level=None)
+            lock.execute("BEGIN EXCLUSIVE")
+            locked_at = time.monotonic()
+        if lock is not None and time.monotonic() - locked_at >= outage:
+            lock.execute("ROLLBACK")
+            lock.close()
+            lock = None
+        started = time.perf_counter()
+        collector.collect_and_store_health_data("bench", sections=["system_health"])
+        durations.append(time.perf_counter() - started)
+        time.sleep(max(0.0, interval - durations[-1]))
+    if lock is not None:
+        lock.execute("ROLLBACK")
+        lock.close()
+
+    # Attendre l'écriture des cycles en file et la relecture du journal
+    started = time.perf_counter()
+    writer = collector.writer
+    while writer.enabled and (writer.status()["queued"] or writer.spilling) and time.perf_counter() - started < 120:
+        time.sleep(0.1)
+    drained = time.perf_counter() - started
+
+    db = SessionLocal()
+    stored = db.query(CollectionRun).filter(CollectionRun.status == "complete").count() - before
+    db.close()
+    return durations, stored, drained
+
+def main():
+    parser = argparse.ArgumentParser(description="Collectes pendant une indisponibilité de la base")
+    parser.add_argument("--cycles", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--outage", type=float, default=10)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    database = os.path.join(directory, "bench.db")
+    os.environ["DB_CONNECTION_STRING"] = f"sqlite:///{database}"
+    os.environ.setdefault("DEMO_MODE", "true")
+    os.environ["WRITE_BEHIND_JOURNAL_DIR"] = os.path.join(directory, "spool")
+    os.environ.setdefault("WRITE_BEHIND_RETRY_INTERVAL", "1")
+
+    from app.health_collector import collector
+
+    print(f"{args.cycles} cycles toutes les {args.interval} s, base verrouillée {args.outage} s")
+    print(f"{'écriture':<9} {'médiane':>9} {'maximum':>9} {'stockés':>8} {'relecture':>10}")
+    for label, enabled in (("directe", False), ("différée", True)):
+        collector.writer.enabled = enabled
+        durations, stored, drained = run(collector, database, args.cycles, args.interval, args.outage)
+        print(f"{label:<9} {statistics.median(durations) * 1000:>7.1f}ms {max(durations) * 1000:>7.1f}ms "
+              f"{stored:>4}/{args.cycles:<3} {drained:>9.1f}s")
+    collector.writer.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Serveur PVWA factice pour tester le client CyberArk en local
+
+Il expose les endpoints utilisés par le collecteur à partir des données de
+powerbi/assets/sample_data.json, avec une latence configurable par requête.
+Des pannes peuvent être injectées sur les lectures : une proportion de
+réponses 503 (--error-rate) et de requêtes qui restent bloquées
+(--hang-rate, --hang-seconds), pour tester les nouvelles tentatives et le
+disjoncteur du client. Chaque connexion ouvre une session dont le jeton
+expire après --token-ttl secondes d'inactivité, comme sur un vrai PVWA.
+
+Usage:
+    python scripts/pvwa_stub.py --port 8443 --latency 200
+    python scripts/pvwa_stub.py --port 8443 --error-rate 0.3 --hang-rate 0.05
+    python scripts/pvwa_stub.py --port 8443 --token-ttl 60
+    DEMO_MODE=false CYBERARK_API_URL=http://127.0.0.1:8443 python main.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+SAMPLE_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "powerbi", "assets", "sample_data.json")
+
+def load_sample_data():
+    """
+    Charger les données d'exemple servies par le serveur factice
+    """
+    with open(SAMPLE_DATA_PATH, "r") as f:
+        return json.load(f)
+
+class PVWAStubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 pour permettre la réutilisation des connexions (keep-alive)
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _routes(self):
+        data = self.server.data
+        items = data["component_status"]["Items"]
+        routes = {
+            "Components": {"Items": [{k: v for k, v in item.items() if k != "Components"} for item in items]},
+            "Safes/Statistics": data["vault_status"],
+            "Accounts/Statistics": data["accounts_status"],
+            "System/Health": data["system_health"],
+            "Activities": data["recent_activities"],
+            "Activities/Failed": data["failed_logins"],
+        }
+        for item in items:
+            routes[f"Components/{item['Component Type']}/Details"] = {"Components": item.get("Components", [])}
+        return routes
+
+    def do_POST(self):
+        self.server.count_request()
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.server.latency)
+
+        path = urlparse(self.path).path
+        if path.endswith("/Logon"):
+            self._send_json(200, self.server.open_session())
+        elif path.endswith("/Logoff"):
+            self.server.close_session(self.headers.get("Authorization"))
+            self._send_json(200, {})
+        else:
+            self._send_json(404, {"ErrorMessage": "Not found"})
+
+    def do_GET(self):
+        self.server.count_request()
+        time.sleep(self.server.latency)
+
+        if not self.server.touch_session(self.headers.get("Authorization")):
+            self._send_json(401, {"ErrorMessage": "Unauthorized"})
+            return
+
+        # Pannes injectées
+        fault = random.random()
+        if fault < self.server.hang_rate:
+            time.sleep(self.server.hang_seconds)
+        elif fault < self.server.hang_rate + self.server.error_rate:
+            self._send_json(503, {"ErrorMessage": "Service Unavailable"})
+            return
+
+        path = unquote(urlparse(self.path).path)
+        prefix = "/PasswordVault/API/v1/"
+        routes = self._routes()
+        if path.startswith(prefix) and path[len(prefix):] in routes:
+            self.server.count_read(path[len(prefix):])
+            self._send_json(200, routes[path[len(prefix):]])
+        else:
+            self._send_json(404, {"ErrorMessage": "Not found"})
+
+class PVWAStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, verbose=False, error_rate=0.0, hang_rate=0.0, hang_seconds=30.0,
+                 token_ttl=0.0):
+        super().__init__(address, PVWAStubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.verbose = verbose
+        self.data = load_sample_data()
+        self.request_count = 0
+        self.read_counts = {}  # Lectures réussies par route
+        self._count_lock = threading.Lock()
+        # Sessions ouvertes : jeton -> dernière utilisation (token_ttl 0 : pas d'expiration)
+        self.token_ttl = token_ttl
+        self.sessions = {}
+        self.logon_count = 0
+        self._session_lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Requêtes abandonnées par le client (délai dépassé, requête redondée annulée)
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def count_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def count_read(self, route):
+        with self._count_lock:
+            self.read_counts[route] = self.read_counts.get(route, 0) + 1
+
+    def open_session(self):
+        token = uuid.uuid4().hex
+        with self._session_lock:
+            self.logon_count += 1
+            self.sessions[token] = time.monotonic()
+        return token
+
+    def close_session(self, token):
+        with self._session_lock:
+            self.sessions.pop(token, None)
+
+    def touch_session(self, token):
+        """
+        Vérifier un jeton et prolonger sa session
+        """
+        with self._session_lock:
+            last_used = self.sessions.get(token)
+            if last_used is None:
+                return False
+            if self.token_ttl and time.monotonic() - last_used > self.token_ttl:
+                del self.sessions[token]
+                return False
+            self.sessions[token] = time.monotonic()
+            return True
+
+    def share_sessions(self, other):
+        """
+        Accepter les jetons d'un autre serveur factice (nœuds d'un même PVWA)
+        """
+        self.sessions = other.sessions
+        self._session_lock = other._session_lock
+
+    def revoke_sessions(self):
+        """
+        Invalider toutes les sessions (redémarrage du PVWA, expiration côté serveur)
+        """
+        with self._session_lock:
+            self.sessions.clear()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+def start_in_thread(port=0, latency=0.0, verbose=False, **faults):
+    """
+    Démarrer le serveur factice dans un thread d'arrière-plan et le retourner
+    """
+    server = PVWAStubServer(("127.0.0.1", port), latency=latency, verbose=verbose, **faults)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur PVWA factice")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence ajoutée à chaque requête, en millisecondes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de lectures en erreur 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Proportion de lectures bloquées")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="Durée de blocage, en secondes")
+    parser.add_argument("--token-ttl", type=float, default=0.0, help="Expiration des sessions inactives, en secondes (0: jamais)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = PVWAStubServer(("127.0.0.1", args.port), latency=args.latency / 1000.0, verbose=args.verbose,
+                            error_rate=args.error_rate, hang_rate=args.hang_rate, hang_seconds=args.hang_seconds,
+                            token_ttl=args.token_ttl)
+    print(f"Serveur PVWA factice à l'écoute sur {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Configuration commune des tests : base SQLite et fichiers de travail dans un répertoire temporaire
+
+Les variables d'environnement sont fixées avant l'import du paquet app,
+dont la configuration est lue au chargement des modules.
+"""
+import os
+import sys
+import tempfile
+
+import httpx
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="cyberark-tests-")
+
+os.environ["DB_CONNECTION_STRING"] = f"sqlite:///{os.path.join(TEST_DIR, 'tests.db')}"
+os.environ["DEMO_MODE"] = "true"
+os.environ["WRITE_BEHIND_JOURNAL_DIR"] = os.path.join(TEST_DIR, "spool")
+os.environ["TRACING_FILE"] = os.path.join(TEST_DIR, "traces.jsonl")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Journaux (*.log) et données de démo (demo_data.json) sont écrits dans le répertoire courant
+os.chdir(TEST_DIR)
+
+from app.config import CYBERARK_API  # noqa: E402
+from app.cyberark_async_api import AsyncCyberArkAPI  # noqa: E402
+from app.models import Base, SessionLocal, create_tables  # noqa: E402
+
+create_tables()
+
+@pytest.fixture
+def db():
+    """
+    Session sur la base de test, vidée après chaque test
+    """
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
+
+@pytest.fixture
+def pvwa():
+    """
+    Fabrique de clients asynchrones hors mode démo, dont les requêtes sont traitées par `handler`
+
+    Les nouvelles tentatives n'attendent pas et les lectures ne sont pas redondées.
+    """
+    def make_client(handler, **config) -> AsyncCyberArkAPI:
+        api = AsyncCyberArkAPI({
+            **CYBERARK_API,
+            "base_url": "http://pvwa",
+            "username": "svc",
+            "password": "secret",
+            "auth_type": "cyberark",
+            "retry_base_delay": 0,
+            "hedge_delay": 0,
+            "token_store": "",
+            **config
+        })
+        api.demo_mode = False
+        api.client = httpx.AsyncClient(base_url=api.base_url, transport=httpx.MockTransport(handler))
+        return api
+    return make_client
@@ -0,0 +1,79 @@
+"""
+Tests de l'ingestion incrémentale des événements : point de reprise et déduplication par empreinte
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.event_ingestion import event_hash, ingest_events, parse_event_timestamp
+from app.models import IngestionCursor, SecurityEvent
+
+COLLECTED_AT = datetime(2024, 1, 2, 12, 0)
+
+def event(minute, user="admin", **fields):
+    return {"Timestamp": f"2024-01-01T10:{minute:02d}:00" if minute is not None else None,
+            "User": user, "Action": "Logon", **fields}
+
+def to_row(item):
+    return {"event_type": item["Action"], "username": item["User"], "source_ip": "10.0.0.1",
+            "severity": "Info", "description": f"{item['Action']} {item['User']}"}
+
+def ingest(db, events, target=None):
+    inserted = ingest_events(db, "activities", events, to_row, None, target=target, collected_at=COLLECTED_AT)
+    db.commit()
+    return inserted
+
+def stored(db):
+    return db.execute(
+        select(SecurityEvent.target, SecurityEvent.timestamp, SecurityEvent.username).order_by(SecurityEvent.id)
+    ).all()
+
+def cursor(db, source="activities"):
+    return db.execute(select(IngestionCursor).where(IngestionCursor.source == source)).scalar_one()
+
+def test_event_hash_ignores_key_order():
+    assert event_hash("activities", {"a": 1, "b": 2}) == event_hash("activities", {"b": 2, "a": 1})
+    assert event_hash("activities", {"a": 1}) != event_hash("failed_logins", {"a": 1})
+
+def test_parse_event_timestamp():
+    assert parse_event_timestamp("2024-01-01T10:00:00") == datetime(2024, 1, 1, 10, 0)
+    utc = datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert parse_event_timestamp("2024-01-01T10:00:00Z") == utc
+    assert parse_event_timestamp("hier") is None
+    assert parse_event_timestamp(None) is None
+
+def test_sliding_window_stores_each_event_once(db):
+    assert ingest(db, [event(1), event(2), event(2)]) == 2
+    assert ingest(db, [event(1), event(2), event(3)]) == 1
+    assert ingest(db, [event(2), event(3)]) == 0
+
+    assert [row.timestamp.minute for row in stored(db)] == [1, 2, 3]
+    assert (cursor(db).last_timestamp, cursor(db).updated_at) == (datetime(2024, 1, 1, 10, 3), COLLECTED_AT)
+
+def test_events_before_the_cursor_are_skipped(db):
+    ingest(db, [event(5)])
+
+    assert ingest(db, [event(4, user="late"), event(5, user="other"), event(6)]) == 2
+    assert [(row.timestamp.minute, row.username) for row in stored(db)] == [(5, "admin"), (5, "other"), (6, "admin")]
+
+def test_undated_events_use_the_collection_time_and_keep_the_cursor(db):
+    ingest(db, [event(5)])
+
+    assert ingest(db, [event(None, user="undated")]) == 1
+    assert ingest(db, [event(None, user="undated")]) == 0
+    assert stored(db)[-1].timestamp == COLLECTED_AT
+    assert cursor(db).last_timestamp == datetime(2024, 1, 1, 10, 5)
+
+def test_cursor_and_hashes_are_per_target(db):
+    assert ingest(db, [event(5)]) == 1
+    assert ingest(db, [event(3), event(5)], target="secondaire") == 2
+
+    assert [row.target for row in stored(db)] == [None, "secondaire", "secondaire"]
+    assert cursor(db, "secondaire:activities").last_timestamp == datetime(2024, 1, 1, 10, 5)
+    assert cursor(db).last_timestamp == datetime(2024, 1, 1, 10, 5)
+
+def test_raw_event_is_kept(db):
+    ingest(db, [event(1, Station="WIN-123")])
+    row = db.execute(select(SecurityEvent)).scalar_one()
+    assert '"Station": "WIN-123"' in row.raw_data
+    assert row.event_hash == event_hash("activities", event(1, Station="WIN-123"))
@@ -0,0 +1,153 @@
+"""
+Tests de la lecture des événements de sécurité : curseur (timestamp, id), filtres et recherche plein texte
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import event_queries
+from app.event_queries import (
+    EventQueryError, decode_cursor, encode_cursor, parse_search, query_security_events, search_security_events
+)
+from app.models import SecurityEvent
+
+ORIGIN = datetime(2024, 1, 1)
+
+@pytest.fixture
+def events(db):
+    # Trois événements par date, pour vérifier l'ordre des événements de même timestamp
+    db.add_all([
+        SecurityEvent(
+            timestamp=ORIGIN + timedelta(minutes=index // 3),
+            event_type="Failed Login" if index % 2 else "Login",
+            username=f"user{index % 3}",
+            source_ip="10.0.0.1",
+            severity="Info",
+            description=f"session {index}",
+            raw_data="{}"
+        )
+        for index in range(20)
+    ])
+    db.commit()
+    return db
+
+def _read_all(db, limit, **options):
+    ids, cursor = [], None
+    while True:
+        page = query_security_events(db, cursor=cursor, limit=limit, **options)
+        ids.extend(event["id"] for event in page["events"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 17, 8, 30, 15, 123456)
+    cursor = encode_cursor(timestamp, 4821)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, 4821)
+
+@pytest.mark.parametrize("cursor", ["%%%", "bm90LWEtY3Vyc29y", encode_cursor(ORIGIN, 1)[:-4], "MjAyNC0wMS0wMVQwMDowMDowMHx4"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(EventQueryError):
+        decode_cursor(cursor)
+
+def test_pages_are_newest_first_without_gaps_or_duplicates(events):
+    expected = [event.id for event in sorted(
+        events.query(SecurityEvent).all(), key=lambda event: (event.timestamp, event.id), reverse=True
+    )]
+    for limit in (1, 2, 3, 7, 20, 50):
+        assert _read_all(events, limit) == expected
+
+def test_last_full_page_has_a_cursor_only_if_events_remain(events):
+    page = query_security_events(events, limit=20)
+    assert len(page["events"]) == 20
+    assert page["next_cursor"] is None
+
+def test_events_inserted_between_pages_do_not_shift_the_next_page(events):
+    first = query_security_events(events, limit=5)
+    events.add(SecurityEvent(timestamp=ORIGIN + timedelta(days=1), event_type="Login", username="late",
+                             source_ip="10.0.0.2", severity="Info", description="late"))
+    events.commit()
+
+    second = query_security_events(events, cursor=first["next_cursor"], limit=5)
+    assert second["events"][0]["id"] < first["events"][-1]["id"]
+    assert "late" not in [event["username"] for event in second["events"]]
+
+def test_filters_and_period_combine_with_the_cursor(events):
+    ids = _read_all(events, 2, filters={"username": "user1", "event_type": "Failed Login"},
+                    start=ORIGIN + timedelta(minutes=1), end=ORIGIN + timedelta(minutes=6))
+    stored = {event.id: event for event in events.query(SecurityEvent).all()}
+    assert ids
+    for event_id in ids:
+        event = stored[event_id]
+        assert (event.username, event.event_type) == ("user1", "Failed Login")
+        assert ORIGIN + timedelta(minutes=1) <= event.timestamp < ORIGIN + timedelta(minutes=6)
+
+@pytest.mark.parametrize("options", [
+    {"filters": {"description": "session 1"}},
+    {"start": ORIGIN, "end": ORIGIN},
+    {"limit": 0},
+    {"limit": 501},
+])
+def test_invalid_parameters_are_rejected(events, options):
+    with pytest.raises(EventQueryError):
+        query_security_events(events, **options)
+
+def test_parse_search_splits_words_phrases_and_prefixes():
+    assert parse_search('vault  "DOMAIN\\admin user" admin* "prefix phrase"*') == [
+        ("vault", False), ("DOMAIN\\admin user", False), ("admin", True), ("prefix phrase", True)
+    ]
+
+@pytest.mark.parametrize("query", ["", "   ", '""', "* **", " ".join(["word"] * 11)])
+def test_parse_search_rejects_empty_and_long_queries(query):
+    with pytest.raises(EventQueryError):
+        parse_search(query)
+
+@pytest.fixture(params=["fts5", "like"])
+def searchable(request, db, monkeypatch):
+    monkeypatch.setattr(event_queries, "_search_backend", request.param)
+    db.add_all([
+        SecurityEvent(timestamp=ORIGIN + timedelta(minutes=index), event_type="Login", username=f"user{index % 2}",
+                      source_ip="10.0.0.1", severity="Info", description=description, raw_data=raw_data)
+        for index, (description, raw_data) in enumerate([
+            ("Connexion depuis WIN-123", '{"host": "WIN-123"}'),
+            ("Password rotation failed", '{"account": "DOMAIN\\\\admin"}'),
+            ("Connexion refusée", '{"host": "WIN-456"}'),
+            ("Password rotation succeeded", '{"account": "administrator"}'),
+            ("Session PSM ouverte", "{}"),
+        ])
+    ])
+    db.commit()
+    return db
+
+def _descriptions(page):
+    return [event["description"] for event in page["events"]]
+
+def test_search_requires_every_term(searchable):
+    page = search_security_events(searchable, "password failed")
+    assert _descriptions(page) == ["Password rotation failed"]
+    assert page["backend"] == event_queries._search_backend
+
+def test_search_matches_raw_data_and_punctuation(searchable):
+    assert _descriptions(search_security_events(searchable, '"WIN-123"')) == ["Connexion depuis WIN-123"]
+
+def test_search_prefix(searchable):
+    assert _descriptions(search_security_events(searchable, "admin*")) == [
+        "Password rotation succeeded", "Password rotation failed"
+    ]
+
+def test_search_pages_by_descending_id(searchable):
+    ids, cursor = [], None
+    while True:
+        page = search_security_events(searchable, "rotation", cursor=cursor, limit=1)
+        ids.extend(event["id"] for event in page["events"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(ids) == 2
+    assert ids == sorted(ids, reverse=True)
+
+def test_search_combines_with_filters(searchable):
+    page = search_security_events(searchable, "connexion", filters={"username": "user0"})
+    assert _descriptions(page) == ["Connexion refusée", "Connexion depuis WIN-123"]
+    assert _descriptions(search_security_events(searchable, "connexion", filters={"username": "user1"})) == []
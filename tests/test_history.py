@@ -0,0 +1,74 @@
+"""
+Tests des séries historiques : intervalles, limitation du nombre de points et agrégation
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.history import (
+    HistoryQueryError, effective_bucket, floor_time, format_bucket, parse_aggregations, parse_bucket, system_history
+)
+from app.models import SystemHealth
+
+ORIGIN = datetime(2024, 1, 1)
+
+@pytest.mark.parametrize("bucket, seconds", [("30s", 30), ("5m", 300), ("1H", 3600), (" 2d ", 172800)])
+def test_parse_bucket(bucket, seconds):
+    assert parse_bucket(bucket) == seconds
+
+@pytest.mark.parametrize("bucket", ["", "0m", "5", "m", "1w", "1.5h", "-1h"])
+def test_parse_bucket_rejects_invalid_intervals(bucket):
+    with pytest.raises(HistoryQueryError):
+        parse_bucket(bucket)
+
+def test_format_bucket_uses_the_largest_unit():
+    assert [format_bucket(seconds) for seconds in (45, 120, 5400, 7200, 86400)] == ["45s", "2m", "90m", "2h", "1d"]
+
+def test_parse_aggregations():
+    assert parse_aggregations("avg, MAX") == ["avg", "max"]
+    with pytest.raises(HistoryQueryError):
+        parse_aggregations("avg,median")
+    with pytest.raises(HistoryQueryError):
+        parse_aggregations(" , ")
+
+def test_effective_bucket_keeps_a_small_enough_interval():
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(hours=1), 60) == 60
+
+def test_effective_bucket_widens_to_a_nice_interval():
+    # 7 jours en 500 points : au moins 1210 s, arrondi à 30 min
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(days=7), 60) == 1800
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(days=7), None) == 1800
+
+def test_effective_bucket_never_narrows_the_requested_interval():
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(days=7), 7200) == 7200
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(days=7), 1000) == 1800
+
+def test_effective_bucket_divides_points_between_series():
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(days=1), None) == 300
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(days=1), None, series=10) == 1800
+
+def test_effective_bucket_beyond_nice_intervals():
+    assert effective_bucket(ORIGIN, ORIGIN + timedelta(days=10 * 365), None) == 630720
+
+def test_floor_time_aligns_on_the_epoch():
+    assert floor_time(datetime(2024, 1, 1, 10, 47, 12), 900) == datetime(2024, 1, 1, 10, 45)
+    assert floor_time(datetime(2024, 1, 1, 10, 47, 12), 86400) == datetime(2024, 1, 1)
+
+def test_system_history_aggregates_each_bucket(db):
+    db.add_all([
+        SystemHealth(timestamp=ORIGIN + timedelta(minutes=minutes), cpu_usage=cpu, memory_usage=50.0, disk_usage=None)
+        for minutes, cpu in ((0, 10.0), (20, 30.0), (40, 20.0), (60, 70.0))
+    ])
+    db.commit()
+
+    history = system_history(db, ORIGIN, ORIGIN + timedelta(hours=2), 3600, ["avg", "min", "max", "last", "sum"])
+
+    assert history["bucket"] == "1h"
+    first, second = history["points"]
+    assert first["timestamp"] == ORIGIN.isoformat()
+    assert first["samples"] == 3
+    assert (first["cpu_usage_avg"], first["cpu_usage_min"], first["cpu_usage_max"]) == (20.0, 10.0, 30.0)
+    assert (first["cpu_usage_last"], first["cpu_usage_sum"]) == (20.0, 60.0)
+    assert first["disk_usage_avg"] is None
+    assert second["samples"] == 1
+    assert second["cpu_usage_last"] == 70.0
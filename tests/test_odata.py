@@ -0,0 +1,138 @@
+"""
+Tests du flux OData : analyse de $filter et pagination par $skiptoken
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import Component, SecurityEvent
+from app.odata import ODataQueryError, _tokenize, parse_datetime, query_entity_set
+
+ORIGIN = datetime(2024, 1, 1)
+
+@pytest.fixture
+def events(db):
+    db.add_all([
+        SecurityEvent(
+            timestamp=ORIGIN + timedelta(hours=index),
+            event_type="Failed Login" if index % 3 == 0 else "Login",
+            username=f"user{index % 4}",
+            source_ip=f"10.0.0.{index}",
+            severity="Warning" if index % 3 == 0 else "Info",
+            description=f"O'Brien 50% session {index}" if index == 5 else f"session {index}",
+            raw_data="{}"
+        )
+        for index in range(12)
+    ])
+    db.commit()
+    return db
+
+def matching_ips(db, expression, **options):
+    result = query_entity_set(db, "security_events", expression, select_expression="username,source_ip", **options)
+    return [row["source_ip"] for row in result["value"]]
+
+def ips(*indexes):
+    return [f"10.0.0.{index}" for index in indexes]
+
+def test_tokenize_recognizes_literals_names_and_punctuation():
+    tokens = _tokenize("timestamp ge 2024-01-01T00:00:00Z and (username eq 'o''brien' or id lt -3.5e2)")
+    assert tokens == [
+        ("name", "timestamp"), ("name", "ge"), ("datetime", "2024-01-01T00:00:00Z"), ("name", "and"),
+        ("punct", "("), ("name", "username"), ("name", "eq"), ("string", "'o''brien'"), ("name", "or"),
+        ("name", "id"), ("name", "lt"), ("number", "-3.5e2"), ("punct", ")"),
+    ]
+
+def test_tokenize_rejects_unknown_characters():
+    with pytest.raises(ODataQueryError):
+        _tokenize("username eq \"user1\"")
+
+def test_parse_datetime_converts_offsets_to_naive_local_time():
+    assert parse_datetime("2024-01-01") == datetime(2024, 1, 1)
+    utc = parse_datetime("2024-01-01T12:00:00Z")
+    assert utc.tzinfo is None
+    assert utc == datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    with pytest.raises(ODataQueryError):
+        parse_datetime("not-a-date")
+
+def test_comparisons_and_boolean_operators(events):
+    assert matching_ips(events, "username eq 'user1'") == ips(1, 5, 9)
+    assert matching_ips(events, "username eq 'user1' and severity ne 'Info'") == ips(9)
+    assert matching_ips(events, "id le 2 or id ge 12") == ips(0, 1, 11)
+    assert matching_ips(events, "not (severity eq 'Info') and id le 7") == ips(0, 3, 6)
+
+def test_literal_on_the_left_reverses_the_comparison(events):
+    assert matching_ips(events, "3 gt id") == matching_ips(events, "id lt 3")
+
+def test_datetime_literals_filter_timestamps(events):
+    assert matching_ips(events, "timestamp ge 2024-01-01T10:00:00 and timestamp lt 2024-01-02") == ips(10, 11)
+    assert matching_ips(events, "timestamp lt '2024-01-01T02:00:00'") == ips(0, 1)
+
+def test_string_functions_escape_like_wildcards(events):
+    assert matching_ips(events, "contains(description, '50%')") == ips(5)
+    assert matching_ips(events, "contains(description, 'O''Brien')") == ips(5)
+    assert matching_ips(events, "startswith(source_ip, '10.0.0.1') and endswith(source_ip, '1')") == ips(1, 11)
+
+def test_null_literal_uses_is_null(events):
+    assert len(matching_ips(events, "target_safe eq null")) == 12
+    assert matching_ips(events, "target_safe ne null") == []
+
+def test_bare_boolean_column(db):
+    db.add_all([Component(component_type="CPM", connected=True), Component(component_type="PSM", connected=False)])
+    db.commit()
+    result = query_entity_set(db, "components", "connected", select_expression="component_type")
+    assert [row["component_type"] for row in result["value"]] == ["CPM"]
+
+@pytest.mark.parametrize("expression", [
+    "username eq",
+    "username eq 'a' and",
+    "(username eq 'a'",
+    "unknown eq 1",
+    "username 'a'",
+    "tolower(username) eq 'a'",
+    "contains(username, 3)",
+    "id eq 2024-01-01",
+    "username eq 'a' )",
+])
+def test_invalid_filters_are_rejected(events, expression):
+    with pytest.raises(ODataQueryError):
+        query_entity_set(events, "security_events", expression)
+
+def test_skiptoken_pages_follow_the_last_id(events):
+    seen, options = [], {}
+    while True:
+        page = query_entity_set(events, "security_events", select_expression="source_ip", max_page_size=5, **options)
+        seen.extend(row["source_ip"] for row in page["value"])
+        if page["next"] is None:
+            break
+        assert page["next"]["$skip"] is None
+        options = {"skiptoken": page["next"]["$skiptoken"]}
+    assert seen == ips(*range(12))
+
+def test_skiptoken_with_skip_and_top(events):
+    first = query_entity_set(events, "security_events", select_expression="source_ip", skip=2, top=7, max_page_size=5)
+    assert [row["source_ip"] for row in first["value"]] == ips(2, 3, 4, 5, 6)
+    assert first["next"]["$top"] == 2
+    second = query_entity_set(events, "security_events", select_expression="source_ip", top=first["next"]["$top"],
+                              skiptoken=first["next"]["$skiptoken"], max_page_size=5)
+    assert [row["source_ip"] for row in second["value"]] == ips(7, 8)
+    assert second["next"] is None
+
+def test_orderby_pages_use_skip(events):
+    page = query_entity_set(events, "security_events", select_expression="source_ip", orderby="id desc", max_page_size=5)
+    assert page["next"] == {"$top": None, "$skip": 5}
+    with pytest.raises(ODataQueryError):
+        query_entity_set(events, "security_events", orderby="id desc", skiptoken="5")
+
+def test_invalid_skiptoken_is_rejected(events):
+    with pytest.raises(ODataQueryError):
+        query_entity_set(events, "security_events", skiptoken="abc")
+
+def test_count_ignores_the_skiptoken(events):
+    page = query_entity_set(events, "security_events", "severity eq 'Info'", count=True, skiptoken="6")
+    assert page["count"] == 8
+    assert len(page["value"]) == 4
+
+def test_range_start_and_end_restrict_timestamp(events):
+    page = query_entity_set(events, "security_events", select_expression="source_ip",
+                            range_start="2024-01-01T03:00:00", range_end="2024-01-01T05:00:00")
+    assert [row["source_ip"] for row in page["value"]] == ips(3, 4)
@@ -0,0 +1,159 @@
+"""
+Tests des nouvelles tentatives et du disjoncteur, seuls et dans les lectures du client asynchrone
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app import resilience
+from app.resilience import CircuitBreaker, RetryPolicy, endpoint_timeout, parse_endpoint_timeouts
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+def test_retry_delay_is_capped_exponential_with_full_jitter(monkeypatch):
+    policy = RetryPolicy(attempts=5, base_delay=0.2, max_delay=2)
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    assert [policy.delay(attempt) for attempt in range(6)] == pytest.approx([0.2, 0.4, 0.8, 1.6, 2, 2])
+
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: low)
+    assert policy.delay(3) == 0
+
+def test_retry_policy_makes_at_least_one_attempt():
+    assert RetryPolicy(attempts=0, base_delay=0.2, max_delay=2).attempts == 1
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.to_dict() == {"state": "open", "consecutive_failures": 3}
+
+def test_breaker_admits_a_single_trial_after_the_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert not breaker.allow()
+
+    clock.now += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.is_open()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+def test_released_trial_can_be_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+def test_release_does_not_reopen_a_closed_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.release()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_endpoint_timeout_uses_the_longest_prefix():
+    timeouts = parse_endpoint_timeouts("Components=5, Components/CPM=8,Activities=15,invalid")
+    assert timeouts == {"Components": 5.0, "Components/CPM": 8.0, "Activities": 15.0}
+    assert endpoint_timeout("Components", timeouts) == 5.0
+    assert endpoint_timeout("Components/PSM/Details", timeouts) == 5.0
+    assert endpoint_timeout("Components/CPM/Details", timeouts) == 8.0
+    assert endpoint_timeout("ComponentsX", timeouts) == resilience.CYBERARK_API["timeout"]
+
+class PVWA:
+    """
+    PVWA simulé : connexion acceptée, puis réponses de lecture successives (code HTTP ou exception)
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.reads = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/Logon"):
+            return httpx.Response(200, text='"token"')
+        self.reads += 1
+        response = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return httpx.Response(response, json={"status": response})
+
+def test_transient_errors_are_retried(pvwa):
+    server = PVWA(503, httpx.ConnectError("refused"), 200)
+    api = pvwa(server, retry_attempts=3)
+
+    assert asyncio.run(api._get_json("Components", None)) == {"status": 200}
+    assert server.reads == 3
+    assert api.breaker.to_dict() == {"state": "closed", "consecutive_failures": 0}
+
+def test_client_errors_are_not_retried_nor_counted(pvwa):
+    server = PVWA(404)
+    api = pvwa(server, retry_attempts=3, breaker_failure_threshold=1)
+
+    assert asyncio.run(api._get_json("Components", "default")) == "default"
+    assert server.reads == 1
+    assert api.breaker.state == CircuitBreaker.CLOSED
+
+def test_exhausted_retries_open_the_breaker_and_short_circuit(pvwa):
+    server = PVWA(503)
+    api = pvwa(server, retry_attempts=2, breaker_failure_threshold=2)
+
+    async def read_three_times():
+        return [await api._get_json("Components", "default") for _ in range(3)]
+
+    assert asyncio.run(read_three_times()) == ["default"] * 3
+    assert server.reads == 4
+    assert api.breaker.state == CircuitBreaker.OPEN
+
+def test_successful_trial_closes_the_breaker(pvwa):
+    server = PVWA(503, 503, 200)
+    api = pvwa(server, retry_attempts=1, breaker_failure_threshold=2, breaker_reset_timeout=0)
+
+    async def read_three_times():
+        return [await api._get_json("Components", "default") for _ in range(3)]
+
+    assert asyncio.run(read_three_times()) == ["default", "default", {"status": 200}]
+    assert api.breaker.to_dict() == {"state": "closed", "consecutive_failures": 0}
@@ -0,0 +1,109 @@
+"""
+Tests des agrégats horaires et journaliers : un historique servi par les agrégats est identique à celui des mesures brutes
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.history import AGGREGATIONS, components_history, system_history
+from app.models import ComponentStatus, MetricRollup, RollupWatermark, SystemHealth
+from app.rollups import compact_source, rewind_watermarks
+
+ORIGIN = datetime(2024, 1, 1)
+END = ORIGIN + timedelta(days=3)
+AGG = list(AGGREGATIONS)
+
+def _approx_points(points):
+    return [pytest.approx(point) for point in points]
+
+@pytest.fixture
+def measures(db):
+    db.add_all([
+        SystemHealth(
+            timestamp=ORIGIN + timedelta(minutes=minutes),
+            cpu_usage=float(minutes % 97),
+            memory_usage=float(minutes % 41) / 3,
+            disk_usage=None if minutes % 7 == 0 else 60.0,
+            network_latency=float(minutes % 13)
+        )
+        for minutes in range(0, 3 * 24 * 60, 10)
+    ])
+    db.add_all([
+        ComponentStatus(
+            timestamp=ORIGIN + timedelta(minutes=minutes),
+            component_type=component_type,
+            total_amount=total,
+            connected=minutes // 10 % (total + 1),
+            disconnected=total - minutes // 10 % (total + 1),
+            status="OK"
+        )
+        for minutes in range(0, 3 * 24 * 60, 15)
+        for component_type, total in (("CPM", 3), ("PSM", 0))
+    ])
+    db.commit()
+    return db
+
+def _compact(db, source):
+    return sum(compact_source(db, source, period, now=END) for period in ("1d", "1h"))
+
+@pytest.mark.parametrize("start, end, bucket", [
+    (ORIGIN, END, 3600),
+    (ORIGIN, END, 86400),
+    (ORIGIN + timedelta(minutes=25), END - timedelta(minutes=50), 3600),
+    (ORIGIN + timedelta(hours=5, minutes=30), END, 3 * 3600),
+    (ORIGIN + timedelta(hours=30), END + timedelta(hours=6), 1800),
+])
+def test_rollups_and_raw_rows_give_the_same_history(measures, start, end, bucket):
+    raw = system_history(measures, start, end, bucket, AGG)["points"]
+    assert _compact(measures, "system_health") > 0
+
+    assert system_history(measures, start, end, bucket, AGG)["points"] == _approx_points(raw)
+
+def test_component_rollups_keep_series_and_availability(measures):
+    raw = components_history(measures, ORIGIN, END, 3600, AGG)["points"]
+    _compact(measures, "component_status")
+
+    rolled = components_history(measures, ORIGIN, END, 3600, AGG)["points"]
+    assert rolled == _approx_points(raw)
+    assert {point["component_type"] for point in rolled} == {"CPM", "PSM"}
+    assert all(point["availability_avg"] is None for point in rolled if point["component_type"] == "PSM")
+
+def test_compaction_resumes_from_the_watermark(measures):
+    first = compact_source(measures, "system_health", "1h", now=ORIGIN + timedelta(days=1, minutes=5))
+    watermark = measures.execute(select(RollupWatermark.watermark).where(RollupWatermark.period == "1h")).scalar()
+    assert watermark == ORIGIN + timedelta(days=1)
+
+    second = compact_source(measures, "system_health", "1h", now=END)
+    assert compact_source(measures, "system_health", "1h", now=END) == 0
+    rows = measures.execute(select(func.count()).select_from(MetricRollup)).scalar()
+    assert rows == first + second
+
+def test_late_row_is_aggregated_after_rewinding_the_watermark(measures):
+    _compact(measures, "system_health")
+    late = SystemHealth(timestamp=ORIGIN + timedelta(days=1, hours=2, minutes=5), cpu_usage=500.0, memory_usage=1.0,
+                        disk_usage=1.0, network_latency=1.0)
+    measures.add(late)
+    rewind_watermarks(measures, "system_health", late.timestamp)
+    measures.commit()
+
+    watermarks = dict(measures.execute(select(RollupWatermark.period, RollupWatermark.watermark)).all())
+    assert watermarks == {"1d": ORIGIN + timedelta(days=1), "1h": ORIGIN + timedelta(days=1, hours=2)}
+
+    _compact(measures, "system_health")
+    for bucket in (3600, 86400):
+        rolled = system_history(measures, ORIGIN, END, bucket, AGG)["points"]
+        measures.execute(RollupWatermark.__table__.delete())
+        raw = system_history(measures, ORIGIN, END, bucket, AGG)["points"]
+        measures.rollback()
+        assert rolled == _approx_points(raw)
+        assert max(point["cpu_usage_max"] for point in rolled) == 500.0
+
+def test_rewind_ignores_rows_after_the_watermark(measures):
+    _compact(measures, "system_health")
+    before = measures.execute(select(func.count()).select_from(MetricRollup)).scalar()
+
+    rewind_watermarks(measures, "system_health", END + timedelta(minutes=1))
+    measures.commit()
+
+    assert measures.execute(select(func.count()).select_from(MetricRollup)).scalar() == before
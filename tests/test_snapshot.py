@@ -0,0 +1,98 @@
+"""
+Tests du magasin d'instantanés : publication, fraîcheur et chargement unique pour les lecteurs concurrents
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.snapshot import SnapshotStore, content_digest
+
+READERS = 8
+
+def test_published_snapshot_is_a_copy_with_a_content_digest():
+    store = SnapshotStore(max_staleness=60, target="principal")
+    data = {"system_health": {"cpu_usage": 12.5}, "components": ["CPM"]}
+
+    first = store.publish(data, "api")
+    data["components"].append("PSM")
+    second = store.publish({"components": ["CPM"], "system_health": {"cpu_usage": 12.5}}, "database")
+
+    assert first.data["components"] == ["CPM"]
+    assert (first.version, second.version) == (1, 2)
+    assert first.digest == second.digest == content_digest(first.data)
+    assert store.publish(data, "api").digest != first.digest
+    assert store.current().target == "principal"
+
+def test_listeners_are_notified_and_their_errors_ignored():
+    store = SnapshotStore(max_staleness=60)
+    received = []
+    store.add_listener(lambda snapshot: 1 / 0)
+    store.add_listener(received.append)
+    store.add_listener(received.append)
+
+    snapshot = store.publish({"a": 1}, "api")
+    assert received == [snapshot]
+
+def test_fresh_snapshot_is_served_without_loading():
+    store = SnapshotStore(max_staleness=60)
+    published = store.publish({"a": 1}, "api")
+
+    assert store.get(lambda: pytest.fail("rechargement inattendu")) is published
+
+def test_stale_snapshot_is_reloaded():
+    store = SnapshotStore(max_staleness=0)
+    store.publish({"a": 1}, "api")
+
+    reloaded = store.get(lambda: ({"a": 2}, "database"))
+    assert (reloaded.version, reloaded.data, reloaded.source) == (2, {"a": 2}, "database")
+
+def test_loader_without_data_returns_the_previous_snapshot():
+    store = SnapshotStore(max_staleness=0)
+    assert store.get(lambda: None) is None
+
+    previous = store.publish({"a": 1}, "api")
+    assert store.get(lambda: None) is previous
+
+def test_concurrent_readers_share_a_single_load():
+    store = SnapshotStore(max_staleness=60)
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(10)
+        return {"a": len(calls)}, "database"
+
+    with ThreadPoolExecutor(READERS) as pool:
+        futures = [pool.submit(store.get, loader) for _ in range(READERS)]
+        assert started.wait(10)
+        # Laisser les autres lecteurs rejoindre le chargement en cours avant de le terminer
+        time.sleep(0.2)
+        release.set()
+        results = [future.result(timeout=10) for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert results[0].version == 1
+
+def test_loader_error_is_raised_to_every_waiting_reader():
+    store = SnapshotStore(max_staleness=60)
+    started, release = threading.Event(), threading.Event()
+
+    def loader():
+        started.set()
+        release.wait(10)
+        raise ConnectionError("base indisponible")
+
+    with ThreadPoolExecutor(READERS) as pool:
+        futures = [pool.submit(store.get, loader) for _ in range(READERS)]
+        assert started.wait(10)
+        time.sleep(0.2)
+        release.set()
+        errors = [future.exception(timeout=10) for future in futures]
+
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert store.get(lambda: ({"a": 1}, "api")).version == 1
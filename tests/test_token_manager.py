@@ -0,0 +1,129 @@
+"""
+Tests du cycle de vie du jeton : connexion unique, reconnexion après un 401 et partage entre processus
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.token_manager import FileTokenStore, SQLiteTokenStore, TokenManager
+
+CONCURRENT_READS = 10
+
+class PVWA:
+    """
+    PVWA simulé : chaque connexion émet un nouveau jeton, seul le dernier est accepté
+    """
+    def __init__(self, login_status=200):
+        self.login_status = login_status
+        self.logins = 0
+        self.logoffs = []
+        self.valid_token = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/Logon"):
+            # Laisser les appels concurrents s'accumuler pendant la connexion
+            await asyncio.sleep(0.05)
+            self.logins += 1
+            if self.login_status != 200:
+                return httpx.Response(self.login_status)
+            self.valid_token = f"token-{self.logins}"
+            return httpx.Response(200, text=f'"{self.valid_token}"')
+        if request.url.path.endswith("/Logoff"):
+            self.logoffs.append(request.headers["Authorization"])
+            return httpx.Response(200)
+        if request.headers.get("Authorization") != self.valid_token:
+            return httpx.Response(401)
+        return httpx.Response(200, json={"token": self.valid_token})
+
+async def read_concurrently(api, count=CONCURRENT_READS):
+    return await asyncio.gather(*[api._get_json("Components", None) for _ in range(count)])
+
+def test_concurrent_reads_share_a_single_login(pvwa):
+    server = PVWA()
+    api = pvwa(server)
+
+    results = asyncio.run(read_concurrently(api))
+
+    assert results == [{"token": "token-1"}] * CONCURRENT_READS
+    assert server.logins == 1
+    assert api.tokens.to_dict()["logins"] == 1
+
+def test_rejected_token_is_replaced_once_and_reads_replayed(pvwa):
+    server = PVWA()
+    api = pvwa(server, retry_attempts=1)
+    api.token, api.token_expiry = "revoked", datetime.now() + timedelta(hours=1)
+
+    results = asyncio.run(read_concurrently(api))
+
+    assert results == [{"token": "token-1"}] * CONCURRENT_READS
+    assert server.logins == 1
+    assert api.token == "token-1"
+
+def test_failed_relogin_returns_the_default(pvwa):
+    server = PVWA(login_status=403)
+    api = pvwa(server, retry_attempts=1)
+    api.token, api.token_expiry = "revoked", datetime.now() + timedelta(hours=1)
+
+    assert asyncio.run(api._get_json("Components", "default")) == "default"
+    assert api.token is None
+    assert api.breaker.state == "closed"
+
+def test_refresh_renews_the_token_before_expiry(pvwa):
+    server = PVWA()
+    api = pvwa(server, token_lifetime=3600, token_refresh_before=600)
+
+    async def scenario():
+        await api._get_json("Components", None)
+        first = await api.tokens.refresh()
+        api.token_expiry = datetime.now() + timedelta(seconds=300)
+        second = await api.tokens.refresh()
+        return first, second
+
+    assert asyncio.run(scenario()) == (True, True)
+    assert server.logins == 2
+    assert api.token == "token-2"
+    assert server.logoffs == ["token-1"]
+    assert api.tokens.to_dict()["last_refresh"] is not None
+
+@pytest.mark.parametrize("store_class", [FileTokenStore, SQLiteTokenStore])
+def test_shared_store_lets_other_processes_reuse_the_token(pvwa, tmp_path, store_class):
+    server = PVWA()
+    store = store_class(str(tmp_path / "tokens"))
+    first, second = pvwa(server), pvwa(server)
+    first.tokens = TokenManager(first, store)
+    second.tokens = TokenManager(second, store)
+
+    async def scenario():
+        return await asyncio.gather(read_concurrently(first), read_concurrently(second))
+
+    results = asyncio.run(scenario())
+
+    assert results == [[{"token": "token-1"}] * CONCURRENT_READS] * 2
+    assert server.logins == 1
+    assert first.tokens.logins + second.tokens.logins == 1
+    assert first.tokens.shared_reuses + second.tokens.shared_reuses == 1
+
+@pytest.mark.parametrize("store_class", [FileTokenStore, SQLiteTokenStore])
+def test_rejected_shared_token_is_discarded(pvwa, tmp_path, store_class):
+    server = PVWA()
+    store = store_class(str(tmp_path / "tokens"))
+    api = pvwa(server, retry_attempts=1)
+    api.tokens = TokenManager(api, store)
+    store.save(api.tokens.key, "revoked", (datetime.now() + timedelta(hours=1)).timestamp())
+
+    assert asyncio.run(api._get_json("Components", None)) == {"token": "token-1"}
+    assert api.tokens.shared_reuses == 1
+    assert server.logins == 1
+    assert store.load(api.tokens.key)[0] == "token-1"
+
+def test_lease_has_a_single_owner(tmp_path):
+    store = FileTokenStore(str(tmp_path / "tokens"))
+    assert store.acquire_lease("cible", "a", 30)
+    assert not store.acquire_lease("cible", "b", 30)
+    assert store.acquire_lease("cible", "a", 30)
+    store.release_lease("cible", "b")
+    assert not store.acquire_lease("cible", "b", 30)
+    store.release_lease("cible", "a")
+    assert store.acquire_lease("cible", "b", 30)
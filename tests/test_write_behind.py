@@ -0,0 +1,169 @@
+"""
+Tests de l'écriture différée des cycles : journal sur disque, reprise de la relecture et isolement des cycles refusés
+"""
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.config import WRITE_BEHIND_CONFIG
+from app.write_behind import CollectionJournal, WriteBehindQueue
+
+TIMEOUT = 10
+
+class Database:
+    """
+    Base simulée : enregistre les cycles écrits, peut être indisponible ou refuser certains cycles
+    """
+    def __init__(self):
+        self.written = []
+        self.calls = 0
+        self.available = True
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def write_batch(self, batch):
+        self.gate.wait(TIMEOUT)
+        self.calls += 1
+        if not self.available:
+            raise OperationalError("INSERT", {}, ConnectionError("base indisponible"))
+        if any(item.get("poison") for item in batch):
+            raise ValueError("valeur invalide")
+        self.written.extend(item["cycle"] for item in batch)
+
+@pytest.fixture
+def database():
+    return Database()
+
+@pytest.fixture
+def make_writer(tmp_path, database, monkeypatch):
+    monkeypatch.setitem(WRITE_BEHIND_CONFIG, "enabled", True)
+    monkeypatch.setitem(WRITE_BEHIND_CONFIG, "retry_interval", 0.05)
+    writers = []
+
+    def make_writer(queue_size=100, batch_size=10):
+        monkeypatch.setitem(WRITE_BEHIND_CONFIG, "queue_size", queue_size)
+        monkeypatch.setitem(WRITE_BEHIND_CONFIG, "batch_size", batch_size)
+        writer = WriteBehindQueue(database.write_batch)
+        writer.journal = CollectionJournal(str(tmp_path / "spool"))
+        writers.append(writer)
+        return writer
+
+    yield make_writer
+    database.gate.set()
+    for writer in writers:
+        writer.stop(timeout=TIMEOUT)
+
+def _cycles(*numbers, target="principal"):
+    return [{"target": target, "cycle": number} for number in numbers]
+
+def _wait_until(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def _results(futures):
+    return [future.result(timeout=TIMEOUT) for future in futures]
+
+def test_cycles_are_written_in_order(make_writer, database):
+    writer = make_writer()
+    futures = [writer.submit(item) for item in _cycles(1, 2, 3)]
+
+    assert _results(futures) == [True, True, True]
+    assert database.written == [1, 2, 3]
+    assert writer.status()["written"] == 3
+    assert not writer.journal.segments()
+
+def test_unavailable_database_spills_to_the_journal_then_replays(make_writer, database):
+    database.available = False
+    writer = make_writer()
+    futures = [writer.submit(item) for item in _cycles(1, 2)]
+    _wait_until(lambda: writer.spilling and not writer.available)
+    futures += [writer.submit(item) for item in _cycles(3, 4)]
+    assert writer.journal.count() >= 2
+
+    database.available = True
+    assert _results(futures) == [True] * 4
+    assert database.written == [1, 2, 3, 4]
+    _wait_until(lambda: not writer.spilling)
+    assert not writer.journal.segments()
+    assert writer.status()["journal"] == 0
+
+def test_full_queue_spills_without_reordering(make_writer, database):
+    database.gate.clear()
+    writer = make_writer(queue_size=1)
+    futures = [writer.submit(item) for item in _cycles(1)]
+    _wait_until(lambda: writer.status()["queued"] == 0)
+    # Cycle 1 en cours d'écriture, cycle 2 en file, cycles 3 et 4 dans le journal
+    futures += [writer.submit(item) for item in _cycles(2, 3, 4)]
+    assert writer.spilling
+    assert writer.journal.count() == 2
+
+    database.gate.set()
+    assert _results(futures) == [True] * 4
+    assert database.written == [1, 2, 3, 4]
+
+def test_replay_resumes_after_the_last_written_batch(tmp_path, make_writer, database):
+    journal = CollectionJournal(str(tmp_path / "spool"))
+    journal.append([{"seq": number, **item} for number, item in enumerate(_cycles(1, 2, 3, 4, 5), start=1)])
+
+    first = make_writer(batch_size=2)
+    first.spilling = True
+
+    def fail_second_batch(batch):
+        if database.calls == 1:
+            database.available = False
+        Database.write_batch(database, batch)
+    first.write_batch = fail_second_batch
+
+    assert not first._replay()
+    assert database.written == [1, 2]
+    assert journal.count() == 3
+
+    # Redémarrage : la relecture reprend à la position enregistrée, sans réécrire les cycles 1 et 2
+    database.available = True
+    second = make_writer(batch_size=2)
+    assert second._replay()
+    assert database.written == [1, 2, 3, 4, 5]
+    assert not journal.segments()
+    assert not second.spilling
+
+def test_truncated_last_line_is_not_replayed(tmp_path, make_writer, database):
+    journal = CollectionJournal(str(tmp_path / "spool"))
+    journal.append([{"seq": 1, **_cycles(1)[0]}])
+    with open(journal.segments()[0], "ab") as segment:
+        segment.write(b'{"seq": 2, "target": "principal", "cy')
+
+    writer = make_writer()
+    writer.spilling = True
+    assert writer._replay()
+    assert database.written == [1]
+
+def test_rejected_cycle_is_isolated(tmp_path, make_writer, database):
+    writer = make_writer(batch_size=10)
+    database.gate.clear()
+    items = _cycles(1, 2, 3, 4)
+    items[2]["poison"] = True
+    futures = [writer.submit(item) for item in items]
+    database.gate.set()
+
+    assert _results(futures) == [True, True, False, True]
+    assert database.written == [1, 2, 4]
+
+    rejected = (tmp_path / "spool" / "rejected.jsonl").read_text().splitlines()
+    assert len(rejected) == 1
+    entry = json.loads(rejected[0])
+    assert (entry["cycle"], entry["error"]) == (3, "valeur invalide")
+    assert writer.available
+
+def test_disabled_queue_writes_immediately(make_writer, database, monkeypatch):
+    monkeypatch.setitem(WRITE_BEHIND_CONFIG, "enabled", False)
+    writer = make_writer()
+
+    assert writer.submit(_cycles(1)[0]).result(timeout=0) is True
+    assert database.written == [1]
+    assert writer.thread is None
+    assert writer.submit({"target": "principal", "cycle": 2, "poison": True}) is None